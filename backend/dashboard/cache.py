@@ -0,0 +1,177 @@
+"""Versioned response cache for the dashboard endpoints.
+
+Responses are cached per (endpoint, query params, warehouse scope) and the
+key embeds a "stock version" counter for every warehouse in the scope.
+Endpoints whose data also depends on who is asking are cached per user, and
+may depend on extra version tokens (e.g. ANOMALIES) bumped by the code that
+writes their source rows.
+Posting stock or changing a document bumps the counters of the warehouses it
+touches, so a stale entry is simply never read again; the TTL only bounds
+how long time-windowed figures ("last 30 days") can lag.
+
+Everything goes through Django's cache framework, so the default local-memory
+backend (or a file/Redis backend configured in CACHES) works as-is.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'dashboard'
+ANY_WAREHOUSE = 'any'
+CATALOG = 'catalog'
+ANOMALIES = 'anomalies'
+
+CACHED_ENDPOINTS: list[str] = []
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _timeout() -> int:
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _version_key(token) -> str:
+    return f'{KEY_PREFIX}:stock-version:{token}'
+
+
+def _stats_key(endpoint: str, outcome: str) -> str:
+    return f'{KEY_PREFIX}:stats:{endpoint}:{outcome}'
+
+
+def _incr(cache, key: str, start: int = 0) -> int:
+    cache.add(key, start, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(key, start + 1, None)
+        return start + 1
+
+
+def _bump(tokens) -> None:
+    cache = _cache()
+    for token in tokens:
+        # A counter that was evicted restarts from the clock rather than from
+        # zero, so it can never come back to a value an old entry was keyed on.
+        _incr(cache, _version_key(token), start=time.time_ns())
+
+
+def bump_stock_version(warehouse_ids=None) -> None:
+    """Invalidate cached dashboard data for the given warehouses.
+
+    Pass None for changes that are not tied to a warehouse (e.g. a product's
+    reorder level), which invalidates every scope. The bump runs once the
+    current transaction commits so a reader can never cache pre-commit data
+    under the new version.
+    """
+    if warehouse_ids is None:
+        tokens = [CATALOG]
+    else:
+        tokens = {int(pk) for pk in warehouse_ids if pk is not None}
+        if not tokens:
+            return
+        tokens = sorted(tokens) + [ANY_WAREHOUSE]
+    transaction.on_commit(lambda: _bump(tokens))
+
+
+def bump_anomaly_version() -> None:
+    """Invalidate cached anomaly feeds after anomaly notifications change."""
+    transaction.on_commit(lambda: _bump([ANOMALIES]))
+
+
+def stock_versions(tokens) -> list:
+    """Current version of each token, initializing missing counters."""
+    cache = _cache()
+    keys = [_version_key(token) for token in tokens]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def _scope_tokens(user) -> list:
+    """Version tokens for the warehouses the user's dashboard data covers.
+
+    Mirrors accounts.scoping.scope_queryset(): admins and (unless strict
+    membership is on) users without assigned warehouses see every warehouse.
+    """
+    from accounts.scoping import allowed_warehouse_ids, require_warehouse_membership
+
+    if getattr(user, 'role', None) == 'admin':
+        return [ANY_WAREHOUSE, CATALOG]
+    ids = allowed_warehouse_ids(user) or []
+    if not ids:
+        return [CATALOG] if require_warehouse_membership() else [ANY_WAREHOUSE, CATALOG]
+    return sorted(ids) + [CATALOG]
+
+
+def response_cache_key(endpoint: str, request, *, per_user: bool = False, extra_tokens=()) -> str:
+    tokens = _scope_tokens(request.user) + list(extra_tokens)
+    params = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+    user_id = request.user.pk if per_user else None
+    raw = repr((endpoint, params, user_id, tokens, stock_versions(tokens)))
+    return f'{KEY_PREFIX}:response:{endpoint}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
+def cached_dashboard_view(endpoint: str, *, per_user: bool = False, extra_tokens=()):
+    """Cache a dashboard view's successful responses under a versioned key.
+
+    Apply below @api_view/@permission_classes so the request is already
+    authenticated and the cache is consulted only for permitted callers.
+    Use `per_user` for responses that include the caller's own data, and
+    `extra_tokens` for version tokens beyond the warehouse scope.
+    """
+    from rest_framework.response import Response
+
+    CACHED_ENDPOINTS.append(endpoint)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            cache = _cache()
+            key = response_cache_key(endpoint, request, per_user=per_user, extra_tokens=extra_tokens)
+            data = cache.get(key)
+            if data is not None:
+                _incr(cache, _stats_key(endpoint, 'hits'))
+                return Response(data)
+
+            _incr(cache, _stats_key(endpoint, 'misses'))
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, _timeout())
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters per cached endpoint since they were last reset."""
+    cache = _cache()
+    keys = [_stats_key(endpoint, outcome) for endpoint in CACHED_ENDPOINTS for outcome in ('hits', 'misses')]
+    found = cache.get_many(keys)
+    stats = {}
+    for endpoint in CACHED_ENDPOINTS:
+        hits = found.get(_stats_key(endpoint, 'hits'), 0)
+        misses = found.get(_stats_key(endpoint, 'misses'), 0)
+        stats[endpoint] = {'hits': hits, 'misses': misses}
+    return stats
+
+
+def reset_cache_stats() -> None:
+    _cache().delete_many(
+        [_stats_key(endpoint, outcome) for endpoint in CACHED_ENDPOINTS for outcome in ('hits', 'misses')]
+    )
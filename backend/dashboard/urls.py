@@ -14,5 +14,6 @@ urlpatterns = [
     path('movement-value-trend/', views.inventory_movement_value_trend, name='movement-value-trend'),
     path('value-by-health/', views.inventory_value_by_health, name='value-by-health'),
     path('anomalies/', views.anomaly_feed, name='anomaly-feed'),
+    path('cache-stats/', views.dashboard_cache_stats, name='dashboard-cache-stats'),
 ]
 
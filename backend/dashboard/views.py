@@ -1,5 +1,4 @@
-import statistics
-from collections import defaultdict
+import numpy as np
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -16,12 +15,13 @@ from django.db.models import (
     DurationField,
 )
 from django.db.models.functions import Abs
-from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.functions import ExtractMonth, ExtractYear, TruncDate
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
-from products.models import Product, StockItem
+from products.models import Product, ProductStockSummary, StockItem
 from operations.models import (
+    DailyMovementFact,
     Receipt,
     DeliveryOrder,
     InternalTransfer,
@@ -29,11 +29,41 @@ from operations.models import (
     ReturnOrder,
     CycleCountTask,
     CycleCountItem,
-    ReceiptItem,
     DeliveryItem,
-    TransferItem,
 )
+from operations.movement_facts import flush_movement_refreshes
+from accounts.permissions import IsAdmin
 from accounts.scoping import allowed_warehouse_ids, require_warehouse_membership, scope_queryset
+from products import classification
+from products.costing import average_costs
+
+from .cache import ANOMALIES, cache_stats, cached_dashboard_view, reset_cache_stats
+
+
+def _stock_scope_is_global(request) -> bool:
+    """True when _scoped_stock_items() would not filter by warehouse.
+
+    Only then can the all-warehouse ProductStockSummary stand in for a
+    StockItem aggregate.
+    """
+    user = getattr(request, 'user', None)
+    if getattr(user, 'role', None) == 'admin':
+        return True
+    return not allowed_warehouse_ids(user) and not require_warehouse_membership()
+
+
+def _scoped_average_costs(request, warehouse_id=None) -> dict:
+    """Weighted-average unit cost per product from the cost index (one query).
+
+    Costs are weighted over receipts into the caller's warehouses, matching
+    _scoped_stock_items(); `warehouse_id` narrows that to one warehouse.
+    """
+    ids = None
+    if not _stock_scope_is_global(request):
+        ids = allowed_warehouse_ids(request.user) or []
+    if warehouse_id is not None:
+        ids = [warehouse_id] if ids is None or warehouse_id in ids else []
+    return average_costs(warehouse_ids=ids)
 
 
 def _scoped_stock_items(request):
@@ -47,8 +77,21 @@ def _scoped_stock_items(request):
     return StockItem.objects.filter(warehouse_id__in=ids)
 
 
+def _scoped_movement_facts(request):
+    # Re-roll slices changed since the background flush, so the rollup is
+    # never read stale.
+    flush_movement_refreshes()
+    # Transfers are visible from either end, as with the documents.
+    return scope_queryset(
+        DailyMovementFact.objects.all(),
+        request.user,
+        warehouse_fields=('warehouse', 'to_warehouse'),
+    )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_dashboard_view('kpis')
 def dashboard_kpis(request):
     """Get dashboard KPIs"""
     from django.db.models import Sum
@@ -56,26 +99,29 @@ def dashboard_kpis(request):
     # Total Products in Stock
     total_products = Product.objects.filter(is_active=True).count()
     
-    # Optimize: Use aggregation instead of iterating
-    # Get all stock items grouped by product
-    stock_by_product = _scoped_stock_items(request).values('product').annotate(
-        total_quantity=Sum('quantity')
-    )
-    
-    # Create a dict for quick lookup
-    stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
-    
     # Low Stock / Out of Stock Items
-    low_stock_count = 0
-    out_of_stock_count = 0
-    products = Product.objects.filter(is_active=True).select_related('category')
-    
-    for product in products:
-        total_stock = stock_dict.get(product.id, 0)
-        if total_stock == 0:
-            out_of_stock_count += 1
-        elif total_stock <= product.reorder_level:
-            low_stock_count += 1
+    if _stock_scope_is_global(request):
+        # Indexed counts on the maintained per-product summary
+        summaries = ProductStockSummary.objects.filter(is_active=True)
+        out_of_stock_count = summaries.filter(is_out_of_stock=True).count()
+        low_stock_count = summaries.filter(is_low_stock=True, is_out_of_stock=False).count()
+    else:
+        # Warehouse-scoped users: aggregate their warehouses only
+        stock_by_product = _scoped_stock_items(request).values('product').annotate(
+            total_quantity=Sum('quantity')
+        )
+        stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
+
+        low_stock_count = 0
+        out_of_stock_count = 0
+        products = Product.objects.filter(is_active=True).only('id', 'reorder_level')
+
+        for product in products:
+            total_stock = stock_dict.get(product.id, 0)
+            if total_stock == 0:
+                out_of_stock_count += 1
+            elif total_stock <= product.reorder_level:
+                low_stock_count += 1
     
     # Pending Receipts
     pending_receipts = scope_queryset(
@@ -172,13 +218,22 @@ def low_stock_products(request):
     from products.models import StockItem
     from django.db.models import Sum
     
-    # Optimize: Use aggregation
-    stock_by_product = _scoped_stock_items(request).values('product').annotate(
-        total_quantity=Sum('quantity')
-    )
-    stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
-    
-    products = Product.objects.filter(is_active=True).select_related('category')
+    if _stock_scope_is_global(request):
+        # Only the flagged products are loaded, via the maintained summary
+        summaries = (
+            ProductStockSummary.objects.filter(is_active=True, is_low_stock=True)
+            .select_related('product__category')
+            .order_by('product_id')
+        )
+        stock_dict = {summary.product_id: summary.total_quantity for summary in summaries}
+        products = [summary.product for summary in summaries]
+    else:
+        stock_by_product = _scoped_stock_items(request).values('product').annotate(
+            total_quantity=Sum('quantity')
+        )
+        stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
+        products = Product.objects.filter(is_active=True).select_related('category')
+
     low_stock_products = []
     
     for product in products:
@@ -197,65 +252,59 @@ def low_stock_products(request):
     return Response(low_stock_products)
 
 
-def _compute_abc_dataset(request):
-    """Calculate ABC dataset reused across endpoints."""
-    products = Product.objects.filter(is_active=True).select_related('category')
-    stock_by_product = _scoped_stock_items(request).values('product').annotate(
-        total_quantity=Sum('quantity')
-    )
-    stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
+def _abc_columns(request):
+    """Columnar ABC inputs for active products, aligned on sorted product ids.
 
-    product_data = []
-    for product in products:
-        total_stock = stock_dict.get(product.id, 0)
-        avg_price = (
-            scope_queryset(
-                ReceiptItem.objects.filter(product=product),
-                request.user,
-                warehouse_fields=('receipt__warehouse',),
-            ).aggregate(avg=Avg('unit_price'))['avg']
-            or Decimal('0.00')
-        )
-
-        total_value = Decimal(total_stock) * Decimal(avg_price)
-        product_data.append({
-            'product_id': product.id,
-            'product_name': product.name,
-            'sku': product.sku,
-            'category': product.category.name if product.category else None,
-            'stock_quantity': float(total_stock),
-            'unit_price': float(avg_price),
-            'total_value': float(total_value),
-            'classification': 'C',
-        })
+    Returns (axis, meta, quantities, unit_costs, values, classes), where
+    `meta` holds (id, name, sku, category name) tuples in axis order.
+    """
+    meta = list(
+        Product.objects.filter(is_active=True)
+        .order_by('id')
+        .values_list('id', 'name', 'sku', 'category__name')
+    )
+    axis = classification.product_axis(row[0] for row in meta)
+    quantities = classification.align(
+        axis,
+        _scoped_stock_items(request).values_list('product').annotate(total_quantity=Sum('quantity')),
+    )
+    unit_costs = classification.align(axis, _scoped_average_costs(request).items())
+    values = quantities * unit_costs
+    classes, _ = classification.abc_classify(values)
+    return axis, meta, quantities, unit_costs, values, classes
 
-    product_data.sort(key=lambda x: x['total_value'], reverse=True)
-    total_value_sum = sum(p['total_value'] for p in product_data)
-    cumulative_value = 0
 
-    for product in product_data:
-        cumulative_value += product['total_value']
-        cumulative_percentage = (cumulative_value / total_value_sum * 100) if total_value_sum > 0 else 0
+def _compute_abc_dataset(request):
+    """Calculate ABC dataset reused across endpoints."""
+    _, meta, quantities, unit_costs, values, classes = _abc_columns(request)
 
-        if cumulative_percentage <= 80:
-            product['classification'] = 'A'
-        elif cumulative_percentage <= 95:
-            product['classification'] = 'B'
-        else:
-            product['classification'] = 'C'
+    product_data = [
+        {
+            'product_id': meta[index][0],
+            'product_name': meta[index][1],
+            'sku': meta[index][2],
+            'category': meta[index][3],
+            'stock_quantity': float(quantities[index]),
+            'unit_price': float(unit_costs[index]),
+            'total_value': float(values[index]),
+            'classification': str(classes[index]),
+        }
+        for index in classification.value_order(values).tolist()
+    ]
 
     summary = {
         'total_products': len(product_data),
-        'total_value': float(total_value_sum),
-        'class_a_count': sum(1 for p in product_data if p['classification'] == 'A'),
-        'class_b_count': sum(1 for p in product_data if p['classification'] == 'B'),
-        'class_c_count': sum(1 for p in product_data if p['classification'] == 'C'),
+        'total_value': float(values.sum()),
+        'class_a_count': int(np.count_nonzero(classes == 'A')),
+        'class_b_count': int(np.count_nonzero(classes == 'B')),
+        'class_c_count': int(np.count_nonzero(classes == 'C')),
     }
     return product_data, summary
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_dashboard_view('abc-analysis')
 def abc_analysis(request):
     """ABC Analysis - Pareto Principle (80/20 rule)"""
     product_data, summary = _compute_abc_dataset(request)
@@ -267,8 +316,9 @@ def abc_analysis(request):
 def inventory_turnover(request):
     """Calculate Inventory Turnover Ratio.
 
-    Optimized to avoid per-stock-item price aggregations by precomputing
-    average prices and stock quantities in a small number of queries.
+    Optimized to avoid per-stock-item price aggregations: unit costs come
+    from the cost index, stock quantities from one grouped query and COGS
+    from the daily movement rollup.
     """
     from products.models import StockItem
     from django.db.models import Sum, Avg
@@ -279,30 +329,17 @@ def inventory_turnover(request):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=months * 30)
 
-    # Calculate COGS (Cost of Goods Sold) from deliveries (warehouse-scoped)
-    cogs_qs = scope_queryset(
-        DeliveryItem.objects.filter(
-            delivery__status='done',
-            delivery__completed_at__gte=start_date,
-            delivery__completed_at__lte=end_date,
-        ),
-        request.user,
-        warehouse_fields=('delivery__warehouse',),
+    # Calculate COGS (Cost of Goods Sold) from completed deliveries (warehouse-scoped)
+    cogs_qs = _scoped_movement_facts(request).filter(
+        movement_type='delivery',
+        status='done',
+        completed_date__gte=timezone.localtime(start_date).date(),
+        completed_date__lte=timezone.localtime(end_date).date(),
     )
     cogs = cogs_qs.aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
 
-    # Precompute average unit price per product from receipts in a single query (warehouse-scoped)
-    price_by_product = scope_queryset(
-        ReceiptItem.objects.all(),
-        request.user,
-        warehouse_fields=('receipt__warehouse',),
-    ).values('product').annotate(
-        avg_price=Avg('unit_price')
-    )
-    price_dict = {
-        item['product']: Decimal(item['avg_price'] or 0)
-        for item in price_by_product
-    }
+    # Weighted-average unit cost per product from the cost index (warehouse-scoped)
+    price_dict = _scoped_average_costs(request)
 
     # Precompute total stock quantity per product
     stock_by_product = _scoped_stock_items(request).values('product').annotate(
@@ -334,30 +371,25 @@ def inventory_turnover(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_dashboard_view('analytics')
 def analytics_dashboard(request):
     """Comprehensive analytics dashboard"""
     from products.models import StockItem
     from django.db.models import Sum, Avg, Count
     
     # ABC Analysis summary
-    products = Product.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).only('id')
     stock_by_product = _scoped_stock_items(request).values('product').annotate(
         total_quantity=Sum('quantity')
     )
     stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
+    cost_dict = _scoped_average_costs(request)
     
     # Calculate product values
     product_values = []
     for product in products:
         total_stock = stock_dict.get(product.id, 0)
-        avg_price = (
-            scope_queryset(
-                ReceiptItem.objects.filter(product=product),
-                request.user,
-                warehouse_fields=('receipt__warehouse',),
-            ).aggregate(avg=Avg('unit_price'))['avg']
-            or Decimal('0.00')
-        )
+        avg_price = cost_dict.get(product.id, Decimal('0.00'))
         total_value = Decimal(total_stock) * Decimal(avg_price)
         product_values.append(total_value)
     
@@ -397,14 +429,7 @@ def analytics_dashboard(request):
     
     dead_stock_products = [p for p in products if p.id not in active_products]
     dead_stock_value = sum([
-        float(stock_dict.get(p.id, 0)) * float(
-            scope_queryset(
-                ReceiptItem.objects.filter(product=p),
-                request.user,
-                warehouse_fields=('receipt__warehouse',),
-            ).aggregate(avg=Avg('unit_price'))['avg']
-            or 0
-        )
+        float(stock_dict.get(p.id, 0)) * float(cost_dict.get(p.id, 0))
         for p in dead_stock_products
     ])
     
@@ -548,16 +573,12 @@ def service_level_metrics(request):
         )
     ).aggregate(avg=Avg('lead_time'))['avg']
 
-    shipped_qty = scope_queryset(
-        DeliveryItem.objects.filter(delivery__status='done'),
-        request.user,
-        warehouse_fields=('delivery__warehouse',),
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    open_qty = scope_queryset(
-        DeliveryItem.objects.exclude(delivery__status='done'),
-        request.user,
-        warehouse_fields=('delivery__warehouse',),
-    ).aggregate(total=Sum('quantity'))['total'] or 0
+    delivered = _scoped_movement_facts(request).filter(movement_type='delivery').aggregate(
+        shipped=Sum('quantity', filter=Q(status='done')),
+        open=Sum('quantity', filter=~Q(status='done')),
+    )
+    shipped_qty = delivered['shipped'] or 0
+    open_qty = delivered['open'] or 0
     total_requested = shipped_qty + open_qty
 
     per_warehouse = []
@@ -617,134 +638,71 @@ def service_level_metrics(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_dashboard_view('movement-value-trend')
 def inventory_movement_value_trend(request):
-    """Get inventory movement value trend over time (receipts, deliveries, transfers) with status breakdown"""
+    """Get inventory movement value trend over time (receipts, deliveries, transfers) with status breakdown.
+
+    Reads the DailyMovementFact rollup grouped by day rather than scanning
+    line items, so the window is whole days.
+    """
     days = int(request.query_params.get('days', 30))
     warehouse_id = request.query_params.get('warehouse_id')
     include_status = request.query_params.get('include_status', 'false').lower() == 'true'
     
     end_date = timezone.now()
     start_date = end_date - timedelta(days=days)
-    
-    # Base queryset filters
-    receipt_filter = Q(receipt__created_at__gte=start_date, receipt__created_at__lte=end_date)
-    delivery_filter = Q(delivery__created_at__gte=start_date, delivery__created_at__lte=end_date)
-    transfer_filter = Q(transfer__created_at__gte=start_date, transfer__created_at__lte=end_date)
-    
-    if warehouse_id:
-        receipt_filter &= Q(receipt__warehouse_id=warehouse_id)
-        delivery_filter &= Q(delivery__warehouse_id=warehouse_id)
-        transfer_filter &= Q(transfer__warehouse_id=warehouse_id)
-    
-    # Get average prices per product (for deliveries and transfers that don't have unit_price)
-    price_by_product = scope_queryset(
-        ReceiptItem.objects.all(),
-        request.user,
-        warehouse_fields=('receipt__warehouse',),
-    ).values('product').annotate(
-        avg_price=Avg('unit_price')
-    )
-    price_dict = {
-        item['product']: Decimal(item['avg_price'] or 0)
-        for item in price_by_product
-    }
-    
-    # Receipts value (has unit_price)
-    receipt_items = scope_queryset(
-        ReceiptItem.objects.filter(receipt_filter).select_related('receipt', 'product'),
-        request.user,
-        warehouse_fields=('receipt__warehouse',),
+
+    facts = _scoped_movement_facts(request).filter(
+        date__gte=timezone.localtime(start_date).date(),
+        date__lte=timezone.localtime(end_date).date(),
     )
-    receipt_data = {}
-    receipt_status_data = {} if include_status else None
-    
-    for item in receipt_items:
-        date_key = item.receipt.created_at.date().isoformat()
-        status = item.receipt.status
-        
-        # Total receipts value
-        if date_key not in receipt_data:
-            receipt_data[date_key] = Decimal('0.00')
-        unit_price = item.unit_price or price_dict.get(item.product_id, Decimal('0.00'))
-        value = item.stock_quantity() * unit_price
-        receipt_data[date_key] += value
-        
-        # Status breakdown
-        if include_status:
-            if date_key not in receipt_status_data:
-                receipt_status_data[date_key] = {
-                    'draft': Decimal('0.00'),
-                    'waiting': Decimal('0.00'),
-                    'ready': Decimal('0.00'),
-                    'done': Decimal('0.00'),
-                    'canceled': Decimal('0.00'),
-                }
-            receipt_status_data[date_key][status] += value
-    
-    # Deliveries value (no unit_price, use average from receipts)
-    delivery_items = scope_queryset(
-        DeliveryItem.objects.filter(delivery_filter).select_related('delivery', 'product'),
-        request.user,
-        warehouse_fields=('delivery__warehouse',),
+    if warehouse_id:
+        facts = facts.filter(warehouse_id=warehouse_id)
+
+    # Weighted-average unit costs (for lines without a unit_price)
+    price_dict = _scoped_average_costs(request)
+
+    rows = list(
+        facts.values('date', 'movement_type', 'status', 'product_id').annotate(
+            priced=Sum('priced_value'),
+            purchase_priced=Sum('purchase_priced_value'),
+            unpriced=Sum('unpriced_quantity'),
+            unpriced_purchase=Sum('unpriced_purchase_quantity'),
+        )
     )
-    delivery_data = {}
-    delivery_status_data = {} if include_status else None
-    
-    for item in delivery_items:
-        date_key = item.delivery.created_at.date().isoformat()
-        status = item.delivery.status
-        
-        # Total deliveries value
-        if date_key not in delivery_data:
-            delivery_data[date_key] = Decimal('0.00')
-        unit_price = price_dict.get(item.product_id, Decimal('0.00'))
-        value = item.stock_quantity() * unit_price
-        delivery_data[date_key] += value
-        
-        # Status breakdown
-        if include_status:
-            if date_key not in delivery_status_data:
-                delivery_status_data[date_key] = {
-                    'draft': Decimal('0.00'),
-                    'waiting': Decimal('0.00'),
-                    'ready': Decimal('0.00'),
-                    'done': Decimal('0.00'),
-                    'canceled': Decimal('0.00'),
-                }
-            delivery_status_data[date_key][status] += value
-    
-    # Transfers value (no unit_price, use average from receipts)
-    transfer_items = scope_queryset(
-        TransferItem.objects.filter(transfer_filter).select_related('transfer', 'product'),
-        request.user,
-        warehouse_fields=('transfer__warehouse', 'transfer__to_warehouse'),
+    factors = dict(
+        Product.objects.filter(pk__in={row['product_id'] for row in rows})
+        .values_list('pk', 'unit_conversion_factor')
     )
-    transfer_data = {}
-    transfer_status_data = {} if include_status else None
-    
-    for item in transfer_items:
-        date_key = item.transfer.created_at.date().isoformat()
-        status = item.transfer.status
-        
-        # Total transfers value
-        if date_key not in transfer_data:
-            transfer_data[date_key] = Decimal('0.00')
-        unit_price = price_dict.get(item.product_id, Decimal('0.00'))
-        value = item.stock_quantity() * unit_price
-        transfer_data[date_key] += value
-        
-        # Status breakdown
+
+    series = {'receipt': {}, 'delivery': {}, 'transfer': {}}
+    status_series = {'receipt': {}, 'delivery': {}, 'transfer': {}}
+    for row in rows:
+        factor = factors.get(row['product_id']) or Decimal('1.0')
+        unit_price = price_dict.get(row['product_id'], Decimal('0.00'))
+        value = (
+            (row['priced'] or 0)
+            + (row['purchase_priced'] or 0) * factor
+            + ((row['unpriced'] or 0) + (row['unpriced_purchase'] or 0) * factor) * unit_price
+        )
+        date_key = row['date'].isoformat()
+        data = series[row['movement_type']]
+        data[date_key] = data.get(date_key, Decimal('0.00')) + value
         if include_status:
-            if date_key not in transfer_status_data:
-                transfer_status_data[date_key] = {
-                    'draft': Decimal('0.00'),
-                    'waiting': Decimal('0.00'),
-                    'ready': Decimal('0.00'),
-                    'done': Decimal('0.00'),
-                    'canceled': Decimal('0.00'),
-                }
-            transfer_status_data[date_key][status] += value
-    
+            by_status = status_series[row['movement_type']].setdefault(date_key, {
+                'draft': Decimal('0.00'),
+                'waiting': Decimal('0.00'),
+                'ready': Decimal('0.00'),
+                'done': Decimal('0.00'),
+                'canceled': Decimal('0.00'),
+            })
+            by_status[row['status']] += value
+
+    receipt_data, delivery_data, transfer_data = series['receipt'], series['delivery'], series['transfer']
+    receipt_status_data = status_series['receipt']
+    delivery_status_data = status_series['delivery']
+    transfer_status_data = status_series['transfer']
+
     # Combine all dates and create response
     all_dates = set(list(receipt_data.keys()) + list(delivery_data.keys()) + list(transfer_data.keys()))
     all_dates = sorted(all_dates)
@@ -803,31 +761,31 @@ def inventory_movement_value_trend(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_dashboard_view('value-by-health')
 def inventory_value_by_health(request):
     """Get inventory value distribution by stock health status"""
     warehouse_id = request.query_params.get('warehouse_id')
     
-    # Get all products with stock
-    products = Product.objects.filter(is_active=True).select_related('category')
-    
-    # Get stock by product
-    stock_filter = {}
-    if warehouse_id:
-        stock_filter['warehouse_id'] = warehouse_id
-    
-    stock_by_product = _scoped_stock_items(request).filter(**stock_filter).values('product').annotate(
-        total_quantity=Sum('quantity')
-    )
-    stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
+    # (product id, total stock, reorder level) for every active product
+    if not warehouse_id and _stock_scope_is_global(request):
+        stock_rows = ProductStockSummary.objects.filter(is_active=True).values_list(
+            'product_id', 'total_quantity', 'reorder_level'
+        )
+    else:
+        stock_items = _scoped_stock_items(request)
+        if warehouse_id:
+            stock_items = stock_items.filter(warehouse_id=warehouse_id)
+        stock_dict = {
+            item['product']: item['total_quantity']
+            for item in stock_items.values('product').annotate(total_quantity=Sum('quantity'))
+        }
+        stock_rows = [
+            (product_id, stock_dict.get(product_id, 0), reorder_level)
+            for product_id, reorder_level in Product.objects.filter(is_active=True).values_list('id', 'reorder_level')
+        ]
     
-    # Get average prices per product
-    price_by_product = ReceiptItem.objects.values('product').annotate(
-        avg_price=Avg('unit_price')
-    )
-    price_dict = {
-        item['product']: Decimal(item['avg_price'] or 0)
-        for item in price_by_product
-    }
+    # Weighted-average unit cost per product (all warehouses)
+    price_dict = average_costs()
     
     # Categorize by health status
     healthy_value = Decimal('0.00')
@@ -838,15 +796,14 @@ def inventory_value_by_health(request):
     low_stock_count = 0
     out_of_stock_count = 0
     
-    for product in products:
-        total_stock = stock_dict.get(product.id, 0)
-        unit_price = price_dict.get(product.id, Decimal('0.00'))
+    for product_id, total_stock, reorder_level in stock_rows:
+        unit_price = price_dict.get(product_id, Decimal('0.00'))
         total_value = Decimal(total_stock) * unit_price
         
         if total_stock == 0:
             out_of_stock_value += total_value
             out_of_stock_count += 1
-        elif total_stock <= product.reorder_level:
+        elif total_stock <= reorder_level:
             low_stock_value += total_value
             low_stock_count += 1
         else:
@@ -872,6 +829,8 @@ def inventory_value_by_health(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+# Includes the caller's own anomaly notifications, so entries are per user.
+@cached_dashboard_view('anomalies', per_user=True, extra_tokens=(ANOMALIES,))
 def anomaly_feed(request):
     """Dynamic anomaly feed for the dashboard.
 
@@ -1072,16 +1031,7 @@ def anomaly_feed(request):
     stock_by_product = stock_qs.values('product').annotate(total_quantity=Sum('quantity'))
     stock_dict = {row['product']: (row['total_quantity'] or Decimal('0.00')) for row in stock_by_product}
 
-    price_qs = scope_queryset(
-        ReceiptItem.objects.all(),
-        user,
-        warehouse_fields=('receipt__warehouse',),
-    )
-    if warehouse_filter_id is not None:
-        price_qs = price_qs.filter(receipt__warehouse_id=warehouse_filter_id)
-
-    price_by_product = price_qs.values('product').annotate(avg_price=Avg('unit_price'))
-    price_dict = {row['product']: Decimal(row['avg_price'] or 0) for row in price_by_product}
+    price_dict = _scoped_average_costs(request, warehouse_filter_id)
 
     products = list(Product.objects.filter(is_active=True).values('id', 'name', 'sku', 'reorder_level'))
 
@@ -1259,13 +1209,16 @@ def anomaly_feed(request):
 def abc_xyz_analysis(request):
     """Combined ABC (value) + XYZ (demand variability) classification."""
     months = int(request.query_params.get('months', 6))
-    start_date = timezone.now() - timedelta(days=months * 30)
+    now = timezone.localtime()
+    start_date = now - timedelta(days=months * 30)
 
     # ABC portion reuses inventory value weighting
-    abc_products, _ = _compute_abc_dataset(request)
-    abc_lookup = {product['product_id']: product for product in abc_products}
-    abc_by_product = {pid: data['classification'] for pid, data in abc_lookup.items()}
+    axis, meta, _, _, values, abc_classes = _abc_columns(request)
 
+    # Monthly demand as a dense products x months matrix (months without
+    # deliveries count as zero demand)
+    first_period = start_date.year * 12 + start_date.month - 1
+    periods = now.year * 12 + now.month - first_period
     demand_rows = (
         scope_queryset(
             DeliveryItem.objects.filter(
@@ -1275,57 +1228,47 @@ def abc_xyz_analysis(request):
             request.user,
             warehouse_fields=('delivery__warehouse',),
         )
-        .annotate(month=TruncMonth('delivery__completed_at'))
-        .values('product_id', 'month')
+        .annotate(
+            year=ExtractYear('delivery__completed_at'),
+            month=ExtractMonth('delivery__completed_at'),
+        )
+        .values_list('product_id', 'year', 'month')
         .annotate(total=Sum('quantity'))
     )
-
-    demand_map: dict[int, list[float]] = defaultdict(list)
-    for row in demand_rows:
-        demand_map[row['product_id']].append(float(row['total'] or 0))
-
-    xyz_by_product = {}
-    for product_id, series in demand_map.items():
-        if not series:
-            xyz_by_product[product_id] = 'Z'
-            continue
-
-        avg = sum(series) / len(series)
-        if avg == 0:
-            xyz_by_product[product_id] = 'Z'
-            continue
-
-        std_dev = statistics.pstdev(series)
-        coefficient = std_dev / avg
-        if coefficient <= 0.5:
-            xyz = 'X'
-        elif coefficient <= 1:
-            xyz = 'Y'
-        else:
-            xyz = 'Z'
-        xyz_by_product[product_id] = xyz
-
-    matrix = defaultdict(lambda: {'count': 0, 'sample_products': []})
-    for product_id, abc_class in abc_by_product.items():
-        xyz_class = xyz_by_product.get(product_id, 'Z')
-        key = f"{abc_class}{xyz_class}"
-        entry = matrix[key]
-        entry['count'] += 1
-        if len(entry['sample_products']) < 3:
-            product_meta = abc_lookup.get(product_id, {})
-            entry['sample_products'].append({
-                'id': product_id,
-                'name': product_meta.get('product_name'),
-                'sku': product_meta.get('sku'),
-            })
-
-    matrix_payload = {key: value for key, value in matrix.items()}
+    demand = classification.demand_matrix(
+        axis,
+        first_period,
+        periods,
+        ((product_id, year * 12 + month - 1, total) for product_id, year, month, total in demand_rows),
+    )
+    xyz_classes, _ = classification.xyz_classify(demand)
+
+    # Cells list their highest-value products as samples
+    order = classification.value_order(values)
+    labels = np.char.add(abc_classes, xyz_classes)[order]
+    matrix_payload = {}
+    for key, count in zip(*np.unique(labels, return_counts=True)):
+        matrix_payload[str(key)] = {
+            'count': int(count),
+            'sample_products': [
+                {'id': meta[index][0], 'name': meta[index][1], 'sku': meta[index][2]}
+                for index in order[labels == key][:3].tolist()
+            ],
+        }
 
     return Response({
         'matrix': matrix_payload,
         'summary': {
-            'total_products': len(abc_by_product),
+            'total_products': len(axis),
             'months_analyzed': months,
         },
     })
 
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def dashboard_cache_stats(request):
+    """Response cache hit/miss counters per endpoint; DELETE resets them."""
+    if request.method == 'DELETE':
+        reset_cache_stats()
+    return Response(cache_stats())
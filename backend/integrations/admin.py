@@ -5,7 +5,7 @@ from .models import IntegrationEvent, WebhookConfiguration
 
 @admin.register(WebhookConfiguration)
 class WebhookConfigurationAdmin(admin.ModelAdmin):
-    list_display = ('name', 'url', 'is_active', 'created_at')
+    list_display = ('name', 'url', 'is_active', 'consecutive_failures', 'circuit_open_until', 'batch_window_seconds', 'created_at')
     search_fields = ('name', 'url')
     list_filter = ('is_active',)
     readonly_fields = ('created_at', 'updated_at')
@@ -13,7 +13,7 @@ class WebhookConfigurationAdmin(admin.ModelAdmin):
 
 @admin.register(IntegrationEvent)
 class IntegrationEventAdmin(admin.ModelAdmin):
-    list_display = ('event_type', 'webhook', 'status', 'created_at', 'sent_at', 'retry_count')
+    list_display = ('event_type', 'webhook', 'status', 'created_at', 'sent_at', 'retry_count', 'next_attempt_at')
     list_filter = ('status', 'event_type', 'webhook')
     search_fields = ('payload',)
     readonly_fields = ('payload', 'response_body', 'created_at', 'sent_at')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IntegrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'integrations'
+
+    def ready(self):
+        from . import subscriptions  # noqa: F401  (connects the invalidation signals)
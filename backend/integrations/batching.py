@@ -0,0 +1,108 @@
+"""Batch payloads for webhooks that opt into batched delivery.
+
+A batch is a JSON array of event envelopes. With coalescing enabled, all
+`stock_change` events in the batch collapse into one envelope holding the
+net quantity change and the latest balance per (product, warehouse).
+"""
+from __future__ import annotations
+
+from decimal import Decimal, InvalidOperation
+
+STOCK_CHANGE = 'stock_change'
+
+
+def _envelope(event) -> dict:
+    return {
+        'id': event.pk,
+        'event_type': event.event_type,
+        'created_at': event.created_at,
+        'payload': event.payload,
+    }
+
+
+def _decimal(value) -> Decimal:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        return Decimal('0')
+
+
+def _stock_moves(payload):
+    """(warehouse id, signed delta, balance_after or None, item) per stock move.
+
+    Transfer events list each line once, as its destination (transfer_in)
+    leg with a positive delta and the destination balance; the matching
+    decrement at `from_warehouse_id` is derived here, and its balance is not
+    reported.
+    """
+    is_transfer = 'from_warehouse_id' in payload and 'to_warehouse_id' in payload
+    for item in payload.get('items', []):
+        delta = _decimal(item.get('quantity_delta'))
+        if is_transfer:
+            yield payload['to_warehouse_id'], delta, item.get('balance_after'), item
+            yield payload['from_warehouse_id'], -delta, None, item
+        else:
+            yield item.get('warehouse_id', payload.get('warehouse_id')), delta, item.get('balance_after'), item
+
+
+def coalesce_stock_changes(events) -> dict:
+    """Net the item deltas of `stock_change` events per (product, warehouse).
+
+    Events are folded in creation order, so `balance_after` is the balance
+    reported by the most recent line for each key. Where an event doesn't
+    report it (a transfer's source warehouse), the last known balance is
+    carried forward by the delta, or left None if there is none.
+    """
+    changes = {}
+    document_numbers = []
+    sources = []
+    for event in sorted(events, key=lambda event: (event.created_at, event.pk)):
+        payload = event.payload
+        if payload.get('source') and payload['source'] not in sources:
+            sources.append(payload['source'])
+        if payload.get('document_number'):
+            document_numbers.append(payload['document_number'])
+        for warehouse_id, delta, balance_after, item in _stock_moves(payload):
+            key = (item.get('product_id'), warehouse_id)
+            change = changes.setdefault(key, {
+                'product_id': key[0],
+                'product_name': item.get('product_name'),
+                'warehouse_id': key[1],
+                'quantity_delta': Decimal('0'),
+                'balance_after': None,
+            })
+            change['quantity_delta'] += delta
+            if balance_after is not None:
+                change['balance_after'] = balance_after
+            elif change['balance_after'] is not None:
+                change['balance_after'] = str(_decimal(change['balance_after']) + delta)
+
+    return {
+        'coalesced': True,
+        'sources': sources,
+        'document_numbers': document_numbers,
+        'changes': [
+            {**change, 'quantity_delta': str(change['quantity_delta'])}
+            for change in changes.values()
+        ],
+    }
+
+
+def batch_payload(events, *, coalesce: bool = False) -> list[dict]:
+    """The array delivered for one batch of events to the same webhook."""
+    events = list(events)
+    if not coalesce:
+        return [_envelope(event) for event in events]
+
+    stock_changes = [event for event in events if event.event_type == STOCK_CHANGE]
+    body = [_envelope(event) for event in events if event.event_type != STOCK_CHANGE]
+    if stock_changes:
+        latest = max(stock_changes, key=lambda event: (event.created_at, event.pk))
+        body.append({
+            'id': latest.pk,
+            'event_type': STOCK_CHANGE,
+            'created_at': latest.created_at,
+            'event_ids': [event.pk for event in stock_changes],
+            'payload': coalesce_stock_changes(stock_changes),
+        })
+    return body
@@ -0,0 +1,63 @@
+"""Pooled HTTP client for webhook delivery.
+
+One requests.Session per partner host keeps connections alive between
+deliveries, so replaying a backlog to the same endpoint reuses a handful of
+TCP/TLS connections instead of opening one per event.
+"""
+from __future__ import annotations
+
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class WebhookClient:
+    """Thread-safe registry of keep-alive sessions, one per scheme+host."""
+
+    def __init__(self, *, pool_size: int | None = None, timeout: float | None = None):
+        self.pool_size = pool_size or getattr(settings, 'WEBHOOK_POOL_SIZE', 10)
+        self.timeout = timeout or getattr(settings, 'WEBHOOK_REQUEST_TIMEOUT', 6)
+        self._sessions: dict[tuple[str, str], requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    # Enough connections for every worker thread to hit this host at once.
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount(f'{parts.scheme}://', adapter)
+                    self._sessions[key] = session
+        return session
+
+    def post(self, url: str, body: bytes, headers: dict) -> requests.Response:
+        """POST pre-encoded bytes; the body is sent exactly as given."""
+        return self.session_for(url).post(url, data=body, headers=headers, timeout=self.timeout)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_client: WebhookClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_webhook_client() -> WebhookClient:
+    """Process-wide client shared by the delivery worker threads."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WebhookClient()
+    return _client
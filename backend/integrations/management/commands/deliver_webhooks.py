@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from integrations.services import deliver_pending_events
+
+
+class Command(BaseCommand):
+    help = "Deliver queued webhook events (IntegrationEvent outbox) with a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent deliveries (default: 8).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Events claimed per round (default: 100).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the outbox is empty (default: 2).',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the outbox once and exit instead of polling forever.',
+        )
+
+    def handle(self, *args, **options):
+        totals = {'claimed': 0, 'sent': 0, 'failed': 0}
+        try:
+            while True:
+                stats = deliver_pending_events(limit=options['batch_size'], workers=options['workers'])
+                for key, value in stats.items():
+                    totals[key] += value
+                if stats['claimed']:
+                    self.stdout.write(f"Delivered {stats['sent']}/{stats['claimed']} events ({stats['failed']} failed).")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Webhook worker stopped: {totals['sent']} sent, {totals['failed']} failed."
+        ))
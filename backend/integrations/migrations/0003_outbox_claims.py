@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_auto_20251129_1301'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integrationevent',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='integrationevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('retrying', 'Retrying')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='integrationevent',
+            index=models.Index(fields=['status', 'created_at'], name='integration_status_a20357_idx'),
+        ),
+    ]
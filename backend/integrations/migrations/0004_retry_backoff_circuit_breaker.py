@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0003_outbox_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integrationevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookconfiguration',
+            name='circuit_open_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookconfiguration',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='integrationevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('retrying', 'Retrying'), ('dead', 'Dead Letter')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='integrationevent',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='integration_status_e5ecda_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0004_retry_backoff_circuit_breaker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookconfiguration',
+            name='batch_max_events',
+            field=models.PositiveIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='webhookconfiguration',
+            name='batch_window_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Seconds to accumulate events into one request. 0 = send each event on its own.'),
+        ),
+        migrations.AddField(
+            model_name='webhookconfiguration',
+            name='coalesce_stock_changes',
+            field=models.BooleanField(default=False, help_text='In batches, merge stock_change events into a net delta per product and warehouse.'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:52
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def raise_zero_batch_limits(apps, schema_editor):
+    # A limit of 0 never let a batching webhook's events be claimed.
+    WebhookConfiguration = apps.get_model('integrations', 'WebhookConfiguration')
+    WebhookConfiguration.objects.filter(batch_max_events=0).update(batch_max_events=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0005_webhook_batching'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookconfiguration',
+            name='batch_max_events',
+            field=models.PositiveIntegerField(default=100, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(raise_zero_batch_limits, reverse_code=migrations.RunPython.noop),
+    ]
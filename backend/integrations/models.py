@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
 
 
@@ -35,6 +36,23 @@ class WebhookConfiguration(models.Model):
         on_delete=models.SET_NULL,
         related_name='created_webhooks',
     )
+
+    # Circuit breaker: after repeated failures delivery pauses until
+    # circuit_open_until, then resumes with a single probe event.
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    circuit_open_until = models.DateTimeField(null=True, blank=True)
+
+    # Opt-in batching: hold events until the oldest is batch_window_seconds
+    # old or batch_max_events are queued, then send them as one array.
+    batch_window_seconds = models.PositiveIntegerField(
+        default=0,
+        help_text="Seconds to accumulate events into one request. 0 = send each event on its own.",
+    )
+    batch_max_events = models.PositiveIntegerField(default=100, validators=[MinValueValidator(1)])
+    coalesce_stock_changes = models.BooleanField(
+        default=False,
+        help_text="In batches, merge stock_change events into a net delta per product and warehouse.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -44,6 +62,10 @@ class WebhookConfiguration(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def batches_events(self) -> bool:
+        return self.batch_window_seconds > 0
+
     def supports_event(self, event_type: str) -> bool:
         """Return True if this webhook is configured for the given event."""
         if not self.event_types:
@@ -56,11 +78,16 @@ class IntegrationEvent(models.Model):
 
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
         ('retrying', 'Retrying'),
+        ('dead', 'Dead Letter'),
     ]
 
+    # Statuses the delivery worker picks up (see services.claim_events)
+    DELIVERABLE_STATUSES = ('pending', 'retrying')
+
     webhook = models.ForeignKey(
         WebhookConfiguration,
         on_delete=models.CASCADE,
@@ -74,12 +101,19 @@ class IntegrationEvent(models.Model):
     retry_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     sent_at = models.DateTimeField(null=True, blank=True)
+    # Set while a delivery worker owns the event; an expired claim is
+    # picked up again, so a crashed worker never strands an event.
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    # Earliest time a retry may be attempted (exponential backoff)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['webhook', 'status']),
             models.Index(fields=['event_type', '-created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'next_attempt_at']),
         ]
 
     def mark_attempt(
@@ -89,6 +123,7 @@ class IntegrationEvent(models.Model):
         response_status: int | None = None,
         response_body: str | None = None,
         increment_retry: bool = False,
+        next_attempt_at=None,
     ):
         """Update status/response metadata after a delivery attempt."""
         from django.utils import timezone
@@ -96,6 +131,8 @@ class IntegrationEvent(models.Model):
         self.status = status
         self.response_status_code = response_status
         self.response_body = response_body or ''
+        self.claimed_until = None
+        self.next_attempt_at = next_attempt_at
         if status == 'sent':
             self.sent_at = timezone.now()
         if increment_retry:
@@ -106,4 +143,6 @@ class IntegrationEvent(models.Model):
             'response_body',
             'sent_at',
             'retry_count',
+            'claimed_until',
+            'next_attempt_at',
         ])
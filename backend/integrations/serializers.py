@@ -12,7 +12,7 @@ class WebhookConfigurationSerializer(serializers.ModelSerializer):
     class Meta:
         model = WebhookConfiguration
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at', 'created_by')
+        read_only_fields = ('created_at', 'updated_at', 'created_by', 'consecutive_failures', 'circuit_open_until')
         extra_kwargs = {
             # Never return the shared secret in API responses
             'secret': {'write_only': True},
@@ -25,5 +25,5 @@ class IntegrationEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = IntegrationEvent
         fields = '__all__'
-        read_only_fields = ('created_at', 'sent_at', 'retry_count')
+        read_only_fields = ('created_at', 'sent_at', 'retry_count', 'claimed_until', 'next_attempt_at')
 
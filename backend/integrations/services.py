@@ -1,88 +1,358 @@
 import hashlib
 import hmac
 import json
+import random
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from queue import Empty, SimpleQueue
 from typing import Iterable, Sequence
 
 import requests
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Min, Q
 from django.utils import timezone
 
+from .batching import batch_payload
+from .client import get_webhook_client
 from .models import IntegrationEvent, WebhookConfiguration
+from .subscriptions import subscribed_webhook_ids
 
-REQUEST_TIMEOUT = 6  # seconds
+# How long a worker owns claimed events; must comfortably exceed WEBHOOK_REQUEST_TIMEOUT.
+CLAIM_LEASE = timedelta(seconds=60)
 SIGNATURE_HEADER = 'X-StockMaster-Signature'
 EVENT_HEADER = 'X-StockMaster-Event'
+BATCH_SIZE_HEADER = 'X-StockMaster-Batch-Size'
 
 
-def _sign_payload(secret: str, payload: dict) -> str:
-    """Return HMAC-SHA256 signature for payload."""
-    encoded = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
-    digest = hmac.new(secret.encode('utf-8'), encoded, hashlib.sha256).hexdigest()
-    return digest
+def encode_payload(payload: dict) -> bytes:
+    """Serialize a payload once; these bytes are both signed and sent."""
+    return json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
 
 
-def _deliver(event: IntegrationEvent) -> tuple[bool, str]:
-    """Send webhook payload synchronously and update event state."""
-    payload = event.payload
-    webhook = event.webhook
-    headers = {
+def _sign_payload(secret: str, body: bytes) -> str:
+    """Return HMAC-SHA256 signature for the encoded body."""
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def backoff_delay(attempt: int) -> timedelta:
+    """Delay before retry number `attempt` (1-based): exponential, capped, jittered.
+
+    Half the delay is fixed and half is random ("equal jitter"), so retries
+    after a shared outage spread out instead of arriving together.
+    """
+    base = _setting('WEBHOOK_BACKOFF_BASE_SECONDS', 30)
+    cap = _setting('WEBHOOK_BACKOFF_MAX_SECONDS', 6 * 3600)
+    delay = min(cap, base * 2 ** max(attempt - 1, 0))
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def _close_circuit(webhook: WebhookConfiguration) -> None:
+    WebhookConfiguration.objects.filter(pk=webhook.pk, consecutive_failures__gt=0).update(
+        consecutive_failures=0,
+        circuit_open_until=None,
+    )
+
+
+def _trip_circuit(webhook: WebhookConfiguration):
+    """Count a failure; returns the pause end if the circuit is now open."""
+    WebhookConfiguration.objects.filter(pk=webhook.pk).update(consecutive_failures=F('consecutive_failures') + 1)
+    open_until = timezone.now() + timedelta(seconds=_setting('WEBHOOK_CIRCUIT_COOLDOWN_SECONDS', 300))
+    tripped = WebhookConfiguration.objects.filter(
+        pk=webhook.pk,
+        consecutive_failures__gte=_setting('WEBHOOK_CIRCUIT_THRESHOLD', 5),
+    ).update(circuit_open_until=open_until)
+    return open_until if tripped else None
+
+
+def _record_failure(event: IntegrationEvent, response_status: int | None, response_body: str) -> None:
+    attempts = event.retry_count + 1
+    if attempts >= _setting('WEBHOOK_MAX_ATTEMPTS', 8):
+        status, next_attempt_at = 'dead', None
+    else:
+        status, next_attempt_at = 'retrying', timezone.now() + backoff_delay(attempts)
+    event.mark_attempt(
+        status=status,
+        response_status=response_status,
+        response_body=response_body,
+        increment_retry=True,
+        next_attempt_at=next_attempt_at,
+    )
+
+
+def _record_success(events: list[IntegrationEvent], response_status: int, response_body: str) -> None:
+    if len(events) == 1:
+        events[0].mark_attempt(status='sent', response_status=response_status, response_body=response_body)
+        return
+    IntegrationEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+        status='sent',
+        sent_at=timezone.now(),
+        response_status_code=response_status,
+        response_body=response_body,
+        claimed_until=None,
+        next_attempt_at=None,
+    )
+
+
+def _defer(events: list[IntegrationEvent], until) -> None:
+    """Hand claimed events back untried, e.g. because their circuit opened."""
+    IntegrationEvent.objects.filter(pk__in=[event.pk for event in events], status='sending').update(
+        status='retrying',
+        claimed_until=None,
+        next_attempt_at=until,
+    )
+
+
+def _request(events: list[IntegrationEvent]) -> tuple[bytes, dict]:
+    webhook = events[0].webhook
+    if webhook.batches_events:
+        body = encode_payload(batch_payload(events, coalesce=webhook.coalesce_stock_changes))
+        headers = {EVENT_HEADER: 'batch', BATCH_SIZE_HEADER: str(len(events))}
+    else:
+        body = encode_payload(events[0].payload)
+        headers = {EVENT_HEADER: events[0].event_type}
+    headers.update({
         'Content-Type': 'application/json',
-        EVENT_HEADER: event.event_type,
-        SIGNATURE_HEADER: _sign_payload(webhook.secret, payload),
-    }
+        SIGNATURE_HEADER: _sign_payload(webhook.secret, body),
+    })
+    return body, headers
+
+
+def deliver_events(events: list[IntegrationEvent], open_circuits: dict | None = None) -> list[tuple[bool, str]]:
+    """Send one request for `events` (all for the same webhook) and record the outcome.
+
+    Batching webhooks get the events as one array payload; otherwise
+    `events` holds a single event. `open_circuits` ({webhook id: paused
+    until}) is shared by the requests of one worker round: once a webhook's
+    circuit opens, its remaining events are deferred instead of being sent
+    to an endpoint that is down.
+    """
+    webhook = events[0].webhook
+    if open_circuits is not None and webhook.pk in open_circuits:
+        _defer(events, open_circuits[webhook.pk])
+        return [(False, 'Circuit open; delivery deferred')] * len(events)
 
+    body, headers = _request(events)
     try:
-        response = requests.post(
-            webhook.url,
-            json=payload,
-            headers=headers,
-            timeout=REQUEST_TIMEOUT,
-        )
+        response = get_webhook_client().post(webhook.url, body, headers)
+    except requests.RequestException as exc:
+        status_code, body_text, message = None, str(exc), str(exc)
+    else:
         if response.ok:
-            event.mark_attempt(
-                status='sent',
-                response_status=response.status_code,
-                response_body=response.text[:2000],
-            )
-            return True, 'Delivered successfully'
-
-        event.mark_attempt(
-            status='failed',
-            response_status=response.status_code,
-            response_body=response.text[:2000],
-            increment_retry=True,
-        )
-        return False, f'Webhook returned HTTP {response.status_code}'
+            _record_success(events, response.status_code, response.text[:2000])
+            _close_circuit(webhook)
+            return [(True, 'Delivered successfully')] * len(events)
+        status_code, body_text = response.status_code, response.text[:2000]
+        message = f'Webhook returned HTTP {response.status_code}'
+
+    for event in events:
+        _record_failure(event, status_code, body_text)
+    open_until = _trip_circuit(webhook)
+    if open_until is not None and open_circuits is not None:
+        open_circuits[webhook.pk] = open_until
+    return [(False, message)] * len(events)
 
-    except requests.RequestException as exc:
-        event.mark_attempt(
-            status='failed',
-            response_status=None,
-            response_body=str(exc),
-            increment_retry=True,
-        )
-        return False, str(exc)
+
+def deliver_event(event: IntegrationEvent, open_circuits: dict | None = None) -> tuple[bool, str]:
+    """Send one webhook event and record the outcome on it."""
+    return deliver_events([event], open_circuits)[0]
 
 
 def emit_event(event_type: str, payload: dict, webhooks: Sequence[WebhookConfiguration] | None = None):
-    """Persist an IntegrationEvent per matching webhook and deliver immediately."""
+    """Queue an IntegrationEvent per matching webhook (transactional outbox).
+
+    Only writes 'pending' rows, inside the caller's transaction, so the events
+    commit or roll back with the change they describe. Delivery happens in the
+    `deliver_webhooks` worker, keeping partner endpoints off the request path.
+    Subscribers come from the in-process subscription index, so an event with
+    no subscribers costs no queries.
+    """
+    return emit_events(event_type, [payload], webhooks)
+
+
+def emit_events(event_type: str, payloads: Iterable[dict], webhooks: Sequence[WebhookConfiguration] | None = None):
+    """Like emit_event() for several payloads of one type, in a single insert.
+
+    Each payload still becomes its own event, so subscribers see exactly what
+    emit_event() would have sent for it.
+    """
     if webhooks is None:
-        webhooks = WebhookConfiguration.objects.filter(is_active=True)
+        webhook_ids = subscribed_webhook_ids(event_type)
+    else:
+        webhook_ids = [webhook.pk for webhook in webhooks if webhook.supports_event(event_type)]
+    if not webhook_ids:
+        return []
+
+    events = [
+        IntegrationEvent(webhook_id=webhook_id, event_type=event_type, payload=payload, status='pending')
+        for payload in payloads
+        for webhook_id in webhook_ids
+    ]
+    if not events:
+        return []
+    # A savepoint, so a failed insert cannot poison the caller's transaction.
+    with transaction.atomic():
+        return IntegrationEvent.objects.bulk_create(events)
+
 
-    for webhook in webhooks:
-        if not webhook.supports_event(event_type):
-            continue
+def _ready_batches(deliverable: Q, now) -> set:
+    """Batching webhooks whose queue has hit its size or its window has elapsed."""
+    queues = (
+        IntegrationEvent.objects.filter(deliverable, webhook__batch_window_seconds__gt=0)
+        .order_by()
+        .values('webhook_id', 'webhook__batch_window_seconds', 'webhook__batch_max_events')
+        .annotate(oldest=Min('created_at'), queued=Count('id'))
+    )
+    return {
+        queue['webhook_id']
+        for queue in queues
+        if queue['queued'] >= queue['webhook__batch_max_events']
+        or queue['oldest'] <= now - timedelta(seconds=queue['webhook__batch_window_seconds'])
+    }
+
+
+def claim_events(limit: int = 100) -> list[IntegrationEvent]:
+    """Claim up to `limit` deliverable events for this worker.
+
+    Candidates are locked with SKIP LOCKED where the database supports it,
+    and the claim itself is a conditional UPDATE, so concurrent workers
+    never deliver the same event twice (even on SQLite, where row locks are
+    a no-op). Events whose previous claim expired are reclaimed.
 
-        event = IntegrationEvent.objects.create(
-            webhook=webhook,
-            event_type=event_type,
-            payload=payload,
-            status='pending',
+    Retries wait for their `next_attempt_at`. Webhooks with an open circuit
+    are skipped, and once the pause ends only one probe request per webhook
+    is claimed until a delivery succeeds. Batching webhooks are only claimed
+    once their batch is ready, at most `batch_max_events` at a time.
+    """
+    now = timezone.now()
+    deliverable = (
+        Q(status__in=IntegrationEvent.DELIVERABLE_STATUSES)
+        & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        & ~Q(webhook__circuit_open_until__gt=now)
+    )
+    claimed_until = now + CLAIM_LEASE
+    threshold = _setting('WEBHOOK_CIRCUIT_THRESHOLD', 5)
+
+    with transaction.atomic():
+        claimable = (
+            deliverable & (Q(webhook__batch_window_seconds=0) | Q(webhook_id__in=_ready_batches(deliverable, now)))
+        ) | Q(status='sending', claimed_until__lt=now)
+        rows = (
+            IntegrationEvent.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(claimable)
+            .order_by('created_at')
+            .values_list(
+                'pk',
+                'webhook_id',
+                'webhook__consecutive_failures',
+                'webhook__batch_window_seconds',
+                'webhook__batch_max_events',
+            )[:limit]
+        )
+        candidates = []
+        per_webhook = defaultdict(int)
+        for pk, webhook_id, failures, batch_window, batch_max in rows:
+            # One request per half-open webhook: a single event, or one batch.
+            if batch_window:
+                cap = batch_max
+            else:
+                cap = 1 if failures >= threshold else None
+            if cap is not None and per_webhook[webhook_id] >= cap:
+                continue
+            per_webhook[webhook_id] += 1
+            candidates.append(pk)
+        if not candidates:
+            return []
+        IntegrationEvent.objects.filter(claimable, pk__in=candidates).update(
+            status='sending',
+            claimed_until=claimed_until,
         )
-        _deliver(event)
+    return list(
+        IntegrationEvent.objects.select_related('webhook')
+        .filter(pk__in=candidates, status='sending', claimed_until=claimed_until)
+        .order_by('created_at')
+    )
+
+
+def _requests(events: list[IntegrationEvent]) -> list[list[IntegrationEvent]]:
+    """Group claimed events into requests: one per event, one per batch."""
+    grouped = []
+    batches = {}
+    for event in events:
+        if event.webhook.batches_events:
+            batches.setdefault(event.webhook_id, []).append(event)
+        else:
+            grouped.append([event])
+    return grouped + list(batches.values())
+
+
+def _drain(queue: SimpleQueue, open_circuits: dict) -> list[tuple[bool, str]]:
+    """Worker thread: send requests from the shared queue until it is empty."""
+    outcomes = []
+    try:
+        while True:
+            try:
+                events = queue.get_nowait()
+            except Empty:
+                return outcomes
+            outcomes.extend(deliver_events(events, open_circuits))
+    finally:
+        # Pool threads get their own connections; don't leak them.
+        connections.close_all()
+
+
+def deliver_pending_events(*, limit: int = 100, workers: int = 8) -> dict:
+    """Claim one round of events and deliver them concurrently.
+
+    Returns {'claimed': n, 'sent': n, 'failed': n}.
+    """
+    events = claim_events(limit)
+    if not events:
+        return {'claimed': 0, 'sent': 0, 'failed': 0}
+
+    open_circuits = {}
+    pending = _requests(events)
+    if workers <= 1:
+        outcomes = [outcome for request in pending for outcome in deliver_events(request, open_circuits)]
+    else:
+        queue = SimpleQueue()
+        for request in pending:
+            queue.put(request)
+        workers = min(workers, len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = [pool.submit(_drain, queue, open_circuits) for _ in range(workers)]
+            outcomes = [outcome for result in results for outcome in result.result()]
+
+    sent = sum(1 for success, _ in outcomes if success)
+    return {'claimed': len(events), 'sent': sent, 'failed': len(events) - sent}
 
 
 def resend_event(event: IntegrationEvent) -> tuple[bool, str]:
-    """Manually retry a historical event."""
+    """Queue a historical event for another delivery attempt."""
+    if event.status == 'sending':
+        return False, 'Event is being delivered'
     event.mark_attempt(status='retrying', increment_retry=True)
-    return _deliver(event)
+    return True, 'Event queued for redelivery'
+
+
+REPLAYABLE_STATUSES = ('failed', 'dead')
+
+
+def replay_events(events) -> int:
+    """Re-queue a range of events (a queryset) with a fresh attempt budget.
 
+    Only failed/dead-lettered events are replayed. They go through the
+    normal worker, so circuit breakers and batch limits still pace them.
+    Returns the number of events queued.
+    """
+    return events.filter(status__in=REPLAYABLE_STATUSES).update(
+        status='retrying',
+        retry_count=0,
+        next_attempt_at=None,
+        claimed_until=None,
+    )
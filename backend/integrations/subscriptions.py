@@ -0,0 +1,112 @@
+"""In-process index of which active webhooks subscribe to which event types.
+
+emit_event() runs on every document validation, so instead of loading and
+filtering every WebhookConfiguration each time it looks the event type up in
+an index built once per process. The index is tagged with a version counter
+kept in Django's cache; saving or deleting a webhook bumps the counter and
+every process rebuilds on its next emit. Processes only see each other's
+bumps with a shared cache backend (file/Redis in CACHES); with the default
+local-memory cache each process invalidates only itself. Either way an index
+older than WEBHOOK_SUBSCRIPTION_MAX_AGE_SECONDS is rebuilt, which bounds how
+long another process (or a queryset update, which sends no signal) can go
+unnoticed.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import WebhookConfiguration
+
+VERSION_KEY = 'integrations:webhook-subscriptions:version'
+
+_lock = threading.Lock()
+# (version, built at (monotonic), {event_type: webhook ids}, webhook ids subscribed to everything)
+_index: tuple | None = None
+
+
+def _cache():
+    return caches[getattr(settings, 'WEBHOOK_SUBSCRIPTION_CACHE_ALIAS', 'default')]
+
+
+def _max_age() -> float:
+    return getattr(settings, 'WEBHOOK_SUBSCRIPTION_MAX_AGE_SECONDS', 30)
+
+
+def _stale(index, version) -> bool:
+    return index is None or index[0] != version or time.monotonic() - index[1] >= _max_age()
+
+
+def subscription_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump() -> None:
+    cache = _cache()
+    # Restart from the clock if evicted, so an old version never comes back.
+    cache.add(VERSION_KEY, time.time_ns(), None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_subscriptions() -> None:
+    """Drop every process's index once the current transaction commits."""
+    transaction.on_commit(_bump)
+
+
+def reset_subscription_index() -> None:
+    """Forget this process's index; the next emit rebuilds it."""
+    global _index
+    _index = None
+
+
+def _build():
+    by_event: dict[str, tuple] = {}
+    wildcard = []
+    rows = WebhookConfiguration.objects.filter(is_active=True).order_by('pk').values_list('pk', 'event_types')
+    for pk, event_types in rows:
+        if not event_types:
+            # An empty list means every event.
+            wildcard.append(pk)
+            continue
+        for event_type in set(event_types):
+            by_event[event_type] = by_event.get(event_type, ()) + (pk,)
+    wildcard = tuple(wildcard)
+    return {event_type: tuple(sorted(pks + wildcard)) for event_type, pks in by_event.items()}, wildcard
+
+
+def subscribed_webhook_ids(event_type: str) -> tuple:
+    """Ids of the active webhooks that receive `event_type`."""
+    global _index
+    # Read the version before the rows: a change committed in between bumps
+    # past it, so the next call rebuilds instead of keeping a stale index.
+    version = subscription_version()
+    index = _index
+    if _stale(index, version):
+        with _lock:
+            index = _index
+            if _stale(index, version):
+                built_at = time.monotonic()
+                index = (version, built_at, *_build())
+                _index = index
+    _, _, by_event, wildcard = index
+    return by_event.get(event_type, wildcard)
+
+
+@receiver(post_save, sender=WebhookConfiguration, dispatch_uid='integrations.webhook_saved')
+@receiver(post_delete, sender=WebhookConfiguration, dispatch_uid='integrations.webhook_deleted')
+def _webhook_changed(sender, **kwargs):
+    invalidate_subscriptions()
@@ -1,3 +1,274 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from .batching import batch_payload
+from .client import WebhookClient
+from .models import IntegrationEvent, WebhookConfiguration
+from .serializers import WebhookConfigurationSerializer
+from .services import BATCH_SIZE_HEADER, SIGNATURE_HEADER, _sign_payload, claim_events, deliver_pending_events, emit_event
+from .subscriptions import reset_subscription_index
+
+
+class WebhookTestCase(TestCase):
+    def setUp(self):
+        # The subscription index is per process; don't let it outlive a test's webhooks.
+        reset_subscription_index()
+        self.addCleanup(reset_subscription_index)
+
+
+class WebhookOutboxTests(WebhookTestCase):
+    def setUp(self):
+        super().setUp()
+        self.webhook = WebhookConfiguration.objects.create(
+            name='Partner',
+            url='https://partner.example.com/hook',
+            secret='s3cret',
+            event_types=['receipt_completed'],
+        )
+        WebhookConfiguration.objects.create(
+            name='Other',
+            url='https://other.example.com/hook',
+            secret='s3cret',
+            event_types=['delivery_completed'],
+        )
+
+    def test_subscription_index_serves_emits_without_queries(self):
+        emit_event('receipt_completed', {'document_number': 'REC-000001'})
+        with self.assertNumQueries(0):
+            emit_event('adjustment_completed', {'document_number': 'ADJ-000001'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            catch_all = WebhookConfiguration.objects.create(
+                name='Warehouse', url='https://wms.example.com/hook', secret='s3cret',
+            )
+        emit_event('adjustment_completed', {'document_number': 'ADJ-000002'})
+        self.assertEqual(
+            list(IntegrationEvent.objects.filter(event_type='adjustment_completed').values_list('webhook', flat=True)),
+            [catch_all.pk],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.webhook.is_active = False
+            self.webhook.save()
+        self.assertEqual(emit_event('receipt_completed', {'document_number': 'REC-000002'})[0].webhook_id, catch_all.pk)
+
+    def test_subscription_index_expires_without_an_invalidation(self):
+        emit_event('adjustment_completed', {'document_number': 'ADJ-000001'})
+        # As if created by another process: no signal reaches this one's index.
+        WebhookConfiguration.objects.bulk_create([WebhookConfiguration(
+            name='Warehouse', url='https://wms.example.com/hook', secret='s3cret',
+        )])
+        self.assertEqual(emit_event('adjustment_completed', {'document_number': 'ADJ-000002'}), [])
+
+        with override_settings(WEBHOOK_SUBSCRIPTION_MAX_AGE_SECONDS=0):
+            self.assertEqual(len(emit_event('adjustment_completed', {'document_number': 'ADJ-000003'})), 1)
+
+    def test_emit_only_queues_matching_events(self):
+        with mock.patch.object(WebhookClient, 'post') as post:
+            emit_event('receipt_completed', {'document_number': 'REC-000001'})
+
+        post.assert_not_called()
+        event = IntegrationEvent.objects.get()
+        self.assertEqual((event.webhook, event.status), (self.webhook, 'pending'))
+
+    def test_worker_claims_each_event_once_and_records_outcome(self):
+        emit_event('receipt_completed', {'document_number': 'REC-000001'})
+        emit_event('receipt_completed', {'document_number': 'REC-000002'})
+
+        response = mock.Mock(ok=True, status_code=200, text='ok')
+        with mock.patch.object(WebhookClient, 'post', return_value=response) as post:
+            stats = deliver_pending_events(limit=10, workers=1)
+
+        self.assertEqual(stats, {'claimed': 2, 'sent': 2, 'failed': 0})
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(set(IntegrationEvent.objects.values_list('status', flat=True)), {'sent'})
+        self.assertEqual(claim_events(), [])
+
+    def test_signature_covers_the_exact_bytes_sent(self):
+        emit_event('receipt_completed', {'document_number': 'REC-000001', 'quantity': '1.50'})
+
+        response = mock.Mock(ok=True, status_code=200, text='ok')
+        with mock.patch.object(WebhookClient, 'post', return_value=response) as post:
+            deliver_pending_events(workers=1)
+
+        url, body, headers = post.call_args.args
+        self.assertEqual(url, self.webhook.url)
+        self.assertEqual(json.loads(body), {'document_number': 'REC-000001', 'quantity': '1.50'})
+        self.assertEqual(headers[SIGNATURE_HEADER], _sign_payload('s3cret', body))
+
+    def test_client_reuses_one_session_per_host(self):
+        client = WebhookClient(pool_size=4)
+        first = client.session_for('https://partner.example.com/a')
+        self.assertIs(client.session_for('https://partner.example.com/b'), first)
+        self.assertIsNot(client.session_for('https://other.example.com/a'), first)
+        self.assertEqual(first.get_adapter('https://partner.example.com/a')._pool_maxsize, 4)
+        client.close()
+
+
+@override_settings(WEBHOOK_MAX_ATTEMPTS=3, WEBHOOK_CIRCUIT_THRESHOLD=2, WEBHOOK_CIRCUIT_COOLDOWN_SECONDS=300)
+class WebhookRetryTests(WebhookTestCase):
+    def setUp(self):
+        super().setUp()
+        self.webhook = WebhookConfiguration.objects.create(
+            name='Partner', url='https://partner.example.com/hook', secret='s3cret',
+        )
+        self.failure = mock.Mock(ok=False, status_code=503, text='down')
+
+    def _deliver(self, response, **kwargs):
+        with mock.patch.object(WebhookClient, 'post', return_value=response) as post:
+            stats = deliver_pending_events(workers=1, **kwargs)
+        return stats, post.call_count
+
+    def test_failures_back_off_then_dead_letter(self):
+        emit_event('stock_change', {'n': 1})
+        self._deliver(self.failure)
+
+        event = IntegrationEvent.objects.get()
+        self.assertEqual((event.status, event.retry_count), ('retrying', 1))
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertEqual(claim_events(), [])
+
+        WebhookConfiguration.objects.update(consecutive_failures=0)
+        IntegrationEvent.objects.update(next_attempt_at=None, retry_count=2)
+        self._deliver(self.failure)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.retry_count, event.next_attempt_at), ('dead', 3, None))
+
+    def test_circuit_opens_defers_batch_and_probes_once(self):
+        for n in range(5):
+            emit_event('stock_change', {'n': n})
+
+        stats, calls = self._deliver(self.failure)
+        self.assertEqual((stats['claimed'], calls), (5, 2))
+        self.webhook.refresh_from_db()
+        self.assertGreater(self.webhook.circuit_open_until, timezone.now())
+        self.assertEqual(IntegrationEvent.objects.filter(retry_count=0, status='retrying').count(), 3)
+        self.assertEqual(claim_events(), [])
+
+        # Cooldown over: a single probe goes out, and its success closes the circuit.
+        WebhookConfiguration.objects.update(circuit_open_until=timezone.now())
+        IntegrationEvent.objects.update(next_attempt_at=None)
+        ok = mock.Mock(ok=True, status_code=200, text='ok')
+        self.assertEqual(self._deliver(ok), ({'claimed': 1, 'sent': 1, 'failed': 0}, 1))
+        self.assertEqual(self._deliver(ok)[0]['sent'], 4)
+
+    def test_replay_requeues_dead_letters_in_range(self):
+        for n in range(3):
+            emit_event('stock_change', {'n': n})
+        events = list(IntegrationEvent.objects.order_by('pk'))
+        IntegrationEvent.objects.update(status='dead', retry_count=3)
+
+        admin = User.objects.create_user(
+            email='admin@example.com', username='Admin', password='StrongPass123!', role='admin',
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        res = client.post(
+            '/api/integrations/events/replay/',
+            {'status': 'dead', 'from_id': events[1].pk},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual(res.data['queued'], 2)
+        self.assertEqual(
+            list(IntegrationEvent.objects.order_by('pk').values_list('status', 'retry_count')),
+            [('dead', 3), ('retrying', 0), ('retrying', 0)],
+        )
+
+
+class WebhookBatchingTests(WebhookTestCase):
+    def setUp(self):
+        super().setUp()
+        self.webhook = WebhookConfiguration.objects.create(
+            name='Partner',
+            url='https://partner.example.com/hook',
+            secret='s3cret',
+            batch_window_seconds=60,
+            batch_max_events=3,
+            coalesce_stock_changes=True,
+        )
+        self.ok = mock.Mock(ok=True, status_code=200, text='ok')
+
+    def _stock_change(self, document_number, delta, balance, warehouse_id=1):
+        emit_event('stock_change', {
+            'document_number': document_number,
+            'warehouse_id': warehouse_id,
+            'source': 'delivery',
+            'items': [{'product_id': 7, 'product_name': 'Widget', 'quantity_delta': delta, 'balance_after': balance}],
+        })
+
+    def test_batch_size_must_be_positive(self):
+        serializer = WebhookConfigurationSerializer(
+            self.webhook, data={'batch_max_events': 0}, partial=True,
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('batch_max_events', serializer.errors)
+
+    def test_events_wait_for_the_window_or_size(self):
+        self._stock_change('DEL-000001', '-1.00', '9.00')
+        self.assertEqual(claim_events(), [])
+
+        IntegrationEvent.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(len(claim_events()), 1)
+
+    def test_batch_is_one_signed_request_with_coalesced_stock_changes(self):
+        self._stock_change('DEL-000001', '-1.00', '9.00')
+        emit_event('delivery_completed', {'document_number': 'DEL-000001'})
+        self._stock_change('DEL-000002', '-2.50', '6.50')
+        self._stock_change('DEL-000003', '-1.00', '5.50')
+
+        with mock.patch.object(WebhookClient, 'post', return_value=self.ok) as post:
+            stats = deliver_pending_events(workers=1)
+
+        # Size limit reached with three events; the fourth waits for the next batch.
+        self.assertEqual(stats, {'claimed': 3, 'sent': 3, 'failed': 0})
+        self.assertEqual(post.call_count, 1)
+        _, body, headers = post.call_args.args
+        self.assertEqual(headers[SIGNATURE_HEADER], _sign_payload('s3cret', body))
+        self.assertEqual(headers[BATCH_SIZE_HEADER], '3')
+
+        envelopes = json.loads(body)
+        self.assertEqual([envelope['event_type'] for envelope in envelopes], ['delivery_completed', 'stock_change'])
+        coalesced = envelopes[1]['payload']
+        self.assertEqual(coalesced['document_numbers'], ['DEL-000001', 'DEL-000002'])
+        self.assertEqual(coalesced['changes'], [{
+            'product_id': 7, 'product_name': 'Widget', 'warehouse_id': 1,
+            'quantity_delta': '-3.50', 'balance_after': '6.50',
+        }])
+        self.assertEqual(IntegrationEvent.objects.filter(status='pending').count(), 1)
+
+    def test_transfer_and_receipt_coalesce_per_warehouse(self):
+        # Transfer events keep their published shape: one destination item per line.
+        emit_event('stock_change', {
+            'document_number': 'INT-000001',
+            'from_warehouse_id': 1,
+            'to_warehouse_id': 2,
+            'source': 'transfer',
+            'items': [{
+                'product_id': 7, 'product_name': 'Widget', 'quantity_delta': '4.00', 'balance_after': '4.00',
+                'destination_bin_id': None, 'destination_bin_code': None,
+            }],
+        })
+        emit_event('stock_change', {
+            'document_number': 'REC-000001',
+            'warehouse_id': 2,
+            'source': 'receipt',
+            'items': [{'product_id': 7, 'product_name': 'Widget', 'quantity_delta': '3.00', 'balance_after': '7.00'}],
+        })
+
+        coalesced = batch_payload(IntegrationEvent.objects.all(), coalesce=True)[0]['payload']
+        self.assertEqual(coalesced['sources'], ['transfer', 'receipt'])
+        self.assertEqual(coalesced['changes'], [
+            {'product_id': 7, 'product_name': 'Widget', 'warehouse_id': 2,
+             'quantity_delta': '7.00', 'balance_after': '7.00'},
+            {'product_id': 7, 'product_name': 'Widget', 'warehouse_id': 1,
+             'quantity_delta': '-4.00', 'balance_after': None},
+        ])
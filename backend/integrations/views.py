@@ -2,12 +2,13 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from accounts.permissions import IsAdminOrInventoryManager
 
 from .models import IntegrationEvent, WebhookConfiguration
 from .serializers import IntegrationEventSerializer, WebhookConfigurationSerializer
-from .services import emit_event, resend_event
+from .services import REPLAYABLE_STATUSES, emit_event, replay_events, resend_event
 
 
 class WebhookConfigurationViewSet(viewsets.ModelViewSet):
@@ -58,3 +59,44 @@ class IntegrationEventViewSet(viewsets.ReadOnlyModelViewSet):
             {'success': success, 'message': message},
             status=status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST,
         )
+
+    @action(detail=False, methods=['post'])
+    def replay(self, request):
+        """Re-queue failed/dead-lettered events in a range for delivery.
+
+        Body (all optional): webhook, event_type, status ('failed' or 'dead'),
+        created_after / created_before (ISO datetimes), from_id / to_id.
+        """
+        data = request.data
+        events = IntegrationEvent.objects.all()
+
+        status_filter = data.get('status')
+        if status_filter:
+            if status_filter not in REPLAYABLE_STATUSES:
+                return Response(
+                    {'detail': f"status must be one of {', '.join(REPLAYABLE_STATUSES)}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            events = events.filter(status=status_filter)
+        if data.get('event_type'):
+            events = events.filter(event_type=data['event_type'])
+
+        try:
+            if data.get('webhook'):
+                events = events.filter(webhook_id=int(data['webhook']))
+            if data.get('from_id'):
+                events = events.filter(pk__gte=int(data['from_id']))
+            if data.get('to_id'):
+                events = events.filter(pk__lte=int(data['to_id']))
+        except (TypeError, ValueError):
+            return Response({'detail': 'webhook, from_id and to_id must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        for field, lookup in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lte')):
+            if data.get(field):
+                value = parse_datetime(str(data[field]))
+                if value is None:
+                    return Response({'detail': f'{field} must be an ISO datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+                events = events.filter(**{lookup: value})
+
+        queued = replay_events(events)
+        return Response({'success': True, 'queued': queued})
@@ -0,0 +1,143 @@
+"""Denormalized per-user unread notification counts.
+
+NotificationCounter.unread is kept in step with the notifications a user can
+see (their own plus broadcasts of types they haven't switched off) by F()
+updates in the same transaction as the change, so the bell badge is a
+primary-key lookup. Paths that can't cheaply work out the delta (editing
+is_read directly, changing preferences) recount the one user instead, and
+the unread_counter_repair job recounts everyone to fix any drift.
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from accounts.models import User
+
+from .models import Notification, NotificationCounter, NotificationPreference, NotificationRead
+
+
+def _disabled(prefs: NotificationPreference | None) -> set:
+    if prefs is None:
+        return set()
+    return {
+        notification_type
+        for notification_type, _ in Notification.NOTIFICATION_TYPES
+        if not getattr(prefs, f'{notification_type}_enabled', True)
+    }
+
+
+def _subscribed_counters(notification_type: str):
+    """Counters of users who receive broadcasts of `notification_type`."""
+    return NotificationCounter.objects.exclude(**{f'user__notification_preferences__{notification_type}_enabled': False})
+
+
+def adjust_unread(user_ids: Iterable[int], delta: int) -> None:
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=Greatest(F('unread') + delta, 0))
+
+
+def count_new_notifications(notifications: Iterable[Notification]) -> None:
+    """Add freshly created notifications to their recipients' counters.
+
+    One UPDATE per distinct increment for personal notifications and one per
+    notification type for broadcasts, however many rows were created.
+    """
+    personal = Counter()
+    broadcasts = Counter()
+    for notification in notifications:
+        if notification.is_read:
+            continue
+        if notification.user_id is None:
+            broadcasts[notification.notification_type] += 1
+        else:
+            personal[notification.user_id] += 1
+
+    by_increment = defaultdict(list)
+    for user_id, count in personal.items():
+        by_increment[count].append(user_id)
+    for count, user_ids in by_increment.items():
+        adjust_unread(user_ids, count)
+    for notification_type, count in broadcasts.items():
+        _subscribed_counters(notification_type).update(unread=F('unread') + count)
+
+
+def discount_broadcast(notification: Notification) -> None:
+    """Drop a broadcast about to be deleted from the counters of users who hadn't read it."""
+    (
+        _subscribed_counters(notification.notification_type)
+        .exclude(user__notification_reads__notification=notification)
+        .update(unread=Greatest(F('unread') - 1, 0))
+    )
+
+
+def reconcile_unread_counters(user_ids: Iterable[int] | None = None) -> int:
+    """Recount unread notifications for the given users (default: everyone).
+
+    A handful of grouped queries regardless of user count. Returns the number
+    of counters that were created or corrected.
+    """
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=list(user_ids))
+    user_ids = list(users.values_list('pk', flat=True))
+    if not user_ids:
+        return 0
+
+    personal = dict(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .order_by()
+        .values('user_id')
+        .annotate(unread=Count('id'))
+        .values_list('user_id', 'unread')
+    )
+    broadcasts = dict(
+        Notification.objects.filter(user__isnull=True)
+        .order_by()
+        .values('notification_type')
+        .annotate(total=Count('id'))
+        .values_list('notification_type', 'total')
+    )
+    reads = defaultdict(dict)
+    for user_id, notification_type, total in (
+        NotificationRead.objects.filter(user_id__in=user_ids, notification__user__isnull=True)
+        .values('user_id', 'notification__notification_type')
+        .annotate(total=Count('id'))
+        .values_list('user_id', 'notification__notification_type', 'total')
+    ):
+        reads[user_id][notification_type] = total
+    disabled = {prefs.user_id: _disabled(prefs) for prefs in NotificationPreference.objects.filter(user_id__in=user_ids)}
+
+    with transaction.atomic():
+        counters = NotificationCounter.objects.select_for_update().in_bulk(user_ids)
+        changed, missing = [], []
+        for user_id in user_ids:
+            unread = personal.get(user_id, 0) + sum(
+                total - reads[user_id].get(notification_type, 0)
+                for notification_type, total in broadcasts.items()
+                if notification_type not in disabled.get(user_id, ())
+            )
+            counter = counters.get(user_id)
+            if counter is None:
+                missing.append(NotificationCounter(user_id=user_id, unread=unread))
+            elif counter.unread != unread:
+                counter.unread = unread
+                changed.append(counter)
+        NotificationCounter.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+        NotificationCounter.objects.bulk_update(changed, ['unread'], batch_size=1000)
+    return len(changed) + len(missing)
+
+
+def unread_count(user) -> int:
+    """The user's unread count: a primary-key lookup once their counter exists."""
+    unread = NotificationCounter.objects.filter(pk=user.pk).values_list('unread', flat=True).first()
+    if unread is None:
+        reconcile_unread_counters([user.pk])
+        unread = NotificationCounter.objects.filter(pk=user.pk).values_list('unread', flat=True).first() or 0
+    return unread
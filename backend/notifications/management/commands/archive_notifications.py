@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from notifications.retention import archive_notifications
+
+
+class Command(BaseCommand):
+    help = "Move read notifications past their retention window to the archive table (or drop them)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows moved per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Delete expired notifications instead of archiving them.',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between chunks to ease lock pressure (default: 0).',
+        )
+
+    def handle(self, *args, **options):
+        stats = archive_notifications(
+            batch_size=options['batch_size'],
+            archive=False if options['drop'] else None,
+            pause=options['pause'],
+        )
+        for notification_type, moved in stats['by_type'].items():
+            self.stdout.write(f"  {notification_type}: {moved}")
+
+        action = 'Archived' if stats['archived'] else 'Dropped'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {stats['moved']} notifications in {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s)."
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.scheduler import run_due_jobs
+
+
+class Command(BaseCommand):
+    help = "Run notification jobs as their next_run_at comes due (safe to run on several servers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Jobs run concurrently (default: 4).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=30.0,
+            help='Seconds between checks for due jobs (default: 30).',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due now and exit instead of looping forever.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                for job_name, success, message in run_due_jobs(workers=options['workers']):
+                    style = self.style.SUCCESS if success else self.style.WARNING
+                    self.stdout.write(style(f"{job_name}: {message}"))
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_allowed_warehouses'),
+        ('notifications', '0002_notification_reads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to='accounts.user')),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='notificationjobstatus',
+            name='job_name',
+            field=models.CharField(choices=[('low_stock_digest', 'Low stock digest'), ('daily_summary', 'Daily summary'), ('unread_counter_repair', 'Unread counter repair')], max_length=50, unique=True),
+        ),
+    ]
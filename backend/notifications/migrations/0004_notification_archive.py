@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_unread_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(blank=True, null=True)),
+                ('notification_type', models.CharField(choices=[('low_stock', 'Low Stock Alert'), ('out_of_stock', 'Out of Stock'), ('expiry_warning', 'Expiry Warning'), ('pending_approval', 'Pending Approval'), ('delivery_due', 'Delivery Due'), ('anomaly', 'Anomaly Detected'), ('overstock', 'Overstock Alert'), ('quality_issue', 'Quality Issue')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=10)),
+                ('title', models.CharField(max_length=200)),
+                ('related_object_type', models.CharField(blank=True, max_length=50)),
+                ('related_object_id', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='notificationjobstatus',
+            name='job_name',
+            field=models.CharField(choices=[('low_stock_digest', 'Low stock digest'), ('daily_summary', 'Daily summary'), ('unread_counter_repair', 'Unread counter repair'), ('notification_retention', 'Notification retention')], max_length=50, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='notificationarchive',
+            index=models.Index(fields=['user_id', '-created_at'], name='notificatio_user_id_fbf7c9_idx'),
+        ),
+    ]
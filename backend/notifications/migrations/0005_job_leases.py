@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationjobstatus',
+            name='last_timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='notificationjobstatus',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationjobstatus',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_job_leases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamTicketRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nonce', models.CharField(max_length=32, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
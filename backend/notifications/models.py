@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from accounts.models import User
+from dashboard.cache import bump_anomaly_version
 
 
 class Notification(models.Model):
@@ -44,11 +45,90 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.user.email if self.user else 'All Users'}"
 
-    def mark_as_read(self):
-        """Mark notification as read"""
+    def save(self, *args, **kwargs):
+        from .counters import count_new_notifications
+        from .streaming import notify_streams
+
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                count_new_notifications([self])
+            if self.notification_type == 'anomaly':
+                bump_anomaly_version()
+        notify_streams([self.user_id] if self.user_id else None)
+
+    def delete(self, *args, **kwargs):
+        from .counters import adjust_unread, discount_broadcast
+
+        with transaction.atomic():
+            if self.notification_type == 'anomaly':
+                bump_anomaly_version()
+            if self.user_id is None:
+                discount_broadcast(self)
+            elif not self.is_read:
+                adjust_unread([self.user_id], -1)
+            return super().delete(*args, **kwargs)
+
+    def mark_as_read(self, user=None):
+        """Mark notification as read (for `user`, if this is a broadcast)"""
+        from .counters import adjust_unread
+        from .streaming import notify_streams
+
+        if self.user_id is None and user is not None:
+            with transaction.atomic():
+                _, created = NotificationRead.objects.get_or_create(notification=self, user=user)
+                if created:
+                    adjust_unread([user.pk], -1)
+            notify_streams([user.pk])
+            return
+        read_at = timezone.now()
+        with transaction.atomic():
+            if Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=read_at):
+                adjust_unread([self.user_id], -1)
         self.is_read = True
-        self.read_at = timezone.now()
-        self.save()
+        self.read_at = read_at
+        notify_streams([self.user_id])
+
+
+class NotificationRead(models.Model):
+    """Per-user read state of a broadcast (user=None) notification."""
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='reads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_reads')
+    read_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['notification', 'user']
+
+    def __str__(self):
+        return f"{self.notification_id} read by {self.user_id}"
+
+
+class NotificationArchive(models.Model):
+    """Compact copy of a notification removed by the retention job.
+
+    Keeps what history views and audits need, without the message body or
+    foreign keys, so archiving never touches live tables beyond the delete.
+    """
+    id = models.BigIntegerField(primary_key=True)  # the original Notification id
+    user_id = models.IntegerField(null=True, blank=True)
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_LEVELS)
+    title = models.CharField(max_length=200)
+    related_object_type = models.CharField(max_length=50, blank=True)
+    related_object_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user_id', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (archived)"
 
 
 class NotificationPreference(models.Model):
@@ -76,15 +156,48 @@ class NotificationPreference(models.Model):
     def __str__(self):
         return f"Notification Preferences - {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        from .counters import reconcile_unread_counters
+
+        super().save(*args, **kwargs)
+        # Which broadcasts count as unread depends on the per-type switches.
+        reconcile_unread_counters([self.user_id])
+
+
+class NotificationCounter(models.Model):
+    """Denormalized unread count per user, kept by notifications.counters."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class StreamTicketRedemption(models.Model):
+    """A redeemed notification stream ticket, so it can't open a second stream.
+
+    Kept in the database rather than the cache so every ASGI worker sees it;
+    rows are pruned once the ticket would have expired anyway.
+    """
+    nonce = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.nonce
+
 
 class NotificationJobStatus(models.Model):
     """Track background notification job executions."""
 
     JOB_LOW_STOCK = 'low_stock_digest'
     JOB_DAILY_SUMMARY = 'daily_summary'
+    JOB_UNREAD_REPAIR = 'unread_counter_repair'
+    JOB_RETENTION = 'notification_retention'
     JOB_CHOICES = [
         (JOB_LOW_STOCK, 'Low stock digest'),
         (JOB_DAILY_SUMMARY, 'Daily summary'),
+        (JOB_UNREAD_REPAIR, 'Unread counter repair'),
+        (JOB_RETENTION, 'Notification retention'),
     ]
     STATUS_CHOICES = [
         ('idle', 'Idle'),
@@ -98,7 +211,13 @@ class NotificationJobStatus(models.Model):
     next_run_at = models.DateTimeField(null=True, blank=True)
     last_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='idle')
     last_duration_ms = models.IntegerField(null=True, blank=True)
+    # Milliseconds per phase of the last run, e.g. {"lease": 2, "run": 840, "insert": 610}.
+    last_timings = models.JSONField(default=dict, blank=True)
     last_message = models.TextField(blank=True)
+    # The row doubles as a lease: only the worker named in lease_owner runs the
+    # job until it finishes or lease_expires_at passes (a crashed worker).
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
     triggered_by = models.ForeignKey(
         User,
         null=True,
@@ -0,0 +1,111 @@
+"""Retention for Notification rows.
+
+Read notifications older than their type's window (NOTIFICATION_RETENTION_DAYS,
+falling back to NOTIFICATION_RETENTION_DEFAULT_DAYS) move to the compact
+NotificationArchive table, or are dropped. Broadcasts have no single read
+state, so they go once they are past the window. Unread personal
+notifications are never removed.
+
+Work happens in small chunks, each in its own short transaction, walking the
+(notification_type, created_at) index, so the job never holds long locks and
+the live table (and its indexes) stays proportional to the retention windows
+instead of to the age of the install.
+"""
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from dashboard.cache import bump_anomaly_version
+
+from .counters import reconcile_unread_counters
+from .models import Notification, NotificationArchive
+
+
+def retention_days(notification_type: str) -> int:
+    windows = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})
+    return windows.get(notification_type, getattr(settings, 'NOTIFICATION_RETENTION_DEFAULT_DAYS', 90))
+
+
+def _expired(notification_type: str, now):
+    cutoff = now - timedelta(days=retention_days(notification_type))
+    return Notification.objects.filter(
+        Q(is_read=True) | Q(user__isnull=True),
+        notification_type=notification_type,
+        created_at__lt=cutoff,
+    )
+
+
+ARCHIVED_FIELDS = (
+    'id',
+    'user_id',
+    'notification_type',
+    'priority',
+    'title',
+    'related_object_type',
+    'related_object_id',
+    'created_at',
+    'read_at',
+)
+
+
+def _move_chunk(expired, batch_size: int, archive: bool) -> tuple[int, bool]:
+    """Archive/delete one chunk in its own transaction.
+
+    Returns (rows removed, whether any were broadcasts).
+    """
+    with transaction.atomic():
+        rows = list(expired.values(*(ARCHIVED_FIELDS if archive else ('id', 'user_id')))[:batch_size])
+        if not rows:
+            return 0, False
+        if archive:
+            NotificationArchive.objects.bulk_create([NotificationArchive(**row) for row in rows], ignore_conflicts=True)
+        Notification.objects.filter(pk__in=[row['id'] for row in rows]).only('pk').delete()
+    return len(rows), any(row['user_id'] is None for row in rows)
+
+
+def archive_notifications(*, batch_size: int = 1000, archive: bool | None = None, pause: float = 0, now=None) -> dict:
+    """Move (or drop) expired notifications chunk by chunk.
+
+    `pause` sleeps between chunks to leave room for other writers. Returns
+    {'moved': n, 'archived': bool, 'seconds': s, 'rows_per_second': r,
+    'by_type': {type: n}}.
+    """
+    if archive is None:
+        archive = getattr(settings, 'NOTIFICATION_ARCHIVE_EXPIRED', True)
+    now = now or timezone.now()
+    started = time.monotonic()
+    by_type = {}
+    broadcasts_removed = False
+
+    for notification_type, _ in Notification.NOTIFICATION_TYPES:
+        expired = _expired(notification_type, now).order_by('created_at')
+        while True:
+            moved, had_broadcasts = _move_chunk(expired, batch_size, archive)
+            if not moved:
+                break
+            by_type[notification_type] = by_type.get(notification_type, 0) + moved
+            broadcasts_removed |= had_broadcasts
+            if pause:
+                time.sleep(pause)
+
+    if broadcasts_removed:
+        # Users who never read an expired broadcast had it in their count.
+        reconcile_unread_counters()
+    if by_type.get('anomaly'):
+        bump_anomaly_version()
+
+    seconds = time.monotonic() - started
+    total = sum(by_type.values())
+    return {
+        'moved': total,
+        'archived': archive,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(total / seconds) if seconds else total,
+        'by_type': by_type,
+    }
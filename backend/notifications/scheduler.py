@@ -0,0 +1,51 @@
+"""Runs notification jobs when their next_run_at comes due.
+
+Any number of scheduler processes can run side by side: each due job is
+started through run_notification_job(only_if_due=True), whose DB lease lets
+exactly one of them run it and re-checks next_run_at, so a job neither runs
+twice at once nor repeats right after another worker finished it.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NotificationJobStatus
+from .services import JOB_INTERVALS, run_notification_job
+
+
+def due_jobs(now=None) -> list[str]:
+    """Jobs whose next run time has passed (or never ran) and aren't leased."""
+    now = now or timezone.now()
+    known = set(NotificationJobStatus.objects.values_list('job_name', flat=True))
+    NotificationJobStatus.objects.bulk_create(
+        [NotificationJobStatus(job_name=job_name) for job_name in JOB_INTERVALS if job_name not in known],
+        ignore_conflicts=True,
+    )
+    return list(
+        NotificationJobStatus.objects.filter(job_name__in=list(JOB_INTERVALS))
+        .filter(Q(next_run_at__isnull=True) | Q(next_run_at__lte=now))
+        .filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now))
+        .order_by('next_run_at')
+        .values_list('job_name', flat=True)
+    )
+
+
+def _run(job_name: str) -> tuple[str, bool, str]:
+    try:
+        return (job_name, *run_notification_job(job_name, only_if_due=True))
+    finally:
+        # Pool threads each hold their own connection.
+        connection.close()
+
+
+def run_due_jobs(workers: int = 4) -> list[tuple[str, bool, str]]:
+    """Run every due job once on a thread pool; returns (job, success, message)."""
+    jobs = due_jobs()
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        return list(pool.map(_run, jobs))
@@ -9,6 +9,13 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Broadcasts carry the requesting user's read state (see notifications_for()).
+        if instance.user_id is None and hasattr(instance, 'broadcast_read'):
+            data['is_read'] = instance.broadcast_read
+        return data
+
 
 class NotificationPreferenceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,12 +1,41 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import timedelta
+from itertools import islice
+from typing import Iterable
 
-from django.db.models import Sum
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
 from django.utils import timezone
 
 from accounts.models import User
-from products.models import Product, StockItem
+from products.models import ProductStockSummary
 
-from .models import Notification, NotificationJobStatus, NotificationPreference
+from .counters import count_new_notifications, reconcile_unread_counters
+from .models import Notification, NotificationJobStatus, NotificationPreference, NotificationRead
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """Accumulates wall-clock milliseconds per named phase of a job run."""
+
+    def __init__(self):
+        self.timings: dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = round((time.monotonic() - started) * 1000)
+            self.timings[name] = self.timings.get(name, 0) + elapsed
 
 
 def _eligible_users(pref_attr: str) -> list[User]:
@@ -20,48 +49,108 @@ def _eligible_users(pref_attr: str) -> list[User]:
     return eligible
 
 
-def _run_low_stock_digest() -> int:
-    """Create low-stock notifications for products at/below reorder level."""
-    stock_by_product = StockItem.objects.values('product').annotate(total=Sum('quantity'))
-    stock_dict = {row['product']: row['total'] or 0 for row in stock_by_product}
+def notifications_for(user):
+    """Notifications visible to `user`: their own plus broadcasts (user=None).
 
-    products = Product.objects.filter(is_active=True)
-    low_stock_products = [
-        product for product in products
-        if stock_dict.get(product.id, 0) <= product.reorder_level
+    Broadcasts of a type the user switched off in their preferences are left
+    out. Each row is annotated with `broadcast_read`, the user's read state
+    for broadcasts (own notifications keep using `is_read`).
+    """
+    prefs: NotificationPreference | None = getattr(user, 'notification_preferences', None)
+    disabled = [
+        notification_type
+        for notification_type, _ in Notification.NOTIFICATION_TYPES
+        if prefs is not None and not getattr(prefs, f'{notification_type}_enabled', True)
     ]
+    return (
+        Notification.objects.filter(Q(user=user) | (Q(user__isnull=True) & ~Q(notification_type__in=disabled)))
+        .annotate(broadcast_read=Exists(NotificationRead.objects.filter(notification=OuterRef('pk'), user=user)))
+    )
+
+
+def unread_for(user):
+    return notifications_for(user).filter(Q(user=user, is_read=False) | Q(user__isnull=True, broadcast_read=False))
+
+
+def _bulk_insert(notifications: Iterable[Notification]) -> int:
+    """bulk_create in fixed-size chunks so memory stays flat however many rows.
+
+    Unread counters are bumped per chunk, in the caller's transaction.
+    """
+    batch_size = getattr(settings, 'NOTIFICATION_BULK_BATCH_SIZE', 1000)
+    notifications = iter(notifications)
+    created = 0
+    while True:
+        chunk = list(islice(notifications, batch_size))
+        if not chunk:
+            if created:
+                from .streaming import notify_streams
+                notify_streams()
+            return created
+        count_new_notifications(Notification.objects.bulk_create(chunk))
+        created += len(chunk)
+
+
+def _low_stock_notification(summary: ProductStockSummary, user_id: int | None = None) -> Notification:
+    product = summary.product
+    return Notification(
+        user_id=user_id,
+        notification_type='low_stock',
+        priority='high',
+        title=f"Low stock: {product.name}",
+        message=f"{product.name} is at {summary.total_quantity} units (reorder level {product.reorder_level}).",
+        related_object_type='product',
+        related_object_id=product.id,
+    )
+
+
+def _run_low_stock_digest(timer: PhaseTimer | None = None) -> int:
+    """Create low-stock notifications for products at/below reorder level.
 
-    if not low_stock_products:
+    Set-based: existing alerts are fetched in one query and only the missing
+    ones are inserted, in chunks. A recipient gets a new alert for a product
+    once they have read the previous one. With NOTIFICATION_BROADCAST_LOW_STOCK
+    a single broadcast per product replaces the per-user fan-out; a new one is
+    raised once every current recipient has read the last.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase('load'):
+        low_stock = ProductStockSummary.objects.filter(is_active=True, is_low_stock=True)
+        summaries = list(low_stock.select_related('product'))
+        recipient_ids = [user.pk for user in _eligible_users('low_stock_enabled')] if summaries else []
+    if not summaries or not recipient_ids:
         return 0
 
-    recipients = _eligible_users('low_stock_enabled')
-    notifications_created = 0
-
-    for product in low_stock_products:
-        current_qty = stock_dict.get(product.id, 0)
-        for user in recipients:
-            exists = Notification.objects.filter(
-                user=user,
-                notification_type='low_stock',
-                related_object_type='product',
-                related_object_id=product.id,
-                is_read=False,
-            ).exists()
-            if exists:
-                continue
-
-            Notification.objects.create(
-                user=user,
-                notification_type='low_stock',
-                priority='high',
-                title=f"Low stock: {product.name}",
-                message=f"{product.name} is at {current_qty} units (reorder level {product.reorder_level}).",
-                related_object_type='product',
-                related_object_id=product.id,
-            )
-            notifications_created += 1
+    alerts = Notification.objects.filter(
+        notification_type='low_stock',
+        related_object_type='product',
+        related_object_id__in=low_stock.values('product_id'),
+    )
+    with transaction.atomic():
+        if getattr(settings, 'NOTIFICATION_BROADCAST_LOW_STOCK', False):
+            with timer.phase('existing'):
+                open_alerts = set(
+                    alerts.filter(user__isnull=True)
+                    .annotate(read_count=Count('reads', filter=Q(reads__user_id__in=recipient_ids)))
+                    .filter(read_count__lt=len(recipient_ids))
+                    .values_list('related_object_id', flat=True)
+                )
+            with timer.phase('insert'):
+                return _bulk_insert(
+                    _low_stock_notification(summary)
+                    for summary in summaries
+                    if summary.product_id not in open_alerts
+                )
 
-    return notifications_created
+        with timer.phase('existing'):
+            unread = set(alerts.filter(user_id__isnull=False, is_read=False).values_list('user_id', 'related_object_id'))
+        with timer.phase('insert'):
+            return _bulk_insert(
+                _low_stock_notification(summary, user_id)
+                for summary in summaries
+                for user_id in recipient_ids
+                if (user_id, summary.product_id) not in unread
+            )
 
 
 def _run_daily_summary() -> int:
@@ -86,54 +175,102 @@ def _run_daily_summary() -> int:
     return summaries_created
 
 
-def run_notification_job(job_name: str, triggered_by: User | None = None) -> tuple[bool, str]:
-    """Execute a background notification job and persist status."""
-    status_obj, _ = NotificationJobStatus.objects.get_or_create(job_name=job_name)
-    status_obj.last_status = 'running'
-    status_obj.triggered_by = triggered_by
-    status_obj.save(update_fields=['last_status', 'triggered_by', 'updated_at'])
+JOB_INTERVALS = {
+    NotificationJobStatus.JOB_LOW_STOCK: timedelta(hours=1),
+    NotificationJobStatus.JOB_DAILY_SUMMARY: timedelta(days=1),
+    NotificationJobStatus.JOB_UNREAD_REPAIR: timedelta(hours=1),
+    NotificationJobStatus.JOB_RETENTION: timedelta(days=1),
+}
+
+
+def _acquire_job_lease(job_name: str, now, triggered_by: User | None, only_if_due: bool) -> str | None:
+    """Take the job's lease with a conditional UPDATE; returns the owner token or None.
+
+    Only one worker's UPDATE can match a free (or expired) lease, so a job
+    never runs twice at once however many processes trigger it. With
+    `only_if_due` the job must also have reached its next_run_at, so a
+    scheduler that saw it due just before another worker finished it does
+    not run it again.
+    """
+    NotificationJobStatus.objects.get_or_create(job_name=job_name)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    free = Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now)
+    if only_if_due:
+        free &= Q(next_run_at__isnull=True) | Q(next_run_at__lte=now)
+    lease = timedelta(seconds=getattr(settings, 'NOTIFICATION_JOB_LEASE_SECONDS', 3600))
+    acquired = NotificationJobStatus.objects.filter(free, job_name=job_name).update(
+        lease_owner=owner,
+        lease_expires_at=now + lease,
+        last_status='running',
+        triggered_by=triggered_by,
+        updated_at=now,
+    )
+    return owner if acquired else None
+
+
+def _run_job_body(job_name: str, timer: PhaseTimer) -> tuple[int, str]:
+    if job_name == NotificationJobStatus.JOB_LOW_STOCK:
+        processed = _run_low_stock_digest(timer)
+        return processed, f"Created {processed} low-stock alerts"
+    if job_name == NotificationJobStatus.JOB_DAILY_SUMMARY:
+        processed = _run_daily_summary()
+        return processed, f"Queued {processed} daily summaries"
+    if job_name == NotificationJobStatus.JOB_UNREAD_REPAIR:
+        processed = reconcile_unread_counters()
+        return processed, f"Corrected {processed} unread counters"
+    if job_name == NotificationJobStatus.JOB_RETENTION:
+        from .retention import archive_notifications
 
+        stats = archive_notifications()
+        return stats['moved'], f"Removed {stats['moved']} expired notifications ({stats['rows_per_second']} rows/s)"
+    raise ValueError(f"Unknown job {job_name}")
+
+
+def run_notification_job(
+    job_name: str,
+    triggered_by: User | None = None,
+    *,
+    only_if_due: bool = False,
+) -> tuple[bool, str]:
+    """Execute a background notification job and persist status.
+
+    Runs under the job's DB lease (see _acquire_job_lease); if another worker
+    holds it, or `only_if_due` is set and the job isn't due, nothing runs and
+    (False, reason) is returned. Per-phase timings land in last_timings.
+    """
+    if job_name not in JOB_INTERVALS:
+        return False, f"Unknown job {job_name}"
+
+    timer = PhaseTimer()
     started = timezone.now()
-    try:
-        if job_name == NotificationJobStatus.JOB_LOW_STOCK:
-            processed = _run_low_stock_digest()
-            message = f"Created {processed} low-stock alerts"
-            next_run = started + timedelta(hours=1)
-        elif job_name == NotificationJobStatus.JOB_DAILY_SUMMARY:
-            processed = _run_daily_summary()
-            message = f"Queued {processed} daily summaries"
-            next_run = started + timedelta(days=1)
-        else:
-            raise ValueError(f"Unknown job {job_name}")
-
-        duration_ms = int((timezone.now() - started).total_seconds() * 1000)
-        status_obj.last_status = 'success'
-        status_obj.last_run_at = started
-        status_obj.next_run_at = next_run
-        status_obj.last_duration_ms = duration_ms
-        status_obj.last_message = message
-        status_obj.save(update_fields=[
-            'last_status',
-            'last_run_at',
-            'next_run_at',
-            'last_duration_ms',
-            'last_message',
-            'updated_at',
-        ])
-        return True, message
+    with timer.phase('lease'):
+        owner = _acquire_job_lease(job_name, started, triggered_by, only_if_due)
+    if owner is None:
+        return False, f"Job {job_name} is already running" if not only_if_due else f"Job {job_name} is not due"
 
+    try:
+        with timer.phase('run'):
+            _, message = _run_job_body(job_name, timer)
+        success = True
+        next_run = started + JOB_INTERVALS[job_name]
     except Exception as exc:
-        duration_ms = int((timezone.now() - started).total_seconds() * 1000)
-        status_obj.last_status = 'failed'
-        status_obj.last_run_at = started
-        status_obj.last_duration_ms = duration_ms
-        status_obj.last_message = str(exc)
-        status_obj.save(update_fields=[
-            'last_status',
-            'last_run_at',
-            'last_duration_ms',
-            'last_message',
-            'updated_at',
-        ])
-        return False, str(exc)
+        logger.exception("Notification job %s failed", job_name)
+        success = False
+        message = str(exc)
+        next_run = started + timedelta(seconds=getattr(settings, 'NOTIFICATION_JOB_RETRY_SECONDS', 300))
 
+    finished = timezone.now()
+    released = NotificationJobStatus.objects.filter(job_name=job_name, lease_owner=owner).update(
+        last_status='success' if success else 'failed',
+        last_run_at=started,
+        next_run_at=next_run,
+        last_duration_ms=int((finished - started).total_seconds() * 1000),
+        last_timings=timer.timings,
+        last_message=message,
+        lease_owner='',
+        lease_expires_at=None,
+        updated_at=finished,
+    )
+    if not released:
+        logger.warning("Lease on notification job %s expired before the run finished", job_name)
+    return success, message
@@ -0,0 +1,344 @@
+"""Server-Sent Events stream of new notifications and unread counts.
+
+Served by a small native ASGI app (mounted in stockmaster/asgi.py) rather
+than a Django view: Django 3.2 iterates streaming responses synchronously,
+which would tie up the event loop for every idle connection.
+
+All connections in a process share one NotificationHub. Creating or reading
+a notification in this process wakes the hub immediately; rows written by
+other processes (WSGI workers, the job scheduler) are picked up by a single
+indexed poll every NOTIFICATION_STREAM_POLL_SECONDS. Either way the database
+sees one query per process per wake-up, plus an unread count for each
+connected user whose notifications actually changed, instead of one COUNT(*)
+per open tab per poll interval.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import secrets
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import User
+
+from .models import Notification, NotificationRead, StreamTicketRedemption
+from .serializers import NotificationSerializer
+from .counters import unread_count
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/notifications/stream/'
+STREAM_TICKET_SALT = 'notifications.stream-ticket'
+HEARTBEAT_SECONDS = 15
+
+
+def _poll_seconds() -> float:
+    return getattr(settings, 'NOTIFICATION_STREAM_POLL_SECONDS', 5)
+
+
+def _disabled_types(user) -> set:
+    prefs = getattr(user, 'notification_preferences', None)
+    if prefs is None:
+        return set()
+    return {
+        notification_type
+        for notification_type, _ in Notification.NOTIFICATION_TYPES
+        if not getattr(prefs, f'{notification_type}_enabled', True)
+    }
+
+
+class NotificationHub:
+    """Fans new notifications and unread counts out to connected clients."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._clients = defaultdict(set)  # user id -> set of asyncio.Queue
+        self._users = {}
+        self._disabled = {}
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._cursor = None
+        self._read_cursor = None
+        self._since = None
+        self._pending_users = set()
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First client, or a new event loop (e.g. after a server reload).
+            self._reset()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+
+    async def subscribe(self, user) -> asyncio.Queue:
+        self._bind()
+        disabled = await sync_to_async(_disabled_types)(user)
+        if self._cursor is None:
+            await sync_to_async(self._start_cursors)()
+        queue = asyncio.Queue()
+        self._clients[user.pk].add(queue)
+        self._users[user.pk] = user
+        self._disabled[user.pk] = disabled
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+        count = await sync_to_async(self._unread_count)(user)
+        queue.put_nowait(('unread_count', {'count': count}))
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._clients.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._clients[user_id]
+            self._users.pop(user_id, None)
+            self._disabled.pop(user_id, None)
+
+    def wake(self, user_ids=None) -> None:
+        """Ask the hub to look for changes now; safe to call from any thread.
+
+        `user_ids` are users whose unread count changed without a new
+        notification (e.g. they read one).
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        def _wake():
+            if user_ids:
+                self._pending_users.update(user_ids)
+            self._wakeup.set()
+
+        loop.call_soon_threadsafe(_wake)
+
+    def _start_cursors(self):
+        self._cursor = Notification.objects.aggregate(last=Max('pk'))['last'] or 0
+        self._read_cursor = NotificationRead.objects.aggregate(last=Max('pk'))['last'] or 0
+        self._since = timezone.now()
+
+    def _unread_count(self, user) -> int:
+        return unread_count(user)
+
+    def _collect(self, pending_users: set, subscribers: dict) -> list:
+        """Fetch what changed since the last wake-up (runs in a worker thread).
+
+        `subscribers` is a snapshot of {user id: (user, disabled types)}
+        taken on the event loop.
+        """
+        close_old_connections()
+        subscribed = set(subscribers)
+        messages = []
+
+        new = list(Notification.objects.filter(pk__gt=self._cursor).order_by('pk'))
+        if new:
+            self._cursor = new[-1].pk
+        changed = set(pending_users)
+        for notification in new:
+            if notification.user_id is not None:
+                recipients = [notification.user_id] if notification.user_id in subscribed else []
+            else:
+                recipients = [
+                    user_id for user_id in subscribed
+                    if notification.notification_type not in subscribers[user_id][1]
+                ]
+            if not recipients:
+                continue
+            data = NotificationSerializer(notification).data
+            messages.extend((user_id, 'notification', data) for user_id in recipients)
+            changed.update(recipients)
+
+        # Reads made in other processes.
+        now = timezone.now()
+        changed.update(
+            Notification.objects.filter(user_id__in=subscribed, is_read=True, read_at__gte=self._since)
+            .values_list('user_id', flat=True)
+        )
+        reads = NotificationRead.objects.filter(pk__gt=self._read_cursor)
+        for pk, user_id in reads.filter(user_id__in=subscribed).values_list('pk', 'user_id').order_by('pk'):
+            self._read_cursor = max(self._read_cursor, pk)
+            changed.add(user_id)
+        self._since = now
+
+        for user_id in changed & subscribed:
+            user = subscribers[user_id][0]
+            messages.append((user_id, 'unread_count', {'count': self._unread_count(user)}))
+        return messages
+
+    async def _run(self):
+        while self._clients:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_poll_seconds())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            pending, self._pending_users = self._pending_users, set()
+            subscribers = {user_id: (self._users[user_id], self._disabled[user_id]) for user_id in self._clients}
+            try:
+                messages = await sync_to_async(self._collect, thread_sensitive=False)(pending, subscribers)
+            except Exception:
+                logger.exception("Notification stream poll failed")
+                continue
+            for user_id, event, data in messages:
+                for queue in self._clients.get(user_id, ()):
+                    queue.put_nowait((event, data))
+
+
+hub = NotificationHub()
+
+
+def notify_streams(user_ids=None) -> None:
+    """Wake connected streams once the current transaction commits."""
+    transaction.on_commit(lambda: hub.wake(user_ids))
+
+
+def _ticket_seconds() -> int:
+    return getattr(settings, 'NOTIFICATION_STREAM_TICKET_SECONDS', 30)
+
+
+def issue_stream_ticket(user) -> str:
+    """A short-lived, single-use credential for opening one stream.
+
+    EventSource cannot send headers, so the stream is authenticated by a
+    query parameter; a ticket that only opens the stream and expires in
+    seconds is what ends up in access logs, not the user's JWT.
+    """
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_urlsafe(8)}, salt=STREAM_TICKET_SALT)
+
+
+def _redeem_ticket(ticket: str):
+    """The user id a valid, unused ticket was issued to, or None."""
+    try:
+        claims = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=_ticket_seconds())
+    except signing.BadSignature:
+        return None
+    now = timezone.now()
+    StreamTicketRedemption.objects.filter(expires_at__lt=now).delete()
+    try:
+        # The unique nonce makes the first redemption, in any process, the only one.
+        with transaction.atomic():
+            StreamTicketRedemption.objects.create(
+                nonce=claims['nonce'],
+                expires_at=now + timedelta(seconds=_ticket_seconds()),
+            )
+    except IntegrityError:
+        return None
+    return claims['user']
+
+
+def _bearer_user(header: str):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+    scheme, _, credentials = header.partition(' ')
+    if scheme.lower() != 'bearer' or not credentials:
+        return None
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(credentials))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _authenticate(scope):
+    """Resolve the user from ?ticket= (EventSource cannot send headers) or a Bearer JWT."""
+    ticket = parse_qs(scope.get('query_string', b'').decode()).get('ticket', [None])[0]
+    header = dict(scope.get('headers', [])).get(b'authorization', b'').decode()
+    if not ticket and not header:
+        return None
+
+    close_old_connections()
+    if ticket:
+        user_id = _redeem_ticket(ticket)
+        user = User.objects.filter(pk=user_id).first() if user_id is not None else None
+    else:
+        user = _bearer_user(header)
+    if user is None or not user.is_active:
+        return None
+    # Preferences are read once per connection.
+    getattr(user, 'notification_preferences', None)
+    return user
+
+
+def _cors_headers(scope) -> list:
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if origin is None or origin.decode() not in getattr(settings, 'CORS_ALLOWED_ORIGINS', []):
+        return []
+    headers = [(b'access-control-allow-origin', origin), (b'vary', b'Origin')]
+    if getattr(settings, 'CORS_ALLOW_CREDENTIALS', False):
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+def _event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+async def notification_stream(scope, receive, send):
+    """ASGI app: GET /api/notifications/stream/ as text/event-stream.
+
+    Events are `notification` (a serialized Notification) and `unread_count`
+    ({"count": n}); a comment line is sent every HEARTBEAT_SECONDS to keep
+    proxies from closing idle connections.
+    """
+    if scope['method'] != 'GET':
+        await _reject(send, 405, 'Method not allowed.')
+        return
+    user = await sync_to_async(_authenticate)(scope)
+    if user is None:
+        await _reject(send, 401, 'Authentication credentials were not provided or are invalid.', scope)
+        return
+
+    queue = await hub.subscribe(user)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ] + _cors_headers(scope),
+    })
+
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while not disconnected.done():
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                event, data = getter.result()
+                await send({'type': 'http.response.body', 'body': _event(event, data), 'more_body': True})
+            else:
+                getter.cancel()
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+    finally:
+        hub.unsubscribe(user.pk, queue)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _reject(send, status: int, detail: str, scope=None):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')] + (_cors_headers(scope) if scope else []),
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
@@ -0,0 +1,234 @@
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from products.models import Product, UnitOfMeasure
+from products.stock_summary import refresh_stock_summaries
+
+from .counters import unread_count
+from .models import (
+    Notification, NotificationArchive, NotificationCounter, NotificationJobStatus, NotificationPreference,
+    StreamTicketRedemption,
+)
+from .retention import archive_notifications
+from .scheduler import due_jobs
+from .services import JOB_INTERVALS, _run_low_stock_digest, run_notification_job
+from .streaming import STREAM_PATH, notification_stream
+
+
+class LowStockDigestTests(TestCase):
+    def setUp(self):
+        uom, _ = UnitOfMeasure.objects.get_or_create(name='Pieces', code='PCS')
+        for n in range(3):
+            Product.objects.create(name=f'Widget {n}', sku=f'W-{n:03d}', stock_unit=uom, reorder_level=5)
+        refresh_stock_summaries()
+
+        self.users = [
+            User.objects.create_user(email=f'user{n}@example.com', username=f'User {n}', password='StrongPass123!')
+            for n in range(3)
+        ]
+        muted = User.objects.create_user(email='muted@example.com', username='Muted', password='StrongPass123!')
+        NotificationPreference.objects.create(user=muted, low_stock_enabled=False)
+
+    def test_digest_only_adds_missing_alerts_in_constant_queries(self):
+        with self.assertNumQueries(7):
+            self.assertEqual(_run_low_stock_digest(), 9)
+
+        first = Notification.objects.filter(user=self.users[0]).first()
+        first.mark_as_read()
+        with self.assertNumQueries(7):
+            self.assertEqual(_run_low_stock_digest(), 1)
+        self.assertEqual(Notification.objects.count(), 10)
+
+    @override_settings(NOTIFICATION_BROADCAST_LOW_STOCK=True)
+    def test_broadcast_alerts_keep_read_state_per_user(self):
+        self.assertEqual(_run_low_stock_digest(), 3)
+        self.assertFalse(Notification.objects.filter(user__isnull=False).exists())
+        self.assertEqual(_run_low_stock_digest(), 0)
+
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.get('/api/notifications/notifications/unread_count/').data['count'], 3)
+        client.post('/api/notifications/notifications/mark_all_read/')
+        self.assertEqual(client.get('/api/notifications/notifications/unread_count/').data['count'], 0)
+
+        client.force_authenticate(self.users[1])
+        self.assertEqual(client.get('/api/notifications/notifications/unread_count/').data['count'], 3)
+        listed = client.get('/api/notifications/notifications/').data
+        rows = listed['results'] if isinstance(listed, dict) else listed
+        self.assertEqual([row['is_read'] for row in rows], [False, False, False])
+
+        # A fresh broadcast follows only once every recipient has read the last one.
+        for user in self.users[1:]:
+            client.force_authenticate(user)
+            client.post('/api/notifications/notifications/mark_all_read/')
+        self.assertEqual(_run_low_stock_digest(), 3)
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', username='User', password='StrongPass123!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _badge(self):
+        return self.client.get('/api/notifications/notifications/unread_count/').data['count']
+
+    def _notify(self, user=None, notification_type='anomaly'):
+        return Notification.objects.create(user=user, notification_type=notification_type, title='Alert', message='...')
+
+    def test_counter_follows_creates_reads_and_deletes(self):
+        own = self._notify(self.user)
+        self._notify(self.user)
+        broadcast = self._notify()
+        self._notify(notification_type='overstock')
+        self.assertEqual(self._badge(), 4)
+        self.assertEqual(NotificationCounter.objects.get(pk=self.user.pk).unread, 4)
+
+        own.mark_as_read()
+        own.mark_as_read()
+        broadcast.mark_as_read(self.user)
+        self.assertEqual(self._badge(), 2)
+
+        NotificationPreference.objects.create(user=self.user, overstock_enabled=False)
+        self.assertEqual(self._badge(), 1)
+
+        self._notify()
+        self.client.post('/api/notifications/notifications/mark_all_read/')
+        self.assertEqual(self._badge(), 0)
+
+        self._notify(self.user).delete()
+        self.assertEqual(self._badge(), 0)
+
+    def test_repair_job_fixes_drift(self):
+        self._notify(self.user)
+        self.assertEqual(self._badge(), 1)
+        NotificationCounter.objects.update(unread=7)
+
+        success, message = run_notification_job(NotificationJobStatus.JOB_UNREAD_REPAIR)
+        self.assertTrue(success)
+        self.assertEqual(message, 'Corrected 1 unread counters')
+        self.assertEqual(self._badge(), 1)
+
+
+class NotificationSchedulerTests(TestCase):
+    def test_lease_and_schedule_keep_jobs_from_running_twice(self):
+        self.assertEqual(set(due_jobs()), set(JOB_INTERVALS))
+
+        success, _ = run_notification_job(NotificationJobStatus.JOB_LOW_STOCK, only_if_due=True)
+        self.assertTrue(success)
+        job = NotificationJobStatus.objects.get(job_name=NotificationJobStatus.JOB_LOW_STOCK)
+        self.assertEqual((job.last_status, job.lease_owner), ('success', ''))
+        self.assertEqual(set(job.last_timings), {'lease', 'run', 'load'})
+        self.assertNotIn(job.job_name, due_jobs())
+        self.assertEqual(
+            run_notification_job(job.job_name, only_if_due=True),
+            (False, 'Job low_stock_digest is not due'),
+        )
+
+        NotificationJobStatus.objects.filter(pk=job.pk).update(
+            lease_owner='other-server', lease_expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(run_notification_job(job.job_name), (False, 'Job low_stock_digest is already running'))
+        job.refresh_from_db()
+        self.assertEqual(job.lease_owner, 'other-server')
+
+        # A crashed worker's lease expires and the job can run again.
+        NotificationJobStatus.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(run_notification_job(job.job_name)[0])
+
+
+class NotificationRetentionTests(TestCase):
+    def test_expired_notifications_move_to_the_archive(self):
+        user = User.objects.create_user(email='user@example.com', username='User', password='StrongPass123!')
+        read = Notification.objects.create(user=user, notification_type='low_stock', title='Read', message='...')
+        read.mark_as_read()
+        Notification.objects.create(user=user, notification_type='low_stock', title='Unread', message='...')
+        Notification.objects.create(notification_type='low_stock', title='Broadcast', message='...')
+        kept = Notification.objects.create(user=user, notification_type='anomaly', title='Anomaly', message='...')
+        kept.mark_as_read()
+        self.assertEqual(unread_count(user), 2)
+
+        stats = archive_notifications(batch_size=1, now=timezone.now() + timedelta(days=60))
+
+        self.assertEqual((stats['moved'], stats['by_type']), (2, {'low_stock': 2}))
+        self.assertEqual(set(Notification.objects.values_list('title', flat=True)), {'Unread', 'Anomaly'})
+        self.assertEqual(
+            set(NotificationArchive.objects.values_list('title', 'user_id')),
+            {('Read', user.pk), ('Broadcast', None)},
+        )
+        self.assertEqual(unread_count(user), 1)
+
+
+class NotificationStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', username='User', password='StrongPass123!')
+
+    def _connect(self, query_string=b''):
+        scope = {'type': 'http', 'method': 'GET', 'path': STREAM_PATH, 'query_string': query_string, 'headers': []}
+        return ApplicationCommunicator(notification_stream, scope)
+
+    async def _next_event(self, stream):
+        message = await stream.receive_output(timeout=3)
+        event, data = message['body'].decode().strip().split('\n')
+        return event.split(': ', 1)[1], json.loads(data.split(': ', 1)[1])
+
+    def _ticket(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        res = client.post('/api/notifications/notifications/stream_ticket/')
+        self.assertEqual(res.status_code, 200)
+        return res.data['ticket']
+
+    async def _status(self, query_string):
+        stream = self._connect(query_string)
+        await stream.send_input({'type': 'http.request'})
+        return (await stream.receive_output(timeout=3))['status']
+
+    async def test_stream_requires_a_fresh_ticket(self):
+        # A JWT in the URL would end up in access logs; it is not accepted.
+        self.assertEqual(await self._status(f'token={AccessToken.for_user(self.user)}'.encode()), 401)
+        self.assertEqual(await self._status(b'ticket=bogus'), 401)
+
+        ticket = await sync_to_async(self._ticket)()
+        stream = self._connect(f'ticket={ticket}'.encode())
+        await stream.send_input({'type': 'http.request'})
+        self.assertEqual((await stream.receive_output(timeout=3))['status'], 200)
+        # Single use, in every process: the redemption is recorded in the
+        # database, so another worker (here, an emptied cache) can't reuse it.
+        await sync_to_async(cache.clear)()
+        self.assertEqual(await self._status(f'ticket={ticket}'.encode()), 401)
+        self.assertTrue(await sync_to_async(StreamTicketRedemption.objects.exists)())
+        await stream.send_input({'type': 'http.disconnect'})
+        await stream.wait(timeout=3)
+
+        with override_settings(NOTIFICATION_STREAM_TICKET_SECONDS=-1):
+            expired = await sync_to_async(self._ticket)()
+            self.assertEqual(await self._status(f'ticket={expired}'.encode()), 401)
+
+    async def test_stream_pushes_new_notifications_and_unread_counts(self):
+        ticket = await sync_to_async(self._ticket)()
+        stream = self._connect(f'ticket={ticket}'.encode())
+        await stream.send_input({'type': 'http.request'})
+        start = await stream.receive_output(timeout=3)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertEqual(await self._next_event(stream), ('unread_count', {'count': 0}))
+
+        await sync_to_async(Notification.objects.create)(
+            user=self.user, notification_type='anomaly', title='Spike', message='Unusual outflow',
+        )
+        event, data = await self._next_event(stream)
+        self.assertEqual((event, data['title']), ('notification', 'Spike'))
+        self.assertEqual(await self._next_event(stream), ('unread_count', {'count': 1}))
+
+        await stream.send_input({'type': 'http.disconnect'})
+        await stream.wait(timeout=3)
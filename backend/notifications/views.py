@@ -3,14 +3,17 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import IsAdminOrInventoryManager
+from django.db import transaction
 from django.utils import timezone
-from .models import Notification, NotificationPreference, NotificationJobStatus
+from .counters import adjust_unread, reconcile_unread_counters, unread_count
+from .models import Notification, NotificationPreference, NotificationJobStatus, NotificationRead
 from .serializers import (
     NotificationSerializer,
     NotificationPreferenceSerializer,
     NotificationJobStatusSerializer,
 )
-from .services import run_notification_job
+from .services import notifications_for, run_notification_job, unread_for
+from .streaming import issue_stream_ticket, notify_streams
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -19,23 +22,42 @@ class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """Get notifications for current user"""
-        return Notification.objects.filter(user=self.request.user)
+        """Get notifications for current user, including broadcasts"""
+        if self.action in ('update', 'partial_update', 'destroy'):
+            # Broadcasts are shared; users can only change their own rows.
+            return Notification.objects.filter(user=self.request.user)
+        return notifications_for(self.request.user)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        # is_read may have been edited directly; recount rather than guess the delta.
+        reconcile_unread_counters([self.request.user.pk])
+        notify_streams([self.request.user.pk])
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark notification as read"""
         notification = self.get_object()
-        notification.mark_as_read()
+        notification.mark_as_read(request.user)
         return Response({'success': True, 'message': 'Notification marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).update(is_read=True, read_at=timezone.now())
+        now = timezone.now()
+        with transaction.atomic():
+            count = Notification.objects.filter(
+                user=request.user,
+                is_read=False
+            ).update(is_read=True, read_at=now)
+            broadcasts = list(unread_for(request.user).filter(user__isnull=True).values_list('pk', flat=True))
+            NotificationRead.objects.bulk_create(
+                [NotificationRead(notification_id=pk, user=request.user, read_at=now) for pk in broadcasts],
+                ignore_conflicts=True,
+            )
+            count += len(broadcasts)
+            adjust_unread([request.user.pk], -count)
+        notify_streams([request.user.pk])
         return Response({
             'success': True,
             'message': f'{count} notifications marked as read'
@@ -44,12 +66,14 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications"""
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
+        count = unread_count(request.user)
         return Response({'count': count})
 
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """Issue a short-lived, single-use ticket for opening the SSE stream"""
+        return Response({'ticket': issue_stream_ticket(request.user)})
+
 
 class NotificationPreferenceViewSet(viewsets.ModelViewSet):
     """Notification preference management"""
@@ -83,8 +107,12 @@ class NotificationJobStatusViewSet(viewsets.ReadOnlyModelViewSet):
         success, message = run_notification_job(job.job_name, request.user)
         job.refresh_from_db()
         serializer = self.get_serializer(job)
-        return Response(
-            {'success': success, 'message': message, 'job': serializer.data},
-            status=status.HTTP_200_OK if success else status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+        if success:
+            response_status = status.HTTP_200_OK
+        elif job.lease_owner:
+            # Another worker holds the job's lease.
+            response_status = status.HTTP_409_CONFLICT
+        else:
+            response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return Response({'success': success, 'message': message, 'job': serializer.data}, status=response_status)
 
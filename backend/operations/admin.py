@@ -4,7 +4,7 @@ from .models import (
     DeliveryOrder, DeliveryItem,
     InternalTransfer, TransferItem,
     StockAdjustment, AdjustmentItem,
-    StockLedger
+    StockLedger, StockLedgerArchive, StockLedgerCheckpoint,
 )
 
 
@@ -67,3 +67,17 @@ class StockLedgerAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'product__sku', 'document_number')
     readonly_fields = ('created_at',)
 
+
+@admin.register(StockLedgerArchive)
+class StockLedgerArchiveAdmin(admin.ModelAdmin):
+    list_display = ('product', 'warehouse', 'transaction_type', 'quantity', 'balance_after', 'created_at', 'period')
+    list_filter = ('period', 'transaction_type', 'warehouse')
+    search_fields = ('product__name', 'product__sku', 'document_number')
+
+
+@admin.register(StockLedgerCheckpoint)
+class StockLedgerCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('product', 'warehouse', 'balance', 'archived_through', 'archived_rows')
+    list_filter = ('warehouse',)
+    search_fields = ('product__name', 'product__sku')
+
@@ -1,9 +1,9 @@
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
 
 from .models import AuditLog
 
 
-def log_audit_event(
+def _build_audit_log(
     *,
     document_type: str,
     document_id: int,
@@ -14,8 +14,7 @@ def log_audit_event(
     after: Dict[str, Any] | None = None,
     warehouse=None,
 ) -> AuditLog:
-    """Persist an audit entry."""
-    return AuditLog.objects.create(
+    return AuditLog(
         document_type=document_type.lower(),
         document_id=document_id,
         action=action,
@@ -26,3 +25,51 @@ def log_audit_event(
         after_data=after,
     )
 
+
+def log_audit_event(
+    *,
+    document_type: str,
+    document_id: int,
+    action: str,
+    user,
+    message: str = '',
+    before: Dict[str, Any] | None = None,
+    after: Dict[str, Any] | None = None,
+    warehouse=None,
+) -> AuditLog:
+    """Persist an audit entry."""
+    entry = _build_audit_log(
+        document_type=document_type,
+        document_id=document_id,
+        action=action,
+        user=user,
+        message=message,
+        before=before,
+        after=after,
+        warehouse=warehouse,
+    )
+    entry.save()
+    return entry
+
+
+def log_audit_events(entries: Iterable[Dict[str, Any]]) -> list[AuditLog]:
+    """Persist many audit entries with a single insert.
+
+    Each entry is a dict of the keyword arguments accepted by log_audit_event().
+    """
+    return AuditLog.objects.bulk_create([_build_audit_log(**entry) for entry in entries])
+
+
+def posted_line_summary(lines) -> list[Dict[str, Any]]:
+    """Describe posted stock lines for an audit entry's before/after data."""
+    return [
+        {
+            'product_id': line.product.id,
+            'warehouse_id': line.warehouse.id,
+            'bin_id': line.bin.id if line.bin else None,
+            'transaction_type': line.transaction_type,
+            'quantity_delta': str(line.delta),
+            'balance_after': str(line.balance_after),
+        }
+        for line in lines
+    ]
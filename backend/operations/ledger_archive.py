@@ -0,0 +1,194 @@
+"""Time-based archival of the stock ledger.
+
+StockLedger is append-only. Whole calendar months older than
+STOCK_LEDGER_HOT_DAYS move, chunk by chunk, into StockLedgerArchive (tagged
+with their month in `period`, so a month can be exported or dropped as a
+unit), and every (product, warehouse) keeps a StockLedgerCheckpoint with the
+balance the hot ledger opens at. The hot table then holds only recent months
+and its indexes stay small enough to stay cached.
+
+Readers don't need to know where the boundary is: ledger_querysets() returns
+the hot and archived segments with the same filters applied, and
+KeysetPagination merges them in (created_at, id) order.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.scoping import scope_queryset
+
+from .models import StockLedger, StockLedgerArchive, StockLedgerCheckpoint
+
+LEDGER_FIELDS = (
+    'id',
+    'product_id',
+    'warehouse_id',
+    'bin_id',
+    'transaction_type',
+    'document_number',
+    'quantity',
+    'balance_after',
+    'reference',
+    'created_by_id',
+    'created_at',
+)
+
+
+def archive_cutoff(now=None, hot_days: int | None = None):
+    """Start of the month containing now - hot_days; older rows are archived."""
+    now = now or timezone.now()
+    if hot_days is None:
+        hot_days = getattr(settings, 'STOCK_LEDGER_HOT_DAYS', 180)
+    boundary = timezone.localtime(now - timedelta(days=hot_days))
+    return boundary.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _period(created_at) -> date:
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def _advance_checkpoints(rows: list[dict], now) -> None:
+    """Record the newest archived balance per (product, warehouse) in `rows`."""
+    newest, counts = {}, Counter()
+    for row in rows:  # oldest first
+        key = (row['product_id'], row['warehouse_id'])
+        newest[key] = row
+        counts[key] += 1
+
+    existing = {
+        (checkpoint.product_id, checkpoint.warehouse_id): checkpoint
+        for checkpoint in StockLedgerCheckpoint.objects.select_for_update().filter(
+            product_id__in={key[0] for key in newest},
+            warehouse_id__in={key[1] for key in newest},
+        )
+    }
+    changed, missing = [], []
+    for key, row in newest.items():
+        checkpoint = existing.get(key)
+        if checkpoint is None:
+            missing.append(StockLedgerCheckpoint(
+                product_id=key[0],
+                warehouse_id=key[1],
+                balance=row['balance_after'],
+                archived_through=row['created_at'],
+                archived_rows=counts[key],
+            ))
+            continue
+        checkpoint.archived_rows += counts[key]
+        # A backdated row archived late must not roll the balance back.
+        if row['created_at'] >= checkpoint.archived_through:
+            checkpoint.balance = row['balance_after']
+            checkpoint.archived_through = row['created_at']
+        checkpoint.updated_at = now
+        changed.append(checkpoint)
+    StockLedgerCheckpoint.objects.bulk_create(missing)
+    StockLedgerCheckpoint.objects.bulk_update(
+        changed, ['balance', 'archived_through', 'archived_rows', 'updated_at'],
+    )
+
+
+def _move_chunk(cutoff, batch_size: int, now) -> Counter:
+    """Archive the oldest `batch_size` rows before `cutoff` in one transaction.
+
+    Returns rows moved per period.
+    """
+    with transaction.atomic():
+        rows = list(
+            StockLedger.objects.filter(created_at__lt=cutoff)
+            .order_by('created_at', 'id')
+            .values(*LEDGER_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return Counter()
+        StockLedgerArchive.objects.bulk_create(
+            [StockLedgerArchive(period=_period(row['created_at']), **row) for row in rows],
+            ignore_conflicts=True,
+        )
+        _advance_checkpoints(rows, now)
+        StockLedger.objects.filter(pk__in=[row['id'] for row in rows]).only('pk').delete()
+    return Counter(_period(row['created_at']).strftime('%Y-%m') for row in rows)
+
+
+def archive_stock_ledger(*, batch_size: int = 2000, hot_days: int | None = None, pause: float = 0, now=None) -> dict:
+    """Move ledger rows from before the hot window into the archive.
+
+    `pause` sleeps between chunks to leave room for posting. Returns
+    {'moved': n, 'cutoff': datetime, 'seconds': s, 'rows_per_second': r,
+    'by_period': {'YYYY-MM': n}}.
+    """
+    now = now or timezone.now()
+    cutoff = archive_cutoff(now, hot_days)
+    started = time.monotonic()
+    by_period = Counter()
+
+    while True:
+        moved = _move_chunk(cutoff, batch_size, now)
+        if not moved:
+            break
+        by_period.update(moved)
+        if pause:
+            time.sleep(pause)
+
+    seconds = time.monotonic() - started
+    total = sum(by_period.values())
+    return {
+        'moved': total,
+        'cutoff': cutoff,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(total / seconds) if seconds else total,
+        'by_period': dict(sorted(by_period.items())),
+    }
+
+
+def ledger_querysets(user=None, warehouse_fields=('warehouse',)):
+    """The hot and archived ledger segments, newest segment first.
+
+    Both have the same fields and relations, so callers can apply identical
+    filters to each and merge the results on (created_at, id).
+    """
+    segments = [
+        StockLedger.objects.select_related('product', 'warehouse', 'bin', 'created_by'),
+        StockLedgerArchive.objects.select_related('product', 'warehouse', 'bin', 'created_by'),
+    ]
+    if user is None:
+        return segments
+    return [scope_queryset(qs, user, warehouse_fields=warehouse_fields) for qs in segments]
+
+
+def balance_at(product_id: int, warehouse_id: int, moment=None) -> Decimal:
+    """A product's ledger balance in a warehouse as of `moment` (default: now).
+
+    Reads the hot ledger, then the checkpoint; only a moment before the
+    checkpoint falls back to the archive itself.
+    """
+    filters = {'product_id': product_id, 'warehouse_id': warehouse_id}
+    if moment is not None:
+        filters['created_at__lte'] = moment
+    balance = (
+        StockLedger.objects.filter(**filters)
+        .order_by('-created_at', '-id')
+        .values_list('balance_after', flat=True)
+        .first()
+    )
+    if balance is not None:
+        return balance
+
+    checkpoint = StockLedgerCheckpoint.objects.filter(product_id=product_id, warehouse_id=warehouse_id).first()
+    if checkpoint is None:
+        return Decimal('0')
+    if moment is None or moment >= checkpoint.archived_through:
+        return checkpoint.balance
+    balance = (
+        StockLedgerArchive.objects.filter(**filters)
+        .order_by('-created_at', '-id')
+        .values_list('balance_after', flat=True)
+        .first()
+    )
+    return balance if balance is not None else Decimal('0')
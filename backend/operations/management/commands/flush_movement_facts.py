@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from operations.movement_facts import flush_movement_refreshes
+
+
+class Command(BaseCommand):
+    help = "Re-roll the DailyMovementFact slices queued by document changes, once per slice per round"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Queue entries read per round (default: 5000).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=10.0,
+            help='Seconds between rounds; changes in between are coalesced (default: 10).',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Flush the queue once and exit instead of polling forever.',
+        )
+
+    def handle(self, *args, **options):
+        totals = {'refreshed': 0, 'deferred': 0}
+        try:
+            while True:
+                stats = flush_movement_refreshes(limit=options['batch_size'])
+                for key, value in stats.items():
+                    totals[key] += value
+                if stats['refreshed'] or stats['deferred']:
+                    self.stdout.write(f"Refreshed {stats['refreshed']} slices ({stats['deferred']} deferred).")
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Movement fact flush stopped: {totals['refreshed']} slices refreshed, {totals['deferred']} deferred."
+        ))
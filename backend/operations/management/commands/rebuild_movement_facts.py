@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from operations.movement_facts import rebuild_movement_facts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyMovementFact rollup from receipt, delivery and transfer lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only rebuild documents created in the last N days (default: everything).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert statement (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'])
+
+        written = rebuild_movement_facts(since=since, batch_size=options['batch_size'])
+
+        scope = f"since {since}" if since else "for all history"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily movement facts {scope}."))
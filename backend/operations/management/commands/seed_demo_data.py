@@ -5,6 +5,8 @@ from django.utils import timezone
 from datetime import date, timedelta
 
 from products.models import Category, Warehouse, Product, StockItem, Supplier, UnitOfMeasure
+from products.stock_summary import refresh_stock_summaries
+from operations.movement_facts import rebuild_movement_facts
 from operations.models import (
     Receipt, ReceiptItem, DeliveryOrder, DeliveryItem, InternalTransfer, TransferItem,
     StockAdjustment, AdjustmentItem, ReturnOrder, ReturnItem, CycleCountTask, CycleCountItem,
@@ -230,6 +232,8 @@ class Command(BaseCommand):
                 warehouse=warehouse,
                 defaults={"quantity": qty, "reserved_quantity": reserved},
         )
+        # Stock rows above were written directly, not through the posting engine.
+        refresh_stock_summaries()
 
         # 6) Suppliers
         Supplier.objects.get_or_create(
@@ -418,8 +422,10 @@ class Command(BaseCommand):
         # Add more adjustments for demo
         adjustment_count = StockAdjustment.objects.count()
         if adjustment_count < 5:
+            adjustment_numbers = StockAdjustment.reserve_document_numbers(3)
             for i in range(3):
                 extra_adjustment = StockAdjustment.objects.create(
+                    document_number=adjustment_numbers[i],
                     warehouse=main_wh if i % 2 == 0 else secondary_wh,
                     reason=f'Demo adjustment {i+1} - Inventory correction',
                     adjustment_type='increase' if i % 2 == 0 else 'decrease',
@@ -440,8 +446,10 @@ class Command(BaseCommand):
                     extra_adjustment.validate_and_complete()
 
         # Extra receipts (increase stock)
+        receipt_numbers = Receipt.reserve_document_numbers(3)
         for i in range(3):
             extra_receipt = Receipt.objects.create(
+                document_number=receipt_numbers[i],
                 warehouse=main_wh,
                 supplier="Global Electronics" if i % 2 == 0 else "Steel Corp",
                 supplier_reference=f"PO-EXTRA-{100 + i}",
@@ -822,4 +830,7 @@ class Command(BaseCommand):
                         message='Cycle count task started',
                     )
 
+        # Line items were bulk-inserted, which bypasses the incremental rollup.
+        rebuild_movement_facts()
+
         self.stdout.write(self.style.SUCCESS("Demo data seeded successfully."))
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+DOCUMENT_PREFIXES = {
+    'Receipt': 'REC',
+    'DeliveryOrder': 'DEL',
+    'ReturnOrder': 'RET',
+    'InternalTransfer': 'TRF',
+    'StockAdjustment': 'ADJ',
+    'CycleCountTask': 'CC',
+}
+
+
+def seed_document_sequences(apps, schema_editor):
+    """Start each sequence after the highest number already issued."""
+    DocumentSequence = apps.get_model('operations', 'DocumentSequence')
+    for model_name, prefix in DOCUMENT_PREFIXES.items():
+        model = apps.get_model('operations', model_name)
+        last_value = 0
+        numbers = model.objects.filter(document_number__startswith=f"{prefix}-").values_list('document_number', flat=True)
+        for number in numbers.iterator():
+            suffix = number[len(prefix) + 1:]
+            if suffix.isdigit():
+                last_value = max(last_value, int(suffix))
+        DocumentSequence.objects.create(prefix=prefix, last_value=last_value)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0016_auto_20251217_0220'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_document_sequences, reverse_code=migrations.RunPython.noop),
+    ]
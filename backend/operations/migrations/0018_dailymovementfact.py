@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:54
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productcost'),
+        ('operations', '0017_documentsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('movement_type', models.CharField(choices=[('receipt', 'Receipt'), ('delivery', 'Delivery'), ('transfer', 'Transfer')], max_length=20)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('waiting', 'Waiting'), ('ready', 'Ready'), ('done', 'Done'), ('canceled', 'Canceled')], max_length=20)),
+                ('completed_date', models.DateField(blank=True, null=True)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('purchase_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('priced_value', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('purchase_priced_value', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('unpriced_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unpriced_purchase_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                ('to_warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.warehouse')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.warehouse')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailymovementfact',
+            index=models.Index(fields=['movement_type', 'date', 'warehouse'], name='operations__movemen_9c505f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailymovementfact',
+            index=models.Index(fields=['movement_type', 'completed_date'], name='operations__movemen_bcac94_idx'),
+        ),
+    ]
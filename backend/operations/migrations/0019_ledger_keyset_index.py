@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0018_dailymovementfact'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['-created_at', '-id'], name='operations__created_c3760d_idx'),
+        ),
+    ]
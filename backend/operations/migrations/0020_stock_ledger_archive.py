@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0010_productcost'),
+        ('operations', '0019_ledger_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLedgerArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('period', models.DateField(help_text='First day of the month the row was posted in')),
+                ('transaction_type', models.CharField(choices=[('receipt', 'Receipt'), ('delivery', 'Delivery'), ('transfer_out', 'Transfer Out'), ('transfer_in', 'Transfer In'), ('adjustment', 'Adjustment'), ('return', 'Customer Return')], max_length=20)),
+                ('document_number', models.CharField(max_length=100)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reference', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField()),
+                ('bin', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='products.binlocation')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='products.warehouse')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockLedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('archived_through', models.DateTimeField(help_text='created_at of the newest archived row')),
+                ('archived_rows', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.warehouse')),
+            ],
+            options={
+                'unique_together': {('product', 'warehouse')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerarchive',
+            index=models.Index(fields=['product', 'warehouse', '-created_at'], name='operations__product_a6eb1d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerarchive',
+            index=models.Index(fields=['document_number'], name='operations__documen_6c05ad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerarchive',
+            index=models.Index(fields=['-created_at', '-id'], name='operations__created_8405e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerarchive',
+            index=models.Index(fields=['period'], name='operations__period_b7cc7c_idx'),
+        ),
+    ]
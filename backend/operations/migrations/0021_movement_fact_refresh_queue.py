@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productcost'),
+        ('operations', '0020_stock_ledger_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementFactRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('receipt', 'Receipt'), ('delivery', 'Delivery'), ('transfer', 'Transfer')], max_length=20)),
+                ('date', models.DateField()),
+                ('queued_at', models.DateTimeField()),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.warehouse')),
+            ],
+            options={
+                'unique_together': {('movement_type', 'date', 'warehouse')},
+            },
+        ),
+    ]
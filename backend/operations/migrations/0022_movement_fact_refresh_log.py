@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0021_movement_fact_refresh_queue'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='movementfactrefresh',
+            unique_together=set(),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
@@ -11,6 +12,57 @@ UNIT_OF_MEASURE_CHOICES = [
 ]
 
 
+class DocumentSequence(models.Model):
+    """Last allocated document number per prefix (REC, DEL, RET, TRF, ADJ, CC)."""
+    prefix = models.CharField(max_length=10, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.prefix} - {self.last_value}"
+
+    @classmethod
+    def reserve(cls, prefix: str, count: int = 1) -> range:
+        """Reserve `count` consecutive numbers for `prefix` and return them.
+
+        The increment is a single UPDATE on the sequence row, so concurrent
+        callers queue on that row lock instead of racing on the latest id, and
+        no two callers ever get the same number. The allocation joins the
+        caller's transaction: if the caller rolls back, so does the increment,
+        which keeps the numbering gap-free. A block (e.g. 100 numbers for a
+        bulk import) costs the same two queries as a single number.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        with transaction.atomic():
+            sequence = cls.objects.filter(prefix=prefix)
+            if not sequence.update(last_value=F('last_value') + count, updated_at=timezone.now()):
+                cls.objects.bulk_create([cls(prefix=prefix)], ignore_conflicts=True)
+                sequence.update(last_value=F('last_value') + count, updated_at=timezone.now())
+            last_value = sequence.values_list('last_value', flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
+
+
+class MovementLineMixin:
+    """Keeps the parent document's DailyMovementFact slice in step with its lines."""
+
+    document_field = None
+
+    # The queue entry commits with the line change, or not at all.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            getattr(self, self.document_field).schedule_movement_refresh()
+
+    def delete(self, *args, **kwargs):
+        document = getattr(self, self.document_field)
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            document.schedule_movement_refresh()
+        return result
+
+
 class BaseDocument(models.Model):
     """Base class for all inventory documents"""
     DOCUMENT_STATUS = [
@@ -41,12 +93,89 @@ class BaseDocument(models.Model):
     )
     approved_at = models.DateTimeField(null=True, blank=True)
 
+    # Prefix for document numbers allocated from DocumentSequence
+    document_prefix = 'DOC'
+
+    # Used by validate_and_complete()/complete_documents()
+    validation_label = 'Document'
+    validation_success_message = 'Document completed successfully'
+    posting_prefetch = ('items__product',)
+
+    # Warehouses whose dashboard figures this document affects
+    stock_warehouse_fields = ('warehouse',)
+
+    # DailyMovementFact.movement_type of this document's lines, if rolled up
+    movement_type = None
+
     class Meta:
         abstract = True
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.__class__.__name__} - {self.document_number}"
+
+    def save(self, *args, **kwargs):
+        from dashboard.cache import bump_stock_version
+
+        if self.document_number:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                bump_stock_version(self.stock_warehouse_ids())
+                self.schedule_movement_refresh()
+            return
+
+        # Allocate the number and insert in one transaction so a failed insert
+        # hands the number back instead of leaving a gap.
+        with transaction.atomic():
+            self.document_number = self.reserve_document_numbers()[0]
+            try:
+                super().save(*args, **kwargs)
+            except Exception:
+                self.document_number = ''
+                raise
+            bump_stock_version(self.stock_warehouse_ids())
+            self.schedule_movement_refresh()
+
+    def delete(self, *args, **kwargs):
+        from dashboard.cache import bump_stock_version
+
+        warehouse_ids = self.stock_warehouse_ids()
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            bump_stock_version(warehouse_ids)
+            self.schedule_movement_refresh()
+        return result
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rollup slice as loaded so moving the document to
+        # another warehouse also refreshes the slice it left.
+        if cls.movement_type and 'created_at' in field_names and 'warehouse_id' in field_names:
+            instance._loaded_movement_slice = instance.movement_slice()
+        return instance
+
+    def stock_warehouse_ids(self) -> set:
+        return {getattr(self, f'{field}_id') for field in self.stock_warehouse_fields}
+
+    def movement_slice(self):
+        """The (movement type, day, warehouse) DailyMovementFact slice of this document."""
+        if not self.movement_type or self.created_at is None:
+            return None
+        return (self.movement_type, timezone.localtime(self.created_at).date(), self.warehouse_id)
+
+    def schedule_movement_refresh(self):
+        """Queue this document's DailyMovementFact slice for re-rolling."""
+        from .movement_facts import schedule_movement_refresh
+
+        current = self.movement_slice()
+        schedule_movement_refresh(current, getattr(self, '_loaded_movement_slice', None))
+        self._loaded_movement_slice = current
+
+    @classmethod
+    def reserve_document_numbers(cls, count: int = 1) -> list[str]:
+        """Reserve `count` document numbers, e.g. for bulk imports or seeding."""
+        return [f"{cls.document_prefix}-{value:06d}" for value in DocumentSequence.reserve(cls.document_prefix, count)]
         
     def is_approved(self):
         """Check if document is approved"""
@@ -96,6 +225,38 @@ class BaseDocument(models.Model):
             return True
         return self.is_approved()
 
+    def validate_and_complete(self, user=None):
+        """Validate the document, post its stock movements and write ledger entries."""
+        from .posting import complete_documents
+
+        return complete_documents([self], user=user)[self.pk]
+
+    def stage_posting(self, posting):
+        """Check this document can be completed and stage its lines into `posting`.
+
+        Returns an error message (or None) rather than raising, so batch
+        validation can report failures per document.
+        """
+        if self.status != 'ready':
+            return f"{self.validation_label} must be in 'ready' status"
+
+        # Check approval requirement
+        if not self.can_transition_to_ready():
+            return f"{self.validation_label} requires approval before completion"
+
+        return self.add_posting_lines(posting)
+
+    def add_posting_lines(self, posting):
+        """Add this document's stock movements to `posting`.
+
+        Returns an error message or None. Stock documents override this; the
+        default posts nothing.
+        """
+        return None
+
+    def insufficient_stock_message(self, exc) -> str:
+        return str(exc)
+
 
 class ApprovalPolicy(models.Model):
     """Configurable policy deciding when documents require approval.
@@ -138,60 +299,39 @@ class ApprovalPolicy(models.Model):
 
 class Receipt(BaseDocument):
     """Receipt - Incoming stock from vendors"""
+    document_prefix = 'REC'
+    validation_label = 'Receipt'
+    validation_success_message = 'Receipt completed successfully'
+    posting_prefetch = ('items__product', 'items__bin')
+    movement_type = 'receipt'
+
     supplier = models.CharField(max_length=200)
     supplier_reference = models.CharField(max_length=100, blank=True)
 
-    def save(self, *args, **kwargs):
-        if not self.document_number:
-            last_receipt = Receipt.objects.order_by('-id').first()
-            num = (last_receipt.id if last_receipt else 0) + 1
-            self.document_number = f"REC-{num:06d}"
-        super().save(*args, **kwargs)
-
-    def validate_and_complete(self):
-        """Validate receipt and update stock"""
-        if self.status != 'ready':
-            return False, "Receipt must be in 'ready' status"
-            
-        # Check approval requirement
-        if not self.can_transition_to_ready():
-            return False, "Receipt requires approval before completion"
-        
-        # Update stock for each item
+    def add_posting_lines(self, posting):
+        """Stage received quantities (and optional bin put-away) as stock increases."""
         for item in self.items.all():
             # Optional bin-level validation: bin must belong to the same warehouse
             if item.bin is not None and item.bin.warehouse_id != self.warehouse_id:
-                return False, f"Bin {item.bin.code} does not belong to warehouse {self.warehouse.name}"
+                return f"Bin {item.bin.code} does not belong to warehouse {self.warehouse.name}"
 
-            received_qty = item.stock_quantity()
-
-            stock_item, created = StockItem.objects.get_or_create(
+            posting.add(
+                document=self,
                 product=item.product,
                 warehouse=self.warehouse,
-                defaults={'quantity': Decimal('0.00')}
+                bin=item.bin,
+                quantity=item.stock_quantity(),
+                transaction_type='receipt',
+                reference=self.supplier,
+                cost=item.quantity_received * item.unit_price if item.unit_price is not None else None,
             )
-            stock_item.quantity += received_qty
-            stock_item.save()
-
-            # Optional bin-level put-away
-            if item.bin is not None:
-                bin_stock, _ = BinStockItem.objects.get_or_create(
-                    product=item.product,
-                    warehouse=self.warehouse,
-                    bin=item.bin,
-                    defaults={'quantity': Decimal('0.00'), 'reserved_quantity': Decimal('0.00')},
-                )
-                bin_stock.quantity += received_qty
-                bin_stock.save()
-        
-        self.status = 'done'
-        self.completed_at = timezone.now()
-        self.save()
-        return True, "Receipt completed successfully"
+        return None
 
 
-class ReceiptItem(models.Model):
+class ReceiptItem(MovementLineMixin, models.Model):
     """Receipt Item"""
+    document_field = 'receipt'
+
     receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     bin = models.ForeignKey(
@@ -234,75 +374,47 @@ class ReceiptItem(models.Model):
 
 class DeliveryOrder(BaseDocument):
     """Delivery Order - Outgoing stock to customers"""
+    document_prefix = 'DEL'
+    validation_label = 'Delivery'
+    validation_success_message = 'Delivery completed successfully'
+    posting_prefetch = ('items__product', 'items__bin')
+    movement_type = 'delivery'
+
     customer = models.CharField(max_length=200)
     customer_reference = models.CharField(max_length=100, blank=True)
     shipping_address = models.TextField(blank=True)
 
-    def save(self, *args, **kwargs):
-        if not self.document_number:
-            last_delivery = DeliveryOrder.objects.order_by('-id').first()
-            num = (last_delivery.id if last_delivery else 0) + 1
-            self.document_number = f"DEL-{num:06d}"
-        super().save(*args, **kwargs)
-
-    def validate_and_complete(self):
-        """Validate delivery and update stock"""
-        if self.status != 'ready':
-            return False, "Delivery must be in 'ready' status"
-            
-        # Check approval requirement
-        if not self.can_transition_to_ready():
-            return False, "Delivery requires approval before completion"
-        
-        # Check stock availability and update
+    def add_posting_lines(self, posting):
+        """Stage shipped quantities as checked stock decreases."""
         for item in self.items.all():
             # Optional bin-level validation: bin must belong to the same warehouse
             if item.bin is not None and item.bin.warehouse_id != self.warehouse_id:
-                return False, f"Bin {item.bin.code} does not belong to warehouse {self.warehouse.name}"
+                return f"Bin {item.bin.code} does not belong to warehouse {self.warehouse.name}"
 
-            requested_quantity = item.stock_quantity()
-
-            # Use get_or_create to handle cases where StockItem doesn't exist yet
-            # If it doesn't exist, it means there's 0 stock, which we'll handle below
-            stock_item, created = StockItem.objects.get_or_create(
+            # Optional bin-level picking; missing bin records are skipped without failing delivery.
+            posting.add(
+                document=self,
                 product=item.product,
                 warehouse=self.warehouse,
-                defaults={'quantity': Decimal('0.00'), 'reserved_quantity': Decimal('0.00')}
+                bin=item.bin,
+                quantity=-item.stock_quantity(),
+                check_available=True,
+                transaction_type='delivery',
+                reference=self.customer,
             )
-            
-            # Check if we have enough available stock
-            available_qty = stock_item.available_quantity()
-            if available_qty < requested_quantity:
-                if created or stock_item.quantity == Decimal('0.00'):
-                    return False, f"No stock available for {item.product.name} in {self.warehouse.name}. Current stock: 0, Required: {requested_quantity}"
-                else:
-                    return False, f"Insufficient stock for {item.product.name} in {self.warehouse.name}. Available: {available_qty}, Required: {requested_quantity}"
-            
-            stock_item.quantity -= requested_quantity
-            stock_item.save()
-
-            # Optional bin-level picking
-            if item.bin is not None:
-                try:
-                    bin_stock = BinStockItem.objects.get(
-                        product=item.product,
-                        warehouse=self.warehouse,
-                        bin=item.bin,
-                    )
-                    bin_stock.quantity -= requested_quantity
-                    bin_stock.save()
-                except BinStockItem.DoesNotExist:
-                    # If no bin record exists, we skip without failing delivery.
-                    pass
-        
-        self.status = 'done'
-        self.completed_at = timezone.now()
-        self.save()
-        return True, "Delivery completed successfully"
+        return None
+
+    def insufficient_stock_message(self, exc) -> str:
+        requested_quantity = -exc.line.quantity
+        if exc.on_hand == Decimal('0.00'):
+            return f"No stock available for {exc.line.product.name} in {self.warehouse.name}. Current stock: 0, Required: {requested_quantity}"
+        return f"Insufficient stock for {exc.line.product.name} in {self.warehouse.name}. Available: {exc.available}, Required: {requested_quantity}"
 
 
-class DeliveryItem(models.Model):
+class DeliveryItem(MovementLineMixin, models.Model):
     """Delivery Item"""
+    document_field = 'delivery'
+
     delivery = models.ForeignKey(DeliveryOrder, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     bin = models.ForeignKey(
@@ -337,6 +449,9 @@ class DeliveryItem(models.Model):
 
 class ReturnOrder(BaseDocument):
     """Customer return (RMA) linked to a delivery order."""
+    document_prefix = 'RET'
+    validation_label = 'Return'
+    validation_success_message = 'Return processed successfully'
 
     DISPOSITION_CHOICES = [
         ('restock', 'Restock'),
@@ -354,13 +469,6 @@ class ReturnOrder(BaseDocument):
     reason = models.CharField(max_length=255, blank=True)
     disposition = models.CharField(max_length=20, choices=DISPOSITION_CHOICES, default='restock')
 
-    def save(self, *args, **kwargs):
-        if not self.document_number:
-            last_return = ReturnOrder.objects.order_by('-id').first()
-            num = (last_return.id if last_return else 0) + 1
-            self.document_number = f"RET-{num:06d}"
-        super().save(*args, **kwargs)
-
     def _get_target_warehouse_for_stock(self):
         """Decide where returned stock should land.
 
@@ -372,33 +480,23 @@ class ReturnOrder(BaseDocument):
         quarantine = ProductWarehouse.objects.filter(is_active=True, is_quarantine=True).first()
         return quarantine or self.warehouse
 
-    def validate_and_complete(self):
-        """Validate return and adjust stock appropriately."""
-        if self.status != 'ready':
-            return False, "Return must be in 'ready' status"
-            
-        # Check approval requirement
-        if not self.can_transition_to_ready():
-            return False, "Return requires approval before completion"
-
-        target_warehouse = self._get_target_warehouse_for_stock()
+    def add_posting_lines(self, posting):
+        """Stage returned quantities into the target warehouse.
 
-        # For restock/repair we add stock back into the target warehouse.
-        # For scrap we do not change stock (assume discarded), but still log in ledger.
+        For restock/repair we add stock back into the target warehouse.
+        For scrap we do not change stock (assume discarded), but still log in ledger.
+        """
+        self.target_warehouse = self._get_target_warehouse_for_stock()
         for item in self.items.all():
-            if self.disposition in ['restock', 'repair']:
-                stock_item, _ = StockItem.objects.get_or_create(
-                    product=item.product,
-                    warehouse=target_warehouse,
-                    defaults={'quantity': Decimal('0.00')},
-                )
-                stock_item.quantity += item.quantity
-                stock_item.save()
-
-        self.status = 'done'
-        self.completed_at = timezone.now()
-        self.save()
-        return True, "Return processed successfully"
+            posting.add(
+                document=self,
+                product=item.product,
+                warehouse=self.target_warehouse,
+                quantity=item.quantity if self.disposition in ['restock', 'repair'] else Decimal('0.00'),
+                transaction_type='return',
+                reference=f"Disposition: {self.disposition}; Reason: {self.reason}",
+            )
+        return None
 
 
 class ReturnItem(models.Model):
@@ -418,82 +516,60 @@ class ReturnItem(models.Model):
 
 class InternalTransfer(BaseDocument):
     """Internal Transfer - Move stock between warehouses"""
+    document_prefix = 'TRF'
+    validation_label = 'Transfer'
+    validation_success_message = 'Transfer completed successfully'
+    posting_prefetch = ('items__product', 'items__bin')
+    movement_type = 'transfer'
+    stock_warehouse_fields = ('warehouse', 'to_warehouse')
+
     to_warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='transfers_to')
 
-    def save(self, *args, **kwargs):
-        if not self.document_number:
-            last_transfer = InternalTransfer.objects.order_by('-id').first()
-            num = (last_transfer.id if last_transfer else 0) + 1
-            self.document_number = f"TRF-{num:06d}"
-        super().save(*args, **kwargs)
-
-    def validate_and_complete(self):
-        """Validate transfer and move stock"""
-        if self.status != 'ready':
-            return False, "Transfer must be in 'ready' status"
-            
-        # Check approval requirement
-        if not self.can_transition_to_ready():
-            return False, "Transfer requires approval before completion"
-            
-        if self.warehouse == self.to_warehouse:
-            return False, "Source and destination warehouses cannot be the same"
-        
-        # Move stock
+    def add_posting_lines(self, posting):
+        """Stage a checked decrease at the source and an increase at the destination."""
+        if self.warehouse_id == self.to_warehouse_id:
+            return "Source and destination warehouses cannot be the same"
+
         for item in self.items.all():
             # Optional bin-level validation: destination bin must belong to the destination warehouse
             if item.bin is not None and item.bin.warehouse_id != self.to_warehouse_id:
-                return False, f"Bin {item.bin.code} does not belong to destination warehouse {self.to_warehouse.name}"
+                return f"Bin {item.bin.code} does not belong to destination warehouse {self.to_warehouse.name}"
 
             transfer_qty = item.stock_quantity()
 
             # Decrease from source warehouse (warehouse-level aggregate only)
-            # Use get_or_create to handle cases where StockItem doesn't exist yet
-            from_stock, created = StockItem.objects.get_or_create(
+            posting.add(
+                document=self,
                 product=item.product,
                 warehouse=self.warehouse,
-                defaults={'quantity': Decimal('0.00'), 'reserved_quantity': Decimal('0.00')}
+                quantity=-transfer_qty,
+                check_available=True,
+                transaction_type='transfer_out',
+                reference=f"To {self.to_warehouse.name}",
             )
-            
-            # Check if we have enough available stock
-            available_qty = from_stock.available_quantity()
-            if available_qty < transfer_qty:
-                if created or from_stock.quantity == Decimal('0.00'):
-                    return False, f"No stock available for {item.product.name} in source warehouse {self.warehouse.name}. Current stock: 0, Required: {transfer_qty}"
-                else:
-                    return False, f"Insufficient stock for {item.product.name} in source warehouse {self.warehouse.name}. Available: {available_qty}, Required: {transfer_qty}"
-            
-            from_stock.quantity -= transfer_qty
-            from_stock.save()
-            
-            # Increase in destination warehouse
-            to_stock, created = StockItem.objects.get_or_create(
+            # Increase in destination warehouse, with optional bin-level put-away
+            posting.add(
+                document=self,
                 product=item.product,
                 warehouse=self.to_warehouse,
-                defaults={'quantity': Decimal('0.00')}
+                bin=item.bin,
+                quantity=transfer_qty,
+                transaction_type='transfer_in',
+                reference=f"From {self.warehouse.name}",
             )
-            to_stock.quantity += transfer_qty
-            to_stock.save()
-
-            # Optional bin-level put-away in destination warehouse
-            if item.bin is not None:
-                to_bin_stock, _ = BinStockItem.objects.get_or_create(
-                    product=item.product,
-                    warehouse=self.to_warehouse,
-                    bin=item.bin,
-                    defaults={'quantity': Decimal('0.00'), 'reserved_quantity': Decimal('0.00')},
-                )
-                to_bin_stock.quantity += transfer_qty
-                to_bin_stock.save()
-        
-        self.status = 'done'
-        self.completed_at = timezone.now()
-        self.save()
-        return True, "Transfer completed successfully"
+        return None
 
+    def insufficient_stock_message(self, exc) -> str:
+        transfer_qty = -exc.line.quantity
+        if exc.on_hand == Decimal('0.00'):
+            return f"No stock available for {exc.line.product.name} in source warehouse {self.warehouse.name}. Current stock: 0, Required: {transfer_qty}"
+        return f"Insufficient stock for {exc.line.product.name} in source warehouse {self.warehouse.name}. Available: {exc.available}, Required: {transfer_qty}"
 
-class TransferItem(models.Model):
+
+class TransferItem(MovementLineMixin, models.Model):
     """Transfer Item"""
+    document_field = 'transfer'
+
     transfer = models.ForeignKey(InternalTransfer, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     bin = models.ForeignKey(
@@ -528,6 +604,10 @@ class TransferItem(models.Model):
 
 class StockAdjustment(BaseDocument):
     """Stock Adjustment - Fix inventory discrepancies"""
+    document_prefix = 'ADJ'
+    validation_label = 'Adjustment'
+    validation_success_message = 'Adjustment completed successfully'
+
     reason = models.CharField(max_length=200)
     adjustment_type = models.CharField(
         max_length=20,
@@ -539,43 +619,23 @@ class StockAdjustment(BaseDocument):
         default='set'
     )
 
-    def save(self, *args, **kwargs):
-        if not self.document_number:
-            last_adjustment = StockAdjustment.objects.order_by('-id').first()
-            num = (last_adjustment.id if last_adjustment else 0) + 1
-            self.document_number = f"ADJ-{num:06d}"
-        super().save(*args, **kwargs)
-
-    def validate_and_complete(self):
-        """Validate adjustment and update stock"""
-        if self.status != 'ready':
-            return False, "Adjustment must be in 'ready' status"
-            
-        # Check approval requirement
-        if not self.can_transition_to_ready():
-            return False, "Adjustment requires approval before completion"
-        
-        # Apply adjustments
+    def add_posting_lines(self, posting):
+        """Stage increase/decrease/set adjustments for each line."""
         for item in self.items.all():
-            stock_item, created = StockItem.objects.get_or_create(
-                product=item.product,
-                warehouse=self.warehouse,
-                defaults={'quantity': Decimal('0.00')}
-            )
-            
+            line = {
+                'document': self,
+                'product': item.product,
+                'warehouse': self.warehouse,
+                'transaction_type': 'adjustment',
+                'reference': self.reason,
+            }
             if self.adjustment_type == 'increase':
-                stock_item.quantity += item.adjustment_quantity
+                posting.add(quantity=item.adjustment_quantity, **line)
             elif self.adjustment_type == 'decrease':
-                stock_item.quantity = max(Decimal('0.00'), stock_item.quantity - item.adjustment_quantity)
+                posting.add(quantity=-item.adjustment_quantity, clamp_at_zero=True, **line)
             else:  # set
-                stock_item.quantity = item.adjustment_quantity
-            
-            stock_item.save()
-        
-        self.status = 'done'
-        self.completed_at = timezone.now()
-        self.save()
-        return True, "Adjustment completed successfully"
+                posting.add(set_quantity=item.adjustment_quantity, **line)
+        return None
 
 
 class AdjustmentItem(models.Model):
@@ -621,14 +681,136 @@ class StockLedger(models.Model):
         indexes = [
             models.Index(fields=['product', 'warehouse', '-created_at']),
             models.Index(fields=['document_number']),
+            # Keyset pagination order for unfiltered/scoped listings.
+            models.Index(fields=['-created_at', '-id']),
         ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.product.name} - {self.quantity}"
 
 
+class StockLedgerArchive(models.Model):
+    """StockLedger rows moved out of the hot table by operations.ledger_archive.
+
+    Same columns and relations as StockLedger (plus the month they belong to),
+    so ledger filters and serializers apply unchanged and readers can continue
+    from the hot table into the archive. Every archived row is older than every
+    hot row.
+    """
+    id = models.BigIntegerField(primary_key=True)  # the original StockLedger id
+    period = models.DateField(help_text='First day of the month the row was posted in')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='+')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='+')
+    bin = models.ForeignKey(BinLocation, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    transaction_type = models.CharField(max_length=20, choices=StockLedger.TRANSACTION_TYPES)
+    document_number = models.CharField(max_length=100)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2)
+    reference = models.CharField(max_length=200, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'warehouse', '-created_at']),
+            models.Index(fields=['document_number']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['period']),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - {self.product_id} - {self.quantity} (archived)"
+
+
+class StockLedgerCheckpoint(models.Model):
+    """Opening balance of the hot ledger for one product in one warehouse.
+
+    Holds the balance_after of the newest archived row, so a balance before the
+    first hot row is a single lookup rather than a scan of the archive.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='+')
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    archived_through = models.DateTimeField(help_text='created_at of the newest archived row')
+    archived_rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['product', 'warehouse']
+
+    def __str__(self):
+        return f"{self.product_id}@{self.warehouse_id}: {self.balance} through {self.archived_through:%Y-%m-%d}"
+
+
+class DailyMovementFact(models.Model):
+    """Daily rollup of receipt/delivery/transfer lines for trend analytics.
+
+    One row per (day, warehouse, product, movement type, document status,
+    completion day), maintained by operations.movement_facts. Quantities are
+    kept in the units they were entered in, split by unit of measure, so
+    that a later change to a product's conversion factor is applied at read
+    time instead of going stale here.
+    """
+    MOVEMENT_TYPES = [
+        ('receipt', 'Receipt'),
+        ('delivery', 'Delivery'),
+        ('transfer', 'Transfer'),
+    ]
+
+    date = models.DateField()
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='+')
+    # Destination of transfers, so facts can be scoped like the documents.
+    to_warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
+    status = models.CharField(max_length=20, choices=BaseDocument.DOCUMENT_STATUS)
+    completed_date = models.DateField(null=True, blank=True)
+
+    line_count = models.PositiveIntegerField(default=0)
+    # Line quantities as entered, and the part of them entered in purchase units
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    purchase_quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    # Priced (receipt) lines: sum of quantity * unit_price, by unit of measure
+    priced_value = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal('0.0000'))
+    purchase_priced_value = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal('0.0000'))
+    # Lines without a price are valued at the weighted-average cost when read
+    unpriced_quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    unpriced_purchase_quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['date']
+        indexes = [
+            models.Index(fields=['movement_type', 'date', 'warehouse']),
+            models.Index(fields=['movement_type', 'completed_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.movement_type} {self.status} - {self.product_id}@{self.warehouse_id}"
+
+
+class MovementFactRefresh(models.Model):
+    """A change to a DailyMovementFact slice, queued for re-rolling.
+
+    Appended in the same transaction as the line or status change and
+    removed once the slice has been rebuilt. operations.movement_facts
+    flushes the queue in batches, re-rolling each queued slice once however
+    many entries it has; a refresh that fails (lock contention, a dropped
+    connection) leaves its entries queued rather than the rollup stale.
+    """
+    movement_type = models.CharField(max_length=20, choices=DailyMovementFact.MOVEMENT_TYPES)
+    date = models.DateField()
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='+')
+    queued_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.movement_type} {self.date} @{self.warehouse_id}"
+
+
 class CycleCountTask(BaseDocument):
     """Cycle count task for physical inventory counting."""
+    document_prefix = 'CC'
+
     METHOD_CHOICES = [
         ('full', 'Full Count'),
         ('partial', 'Partial Count'),
@@ -645,13 +827,6 @@ class CycleCountTask(BaseDocument):
         related_name='cycle_count_task',
     )
 
-    def save(self, *args, **kwargs):
-        if not self.document_number:
-            last_task = CycleCountTask.objects.order_by('-id').first()
-            num = (last_task.id if last_task else 0) + 1
-            self.document_number = f"CC-{num:06d}"
-        super().save(*args, **kwargs)
-
 
 class CycleCountItem(models.Model):
     """Line item within a cycle count task."""
@@ -0,0 +1,214 @@
+"""Maintenance of the DailyMovementFact rollup.
+
+Facts are rebuilt per slice: every line of one movement type, for documents
+created on one day in one warehouse. Re-rolling a slice from its line items
+is far simpler than tracking per-line deltas and stays correct whatever
+changed (status, quantities, lines added/removed), but it costs O(lines in
+the slice), so it must not run on every save.
+
+Saves only queue their slice in MovementFactRefresh, inside the changing
+transaction. The queue is flushed in the background by `manage.py flush_movement_facts`, and
+by the dashboard before it reads the rollup, so each slice is re-rolled once
+per flush rather than once per save. A slice that can't be refreshed (e.g.
+under lock contention) stays queued for the next flush.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from products.models import Warehouse
+
+from .models import DailyMovementFact, DeliveryItem, MovementFactRefresh, ReceiptItem, TransferItem
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+# movement type -> (line model, document relation, quantity field, price field)
+MOVEMENT_SOURCES = {
+    'receipt': (ReceiptItem, 'receipt', 'quantity_received', 'unit_price'),
+    'delivery': (DeliveryItem, 'delivery', 'quantity', None),
+    'transfer': (TransferItem, 'transfer', 'quantity', None),
+}
+
+# Attempts per slice in one flush, and the backoff before the first retry
+REFRESH_ATTEMPTS = 3
+REFRESH_BACKOFF = 0.05
+
+
+def _line_rows(movement_type: str, lines):
+    _, document, quantity_field, price_field = MOVEMENT_SOURCES[movement_type]
+    fields = {
+        'created_at': f'{document}__created_at',
+        'warehouse_id': f'{document}__warehouse_id',
+        'status': f'{document}__status',
+        'completed_at': f'{document}__completed_at',
+        'product_id': 'product_id',
+        'unit_of_measure': 'unit_of_measure',
+        'quantity': quantity_field,
+    }
+    if movement_type == 'transfer':
+        fields['to_warehouse_id'] = f'{document}__to_warehouse_id'
+    if price_field:
+        fields['price'] = price_field
+
+    for values in lines.values_list(*fields.values()).iterator(chunk_size=2000):
+        line = dict(zip(fields, values))
+        completed_at = line['completed_at']
+        key = (
+            timezone.localtime(line['created_at']).date(),
+            line['warehouse_id'],
+            line.get('to_warehouse_id'),
+            line['product_id'],
+            line['status'],
+            timezone.localtime(completed_at).date() if line['status'] == 'done' and completed_at else None,
+        )
+        # A zero price counts as unpriced, as in the receipt valuation.
+        yield key, line['unit_of_measure'] == 'purchase', line['quantity'] or ZERO, line.get('price') or None
+
+
+def _aggregate(movement_type: str, lines) -> list[DailyMovementFact]:
+    totals = defaultdict(lambda: {
+        'line_count': 0,
+        'quantity': ZERO,
+        'purchase_quantity': ZERO,
+        'priced_value': ZERO,
+        'purchase_priced_value': ZERO,
+        'unpriced_quantity': ZERO,
+        'unpriced_purchase_quantity': ZERO,
+    })
+    for key, in_purchase_units, quantity, price in _line_rows(movement_type, lines):
+        row = totals[key]
+        row['line_count'] += 1
+        row['quantity'] += quantity
+        if in_purchase_units:
+            row['purchase_quantity'] += quantity
+        if price is not None:
+            row['purchase_priced_value' if in_purchase_units else 'priced_value'] += quantity * price
+        else:
+            row['unpriced_purchase_quantity' if in_purchase_units else 'unpriced_quantity'] += quantity
+
+    return [
+        DailyMovementFact(
+            date=day,
+            warehouse_id=warehouse_id,
+            to_warehouse_id=to_warehouse_id,
+            product_id=product_id,
+            movement_type=movement_type,
+            status=status,
+            completed_date=completed_date,
+            **values,
+        )
+        for (day, warehouse_id, to_warehouse_id, product_id, status, completed_date), values in totals.items()
+    ]
+
+
+def refresh_movement_facts(movement_type: str, day, warehouse_id) -> int:
+    """Re-roll one (movement type, day, warehouse) slice from its line items."""
+    model, document, _, _ = MOVEMENT_SOURCES[movement_type]
+    lines = model.objects.filter(**{
+        f'{document}__created_at__date': day,
+        f'{document}__warehouse_id': warehouse_id,
+    })
+    with transaction.atomic():
+        DailyMovementFact.objects.filter(movement_type=movement_type, date=day, warehouse_id=warehouse_id).delete()
+        facts = DailyMovementFact.objects.bulk_create(_aggregate(movement_type, lines))
+    return len(facts)
+
+
+def _refresh_queued(key, entry_ids) -> bool:
+    """Re-roll one slice and drop the queue entries read for it; False if it failed."""
+    movement_type, day, warehouse_id = key
+    for attempt in range(REFRESH_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                # Serialize refreshes per warehouse, so two flushes can't both
+                # re-insert a slice. NO KEY UPDATE leaves postings (which only
+                # reference the warehouse) unblocked.
+                list(Warehouse.objects.select_for_update(no_key=True).filter(pk=warehouse_id).values_list('pk'))
+                refresh_movement_facts(movement_type, day, warehouse_id)
+                # Only the entries read before the lines: a change committed
+                # since then keeps its own entry for the next flush.
+                MovementFactRefresh.objects.filter(pk__in=entry_ids).delete()
+            return True
+        except DatabaseError:
+            if attempt + 1 < REFRESH_ATTEMPTS:
+                time.sleep(REFRESH_BACKOFF * 2 ** attempt)
+    return False
+
+
+def flush_movement_refreshes(limit: int | None = None) -> dict:
+    """Re-roll every queued slice once, however many changes queued it.
+
+    Reads at most `limit` queue entries, oldest first. Slices that still
+    can't be refreshed stay queued for the next flush. Returns
+    {'refreshed': slices, 'deferred': slices}.
+    """
+    stats = {'refreshed': 0, 'deferred': 0}
+    try:
+        entries = list(
+            MovementFactRefresh.objects.order_by('pk')
+            .values_list('pk', 'movement_type', 'date', 'warehouse_id')[:limit]
+        )
+    except DatabaseError:
+        logger.info("Movement fact refresh deferred; the queue is busy")
+        return stats
+
+    by_slice = defaultdict(list)
+    for pk, *key in entries:
+        by_slice[tuple(key)].append(pk)
+    for key, entry_ids in by_slice.items():
+        if _refresh_queued(key, entry_ids):
+            stats['refreshed'] += 1
+        else:
+            stats['deferred'] += 1
+            logger.info("Movement fact refresh for %s deferred; it stays queued", key)
+    return stats
+
+
+def schedule_movement_refresh(*slices) -> None:
+    """Queue the given slices (None entries are ignored) for the next flush.
+
+    The entries are plain inserts in the caller's transaction, so they commit
+    (or roll back) with the change without locking anything other writers
+    touch.
+    """
+    slices = {key for key in slices if key is not None}
+    if not slices:
+        return
+    now = timezone.now()
+    MovementFactRefresh.objects.bulk_create([
+        MovementFactRefresh(movement_type=movement_type, date=day, warehouse_id=warehouse_id, queued_at=now)
+        for movement_type, day, warehouse_id in slices
+    ])
+
+
+def rebuild_movement_facts(since=None, batch_size: int = 1000) -> int:
+    """Rebuild the rollup from every line item, or only from day `since` on.
+
+    Returns the number of facts written.
+    """
+    written = 0
+    with transaction.atomic():
+        for movement_type, (model, document, _, _) in MOVEMENT_SOURCES.items():
+            facts = DailyMovementFact.objects.filter(movement_type=movement_type)
+            lines = model.objects.all()
+            if since is not None:
+                facts = facts.filter(date__gte=since)
+                lines = lines.filter(**{f'{document}__created_at__date__gte': since})
+            facts.delete()
+            queued = MovementFactRefresh.objects.filter(movement_type=movement_type)
+            if since is not None:
+                queued = queued.filter(date__gte=since)
+            queued.delete()
+            written += len(DailyMovementFact.objects.bulk_create(
+                _aggregate(movement_type, lines),
+                batch_size=batch_size,
+            ))
+    return written
@@ -0,0 +1,139 @@
+"""Keyset (cursor) pagination for append-only, time-ordered tables.
+
+Pages are addressed by the (created_at, id) of the row at their edge instead
+of by an OFFSET, so the database seeks straight to the next page through a
+(..., created_at, id) index and the 10,000th page costs the same as the first.
+There is no total count: counting a multi-million-row ledger is exactly the
+scan this avoids.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(created_at, pk, reverse: bool = False) -> str:
+    raw = f'{int(reverse)}|{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+    """Return ((created_at, pk), reverse); raises ValueError if malformed."""
+    try:
+        reverse, created_at, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split('|')
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(cursor) from e
+    created_at = parse_datetime(created_at)
+    if created_at is None or reverse not in ('0', '1'):
+        raise ValueError(cursor)
+    return (created_at, int(pk)), reverse == '1'
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pages keyed on (created_at, id).
+
+    Responses are {'next', 'previous', 'results'}; follow the links (or pass
+    ?cursor=) to move between pages. ?page_size= is honoured up to
+    max_page_size.
+    """
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_segments([queryset], request, view)
+
+    def _seek(self, queryset, position, reverse: bool):
+        # Walking backwards (a "previous" link) reads oldest-first from the
+        # cursor and flips the page, so both directions use the same index.
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+        if position:
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        return queryset[:self.page_size + 1]
+
+    def paginate_segments(self, querysets, request, view=None):
+        """Paginate the union of several querysets sharing created_at/id keys.
+
+        Each segment (e.g. a hot table and its archive) is read with the same
+        seek and the rows are merged, so a page can straddle the boundary.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        position, reverse = None, False
+        if cursor:
+            try:
+                position, reverse = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = []
+        for queryset in querysets:
+            rows.extend(self._seek(queryset, position, reverse))
+        if len(querysets) > 1:
+            rows.sort(key=lambda row: (row.created_at, row.pk), reverse=not reverse)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def _link(self, row, reverse: bool):
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(row.created_at, row.pk, reverse))
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
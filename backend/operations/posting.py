@@ -0,0 +1,457 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from products.models import StockItem, BinStockItem
+from products.costing import apply_receipt_costs
+from products.stock_summary import apply_stock_deltas
+from dashboard.cache import bump_stock_version
+
+from .models import StockLedger
+from .movement_facts import schedule_movement_refresh
+
+ZERO = Decimal('0.00')
+# Keys matched per locking query; keeps bound parameters under SQLite's limit.
+LOCK_CHUNK_SIZE = 200
+
+
+class InsufficientStockError(Exception):
+    """Raised when a checked decrement exceeds the available quantity."""
+
+    def __init__(self, line: 'PostingLine', available: Decimal, on_hand: Decimal):
+        self.line = line
+        self.available = available
+        self.on_hand = on_hand
+        super().__init__(
+            f"Insufficient stock for {line.product.name} in {line.warehouse.name}. "
+            f"Available: {available}, Required: {-line.quantity}"
+        )
+
+
+class PostingLine:
+    """One stock movement (and its ledger row) requested by a document line.
+
+    `quantity` is a signed delta in stock units. When `set_quantity` is given
+    the warehouse balance is set to that value instead and the delta is
+    derived from the current balance. `cost` is the extended purchase cost of
+    an incoming quantity and feeds the weighted-average cost index. Lines
+    added for a `document` share its document number and are accepted or
+    rejected together. `delta`,
+    `balance_after` and `bin_balance_after` are filled in by
+    `StockPosting.post()`.
+    """
+
+    def __init__(
+        self,
+        *,
+        product,
+        warehouse,
+        quantity: Decimal = ZERO,
+        transaction_type: str,
+        bin=None,
+        set_quantity: Decimal | None = None,
+        check_available: bool = False,
+        clamp_at_zero: bool = False,
+        reference: str = '',
+        cost: Decimal | None = None,
+        document=None,
+    ):
+        self.document = document
+        self.document_number = getattr(document, 'document_number', '')
+        self.product = product
+        self.warehouse = warehouse
+        self.quantity = quantity
+        self.transaction_type = transaction_type
+        self.bin = bin
+        self.set_quantity = set_quantity
+        self.check_available = check_available
+        self.clamp_at_zero = clamp_at_zero
+        self.reference = reference
+        self.cost = cost
+
+        self.delta: Decimal | None = None
+        self.balance_after: Decimal | None = None
+        self.bin_balance_after: Decimal | None = None
+
+    @property
+    def group(self):
+        return getattr(self.document, 'pk', None)
+
+    @property
+    def creates_stock_row(self) -> bool:
+        """Whether posting this line needs a StockItem row to exist."""
+        if self.set_quantity is not None:
+            return True
+        return self.quantity > ZERO or (self.quantity < ZERO and not self.check_available)
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return (self.product.id, self.warehouse.id)
+
+    @property
+    def bin_key(self) -> tuple[int, int, int] | None:
+        if self.bin is None:
+            return None
+        return (self.product.id, self.warehouse.id, self.bin.id)
+
+
+def _lock_rows(model, keys, key_fields, create=frozenset()):
+    """Fetch and row-lock every existing row for `keys`.
+
+    Keys in `create` that have no row yet first get a zero-quantity row;
+    creation ignores conflicts so a concurrent posting inserting the same row
+    first is harmless. Then all rows are locked in one pass in key order, so
+    concurrent postings touching overlapping rows always acquire their locks
+    in the same sequence and cannot deadlock.
+    """
+    if not keys:
+        return {}
+    fields = [f"{field}_id" for field in key_fields]
+    ordered = sorted(keys)
+
+    def matching(chunk):
+        # Match exact keys (not the product x warehouse cross product) so
+        # only the rows being posted are touched.
+        match = Q()
+        for key in chunk:
+            match |= Q(**dict(zip(fields, key)))
+        return model.objects.filter(match)
+
+    if create:
+        wanted = sorted(set(create) & set(keys))
+        existing = set()
+        for start in range(0, len(wanted), LOCK_CHUNK_SIZE):
+            existing.update(matching(wanted[start:start + LOCK_CHUNK_SIZE]).values_list(*fields))
+        missing = [key for key in wanted if key not in existing]
+        if missing:
+            model.objects.bulk_create(
+                [model(quantity=ZERO, reserved_quantity=ZERO, **dict(zip(fields, key))) for key in missing],
+                ignore_conflicts=True,
+            )
+
+    rows = {}
+    # Chunks follow key order, which keeps the overall lock order deterministic.
+    for start in range(0, len(ordered), LOCK_CHUNK_SIZE):
+        for row in matching(ordered[start:start + LOCK_CHUNK_SIZE]).select_for_update().order_by(*fields):
+            rows[tuple(getattr(row, field) for field in fields)] = row
+    return rows
+
+
+def _quantity_case(amounts: dict) -> Case:
+    return Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+class StockPosting:
+    """Set-based, concurrency-safe stock posting for document validation.
+
+    Lines are collected with `add()` and applied by `post()` inside a single
+    transaction. All affected StockItem/BinStockItem rows are locked up front
+    in a deterministic order, deltas are checked in memory and then written
+    back with bulk statements plus a single StockLedger insert, so the number
+    of queries is constant per posting regardless of how many lines a
+    document has.
+
+    Checked decrements (deliveries, transfers out) are applied as one
+    conditional `quantity - reserved >= qty` UPDATE, so stock can never be
+    oversold even on backends where `select_for_update()` is a no-op.
+    The per-product ProductStockSummary totals are updated in the same
+    transaction.
+    """
+
+    def __init__(self, *, user=None):
+        self.user = user
+        self.lines: list[PostingLine] = []
+        self.rejected: dict = {}
+
+    def add(self, **kwargs) -> PostingLine:
+        line = PostingLine(**kwargs)
+        self.lines.append(line)
+        return line
+
+    def discard(self, group):
+        """Drop every line staged for the document with pk `group`."""
+        self.lines = [line for line in self.lines if line.group != group]
+
+    def post(self, partial: bool = False) -> list[PostingLine]:
+        """Apply all lines atomically.
+
+        Raises InsufficientStockError (after rolling back every write) when a
+        checked decrement exceeds the available quantity. With `partial=True`
+        documents that fail the in-memory check are dropped instead and
+        recorded in `rejected` ({document pk: InsufficientStockError}), so
+        the remaining documents can still be posted in the same pass.
+        """
+        self.rejected = {}
+        with transaction.atomic():
+            stock_rows = _lock_rows(
+                StockItem,
+                {line.key for line in self.lines},
+                ('product', 'warehouse'),
+                create={line.key for line in self.lines if line.creates_stock_row},
+            )
+            bin_lines = [line for line in self.lines if line.bin_key is not None]
+            bin_rows = _lock_rows(
+                BinStockItem,
+                {line.bin_key for line in bin_lines},
+                ('product', 'warehouse', 'bin'),
+                create={line.bin_key for line in bin_lines if line.quantity > ZERO},
+            )
+
+            self._apply_in_memory(stock_rows, bin_rows, partial)
+            net = defaultdict(Decimal)
+            for line in self.lines:
+                net[line.key] += line.delta
+
+            self._write_stock(stock_rows, net)
+            self._write_bins(bin_rows)
+            apply_stock_deltas(net)
+            bump_stock_version({line.warehouse.id for line in self.lines})
+            apply_receipt_costs(
+                (line.product.id, line.warehouse.id, line.delta, line.cost)
+                for line in self.lines
+                if line.cost is not None
+            )
+            self._resolve_balances(stock_rows, net)
+
+            StockLedger.objects.bulk_create([
+                StockLedger(
+                    product=line.product,
+                    warehouse=line.warehouse,
+                    bin=line.bin,
+                    transaction_type=line.transaction_type,
+                    document_number=line.document_number,
+                    quantity=line.delta,
+                    balance_after=line.balance_after,
+                    reference=line.reference,
+                    created_by=self.user or line.document.created_by,
+                )
+                for line in self.lines
+            ])
+        return self.lines
+
+    def _apply_in_memory(self, stock_rows, bin_rows, partial):
+        """Compute each line's delta against the locked snapshot.
+
+        Lines are evaluated document by document so a rejected document
+        leaves no trace in the running balances of the ones after it.
+        """
+        balances = {key: row.quantity for key, row in stock_rows.items()}
+        bin_balances = {key: row.quantity for key, row in bin_rows.items()}
+
+        for group, lines in groupby(self.lines, key=lambda line: line.group):
+            staged = {}
+            staged_bins = {}
+            try:
+                for line in lines:
+                    current = staged.get(line.key, balances.get(line.key, ZERO))
+                    if line.set_quantity is not None:
+                        new_balance = line.set_quantity
+                    else:
+                        new_balance = current + line.quantity
+                        if line.check_available and line.quantity < ZERO:
+                            row = stock_rows.get(line.key)
+                            reserved = row.reserved_quantity if row is not None else ZERO
+                            available = current - reserved
+                            if available < -line.quantity:
+                                raise InsufficientStockError(line, available, current)
+                        if line.clamp_at_zero and new_balance < ZERO:
+                            new_balance = ZERO
+
+                    line.delta = new_balance - current
+                    line.balance_after = new_balance
+                    staged[line.key] = new_balance
+
+                    # Bin rows are created on put-away; picks from unknown bins are skipped.
+                    if line.bin_key in bin_balances:
+                        bin_balance = staged_bins.get(line.bin_key, bin_balances[line.bin_key]) + line.delta
+                        staged_bins[line.bin_key] = bin_balance
+                        line.bin_balance_after = bin_balance
+            except InsufficientStockError as exc:
+                if not partial or group is None:
+                    raise
+                self.rejected[group] = exc
+                continue
+
+            balances.update(staged)
+            bin_balances.update(staged_bins)
+
+        if self.rejected:
+            self.lines = [line for line in self.lines if line.group not in self.rejected]
+
+    def _write_stock(self, stock_rows, net):
+        now = timezone.now()
+        absolute = set()
+        clamped = set()
+        checked = {}
+        for line in self.lines:
+            if line.set_quantity is not None or line.clamp_at_zero:
+                absolute.add(line.key)
+            if line.clamp_at_zero:
+                clamped.add(line.key)
+            if line.check_available and line.key not in checked:
+                checked[line.key] = line
+
+        decrements = {}
+        changed = []
+        for key, row in stock_rows.items():
+            delta = net.get(key, ZERO)
+            if delta == ZERO:
+                continue
+            if delta < ZERO and key in checked and key not in absolute:
+                decrements[row.pk] = -delta
+                continue
+            # Sets and clamps were resolved against the snapshot into a delta;
+            # applying it relative to the row keeps concurrent changes that
+            # select_for_update() could not block (e.g. on SQLite).
+            if key in clamped:
+                row.quantity = Greatest(F('quantity') + delta, Value(ZERO))
+            else:
+                row.quantity = F('quantity') + delta
+            row.updated_at = now
+            changed.append(row)
+
+        if decrements:
+            need = _quantity_case(decrements)
+            updated = StockItem.objects.filter(
+                pk__in=list(decrements),
+                quantity__gte=F('reserved_quantity') + need,
+            ).update(quantity=F('quantity') - need, updated_at=now)
+            if updated != len(decrements):
+                # Another transaction consumed the stock after our snapshot.
+                # Rows the UPDATE skipped still carry their old timestamp.
+                short = StockItem.objects.filter(pk__in=list(decrements)).exclude(updated_at=now).first()
+                if short is None:
+                    # Timestamps can't tell the rows apart; report the first
+                    # requested decrement with its current balance.
+                    line = next(line for key, line in checked.items() if stock_rows[key].pk in decrements)
+                    short = StockItem.objects.get(pk=stock_rows[line.key].pk)
+                else:
+                    line = next(line for key, line in checked.items() if stock_rows[key].pk == short.pk)
+                raise InsufficientStockError(line, short.available_quantity(), short.quantity)
+
+        if changed:
+            StockItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+
+    def _write_bins(self, bin_rows):
+        now = timezone.now()
+        net = defaultdict(Decimal)
+        for line in self.lines:
+            if line.bin_key in bin_rows:
+                net[line.bin_key] += line.delta
+
+        changed = []
+        for key, delta in net.items():
+            if delta == ZERO:
+                continue
+            row = bin_rows[key]
+            row.quantity = F('quantity') + delta
+            row.updated_at = now
+            changed.append(row)
+        if changed:
+            BinStockItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+
+    def _resolve_balances(self, stock_rows, net):
+        """Re-read final balances so each ledger row records the exact value."""
+        pks = [row.pk for row in stock_rows.values()]
+        final = dict(StockItem.objects.filter(pk__in=pks).values_list('pk', 'quantity'))
+
+        running = {
+            key: final[row.pk] - net[key]
+            for key, row in stock_rows.items()
+            if row.pk in final
+        }
+
+        for line in self.lines:
+            if line.key not in running:
+                continue
+            running[line.key] += line.delta
+            line.balance_after = running[line.key]
+
+
+def complete_documents(documents, *, user=None) -> dict:
+    """Validate documents of one model and post their stock in one pass.
+
+    Each document checks itself and stages its lines into a shared
+    StockPosting. The ready documents are then claimed (ready -> done) with
+    one conditional UPDATE and the posting is applied set-based in the same
+    transaction, so validating a batch costs a constant number of queries.
+    Documents short of stock are left in 'ready' without affecting the rest.
+
+    Returns {document pk: (success, message)}; completed documents get their
+    posted lines attached as `posted_lines`.
+    """
+    documents = list(documents)
+    results = {}
+    if not documents:
+        return results
+
+    model = type(documents[0])
+    prefetch_related_objects(documents, *model.posting_prefetch)
+
+    posting = StockPosting(user=user)
+    staged = {}
+    for document in documents:
+        error = document.stage_posting(posting)
+        if error:
+            posting.discard(document.pk)
+            results[document.pk] = (False, error)
+        else:
+            staged[document.pk] = document
+
+    while staged:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                model.objects.filter(pk__in=list(staged), status='ready').update(
+                    status='done',
+                    completed_at=now,
+                    updated_at=now,
+                )
+                claimed = set(
+                    model.objects.filter(pk__in=list(staged), status='done', completed_at=now)
+                    .values_list('pk', flat=True)
+                )
+                for pk in set(staged) - claimed:
+                    posting.discard(pk)
+                    results[pk] = (False, f"{staged.pop(pk).validation_label} must be in 'ready' status")
+
+                posting.post(partial=True)
+                if posting.rejected:
+                    model.objects.filter(pk__in=list(posting.rejected)).update(status='ready', completed_at=None)
+                # Queued with the status change, so the rollup can't miss it.
+                schedule_movement_refresh(*(
+                    document.movement_slice() for pk, document in staged.items() if pk not in posting.rejected
+                ))
+        except InsufficientStockError as exc:
+            # Lost a race with a concurrent posting after the in-memory check;
+            # everything was rolled back, so drop that document and retry.
+            posting.discard(exc.line.group)
+            document = staged.pop(exc.line.group)
+            results[document.pk] = (False, document.insufficient_stock_message(exc))
+            continue
+        finally:
+            for pk, exc in posting.rejected.items():
+                results[pk] = (False, staged.pop(pk).insufficient_stock_message(exc))
+            posting.rejected = {}
+        break
+
+    # Claimed documents changed status even if they posted no lines.
+    bump_stock_version({pk for document in staged.values() for pk in document.stock_warehouse_ids()})
+    for pk, document in staged.items():
+        document.status = 'done'
+        document.completed_at = now
+        document.updated_at = now
+        document.posted_lines = [line for line in posting.lines if line.group == pk]
+        results[pk] = (True, document.validation_success_message)
+    return results
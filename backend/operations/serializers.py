@@ -458,49 +458,29 @@ class CycleCountTaskCreateSerializer(serializers.ModelSerializer):
     def _get_abc_product_ids_for_warehouse(self, warehouse):
         """Select a focused set of high-value products for ABC cycle counts.
 
-        This mirrors the ABC logic in the dashboard at a high level but keeps
-        the implementation local to avoid tight coupling between apps.
+        Ranks this warehouse's stock by value with the same vectorized
+        engine the dashboard uses (products.classification).
         """
-        from decimal import Decimal
-        from django.db.models import Sum, Avg
-        from products.models import Product, StockItem
-        from operations.models import ReceiptItem
+        from django.db.models import Sum
+        from products import classification
+        from products.costing import average_costs
+        from products.models import StockItem
 
         # Aggregate stock quantities for this warehouse only.
-        stock_by_product = (
-            StockItem.objects.filter(warehouse=warehouse)
-            .values('product')
+        stock_rows = list(
+            StockItem.objects.filter(warehouse=warehouse, product__is_active=True, quantity__gt=0)
+            .values_list('product')
             .annotate(total_quantity=Sum('quantity'))
         )
-        stock_dict = {row['product']: row['total_quantity'] or 0 for row in stock_by_product}
-
-        if not stock_dict:
+        if not stock_rows:
             return []
 
-        products = Product.objects.filter(id__in=stock_dict.keys(), is_active=True)
-
-        product_values = []
-        for product in products:
-            total_stock = stock_dict.get(product.id, 0) or 0
-            if total_stock == 0:
-                continue
-
-            avg_price = (
-                ReceiptItem.objects.filter(product=product)
-                .aggregate(avg=Avg('unit_price'))['avg']
-                or Decimal('0.00')
-            )
-            total_value = Decimal(total_stock) * Decimal(avg_price)
-            product_values.append((product.id, total_value))
-
-        if not product_values:
-            return []
+        axis = classification.product_axis(row[0] for row in stock_rows)
+        values = classification.align(axis, stock_rows) * classification.align(axis, average_costs().items())
 
         # Sort by inventory value descending and take top 20% as "A" class.
-        product_values.sort(key=lambda x: x[1], reverse=True)
-        top_count = max(1, int(len(product_values) * 0.2))
-        top_ids = [pid for pid, _ in product_values[:top_count]]
-        return top_ids
+        top_count = max(1, int(len(axis) * 0.2))
+        return axis[classification.value_order(values)[:top_count]].tolist()
 
     def create(self, validated_data):
         from products.models import StockItem
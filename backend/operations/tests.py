@@ -1,9 +1,34 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, OperationalError, connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 
 from accounts.models import User
-from products.models import Warehouse, UnitOfMeasure, Product, StockItem
-from operations.models import Receipt, Approval
+from dashboard.cache import cache_stats
+from notifications.models import Notification
+from products import classification
+from products.costing import average_costs
+from products.stock_summary import refresh_stock_summaries
+from products.models import Warehouse, UnitOfMeasure, Product, ProductCost, ProductStockSummary, StockItem
+from operations.models import (
+    Receipt, ReceiptItem, DeliveryOrder, DeliveryItem, StockAdjustment, AdjustmentItem, StockLedger, Approval,
+    AuditLog, CycleCountItem, CycleCountTask, DocumentSequence, DailyMovementFact, MovementFactRefresh,
+    StockLedgerArchive, StockLedgerCheckpoint,
+)
+from operations.ledger_archive import archive_stock_ledger, balance_at
+from operations.movement_facts import flush_movement_refreshes, refresh_movement_facts
+from operations.posting import StockPosting, _lock_rows
 
 
 class WarehouseScopingAndRBACTests(TestCase):
@@ -83,6 +108,25 @@ class WarehouseScopingAndRBACTests(TestCase):
         res_blocked = self.client.get(f'/api/operations/receipts/{self.receipt_w2.id}/')
         self.assertEqual(res_blocked.status_code, 404)
 
+    def test_audit_csv_export_streams_scoped_rows(self):
+        AuditLog.objects.create(document_type='receipt', document_id=self.receipt_w1.id, action='update',
+                                warehouse=self.w1, user=self.admin, message='Edited, "quoted"')
+        AuditLog.objects.create(document_type='receipt', document_id=self.receipt_w2.id, action='update',
+                                warehouse=self.w2, message='Hidden')
+        self.client.force_authenticate(user=self.manager)
+
+        res = self.client.get('/api/operations/audit-logs/export_csv/')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Disposition'], 'attachment; filename="audit_logs.csv"')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'created_at,warehouse_id,warehouse,document_type,document_id,action,user_email,message')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(
+            f',{self.w1.id},Main,receipt,{self.receipt_w1.id},update,admin@example.com,"Edited, ""quoted"""'
+        ))
+
     def test_approve_requires_ops_approve_capability(self):
         # warehouse_staff should be forbidden
         self.client.force_authenticate(user=self.staff)
@@ -140,3 +184,694 @@ class WarehouseScopingAndRBACTests(TestCase):
             self.assertEqual(payload2.get('count', 0), 0)
         else:
             self.assertEqual(len(payload2), 0)
+
+
+class StockPostingTests(TestCase):
+    def setUp(self):
+        self.uom, _ = UnitOfMeasure.objects.get_or_create(name='Pieces', code='PCS')
+        self.warehouse = Warehouse.objects.create(name='Main', code='MAIN')
+        self.user = User.objects.create_user(
+            email='poster@example.com',
+            username='Poster',
+            password='StrongPass123!',
+            role='admin',
+        )
+
+    def _products(self, count, prefix='P'):
+        return [
+            Product.objects.create(name=f'{prefix} {i}', sku=f'{prefix}-{i:04d}', stock_unit=self.uom)
+            for i in range(count)
+        ]
+
+    def _receipt(self, products, quantity='5.00'):
+        receipt = Receipt.objects.create(
+            warehouse=self.warehouse,
+            supplier='Supplier',
+            created_by=self.user,
+            status='ready',
+        )
+        ReceiptItem.objects.bulk_create([
+            ReceiptItem(receipt=receipt, product=product, quantity_received=Decimal(quantity))
+            for product in products
+        ])
+        return receipt
+
+    def _validate_queries(self, receipt):
+        with CaptureQueriesContext(connection) as ctx:
+            success, message = receipt.validate_and_complete(user=self.user)
+        self.assertTrue(success, message)
+        return len(ctx.captured_queries)
+
+    def test_receipt_query_count_is_independent_of_line_count(self):
+        small = self._receipt(self._products(3, prefix='S'))
+        large = self._receipt(self._products(60, prefix='L'))
+
+        self.assertEqual(self._validate_queries(small), self._validate_queries(large))
+        self.assertEqual(StockItem.objects.filter(warehouse=self.warehouse).count(), 63)
+        self.assertEqual(StockLedger.objects.filter(document_number=large.document_number).count(), 60)
+
+    def test_ledger_balances_follow_each_line(self):
+        product = self._products(1)[0]
+        StockItem.objects.create(product=product, warehouse=self.warehouse, quantity='10.00')
+
+        delivery = DeliveryOrder.objects.create(
+            warehouse=self.warehouse,
+            customer='Customer',
+            created_by=self.user,
+            status='ready',
+        )
+        DeliveryItem.objects.create(delivery=delivery, product=product, quantity='3.00')
+        DeliveryItem.objects.create(delivery=delivery, product=product, quantity='4.00')
+
+        success, message = delivery.validate_and_complete(user=self.user)
+        self.assertTrue(success, message)
+
+        balances = list(
+            StockLedger.objects.filter(document_number=delivery.document_number)
+            .order_by('id')
+            .values_list('quantity', 'balance_after')
+        )
+        self.assertEqual(balances, [(Decimal('-3.00'), Decimal('7.00')), (Decimal('-4.00'), Decimal('3.00'))])
+        self.assertEqual(StockItem.objects.get(product=product, warehouse=self.warehouse).quantity, Decimal('3.00'))
+
+    def test_ledger_api_pages_by_keyset(self):
+        product = self._products(1)[0]
+        StockLedger.objects.bulk_create([
+            StockLedger(
+                product=product, warehouse=self.warehouse, transaction_type='receipt',
+                document_number=f'WH/IN/{n:04d}', quantity='1.00', balance_after=n + 1, created_by=self.user,
+            )
+            for n in range(7)
+        ])
+        # Ties on created_at are broken by id, so no row is skipped or repeated.
+        StockLedger.objects.update(created_at=timezone.now())
+        newest_first = list(StockLedger.objects.order_by('-id').values_list('id', flat=True))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        seen, url, pages = [], '/api/operations/ledger/?page_size=3', []
+        while url:
+            res = client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn('count', res.data)
+            pages.append(res.data)
+            seen += [row['id'] for row in res.data['results']]
+            url = res.data['next']
+        self.assertEqual(seen, newest_first)
+        self.assertEqual(len(pages), 3)
+
+        back = client.get(pages[2]['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], newest_first[3:6])
+        self.assertEqual(client.get('/api/operations/ledger/?cursor=bogus').status_code, 404)
+
+        res = client.get('/api/operations/ledger/?document_number=WH/IN/0004')
+        self.assertEqual([row['balance_after'] for row in res.data['results']], ['5.00'])
+
+    def test_old_ledger_months_move_to_archive_and_stay_readable(self):
+        product = self._products(1)[0]
+        now = timezone.now()
+        StockLedger.objects.bulk_create([
+            StockLedger(
+                product=product, warehouse=self.warehouse, transaction_type='receipt',
+                document_number=f'WH/IN/{n:04d}', quantity='1.00', balance_after=n + 1, created_by=self.user,
+            )
+            for n in range(6)
+        ])
+        ids = list(StockLedger.objects.order_by('id').values_list('id', flat=True))
+        for days, pk in zip([400, 390, 380, 10, 5, 1], ids):
+            StockLedger.objects.filter(pk=pk).update(created_at=now - timedelta(days=days))
+
+        stats = archive_stock_ledger(batch_size=2, hot_days=180, now=now)
+        self.assertEqual(stats['moved'], 3)
+        self.assertEqual(list(StockLedger.objects.order_by('id').values_list('id', flat=True)), ids[3:])
+        self.assertEqual(StockLedgerArchive.objects.count(), 3)
+        checkpoint = StockLedgerCheckpoint.objects.get(product=product, warehouse=self.warehouse)
+        self.assertEqual((checkpoint.balance, checkpoint.archived_rows), (Decimal('3.00'), 3))
+        self.assertEqual(archive_stock_ledger(hot_days=180, now=now)['moved'], 0)
+
+        self.assertEqual(balance_at(product.id, self.warehouse.id), Decimal('6.00'))
+        self.assertEqual(balance_at(product.id, self.warehouse.id, now - timedelta(days=100)), Decimal('3.00'))
+        self.assertEqual(balance_at(product.id, self.warehouse.id, now - timedelta(days=395)), Decimal('1.00'))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        seen, url = [], '/api/operations/ledger/?page_size=2'
+        while url:
+            res = client.get(url)
+            seen += [row['id'] for row in res.data['results']]
+            url = res.data['next']
+        self.assertEqual(seen, ids[::-1])
+        res = client.get('/api/operations/ledger/?document_number=WH/IN/0001')
+        self.assertEqual([row['id'] for row in res.data['results']], [ids[1]])
+        self.assertEqual(client.get(f'/api/operations/ledger/{ids[0]}/').data['balance_after'], '1.00')
+
+    def test_lock_rows_matches_exact_keys_only(self):
+        first, second = self._products(2)
+        other = Warehouse.objects.create(name='Other', code='OTH')
+        for product, warehouse in [(first, self.warehouse), (second, other), (first, other)]:
+            StockItem.objects.create(product=product, warehouse=warehouse, quantity='1.00')
+
+        keys = {(first.id, self.warehouse.id), (second.id, other.id)}
+        with self.assertNumQueries(1):
+            rows = _lock_rows(StockItem, keys, ('product', 'warehouse'))
+        self.assertEqual(set(rows), keys)
+
+    def test_lock_rows_creates_missing_rows_before_one_ordered_lock_pass(self):
+        first, second = self._products(2)
+        StockItem.objects.create(product=second, warehouse=self.warehouse, quantity='1.00')
+
+        keys = {(first.id, self.warehouse.id), (second.id, self.warehouse.id)}
+        # Existence check, insert of the missing row, then a single locking read of all keys.
+        with CaptureQueriesContext(connection) as ctx:
+            rows = _lock_rows(StockItem, keys, ('product', 'warehouse'), create=keys)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertTrue(ctx.captured_queries[1]['sql'].startswith('INSERT'))
+        self.assertEqual(list(rows), sorted(keys))
+        self.assertEqual(rows[(first.id, self.warehouse.id)].quantity, Decimal('0.00'))
+
+    def test_set_adjustment_keeps_concurrent_increment(self):
+        product = self._products(1)[0]
+        StockItem.objects.create(product=product, warehouse=self.warehouse, quantity='10.00')
+        adjustment = StockAdjustment.objects.create(
+            warehouse=self.warehouse, reason='Count', adjustment_type='set', created_by=self.user, status='ready',
+        )
+        AdjustmentItem.objects.create(adjustment=adjustment, product=product, adjustment_quantity='4.00')
+
+        apply_in_memory = StockPosting._apply_in_memory
+
+        def receipt_lands_after_snapshot(posting, *args, **kwargs):
+            result = apply_in_memory(posting, *args, **kwargs)
+            StockItem.objects.filter(product=product).update(quantity=F('quantity') + 5)
+            return result
+
+        with mock.patch.object(StockPosting, '_apply_in_memory', receipt_lands_after_snapshot):
+            success, message = adjustment.validate_and_complete(user=self.user)
+        self.assertTrue(success, message)
+        self.assertEqual(StockItem.objects.get(product=product).quantity, Decimal('9.00'))
+
+    def test_insufficient_stock_posts_nothing(self):
+        first, second = self._products(2)
+        StockItem.objects.create(product=first, warehouse=self.warehouse, quantity='10.00')
+
+        delivery = DeliveryOrder.objects.create(
+            warehouse=self.warehouse,
+            customer='Customer',
+            created_by=self.user,
+            status='ready',
+        )
+        DeliveryItem.objects.create(delivery=delivery, product=first, quantity='2.00')
+        DeliveryItem.objects.create(delivery=delivery, product=second, quantity='1.00')
+
+        success, message = delivery.validate_and_complete(user=self.user)
+        self.assertFalse(success)
+        self.assertIn('No stock available', message)
+        self.assertEqual(StockItem.objects.get(product=first, warehouse=self.warehouse).quantity, Decimal('10.00'))
+        self.assertFalse(StockLedger.objects.filter(document_number=delivery.document_number).exists())
+
+    def test_posting_maintains_stock_summary(self):
+        product = Product.objects.create(name='Gadget', sku='G-1', stock_unit=self.uom, reorder_level='5.00')
+        self.assertTrue(ProductStockSummary.objects.get(product=product).is_out_of_stock)
+
+        receipt = self._receipt([product], quantity='8.00')
+        self.assertTrue(receipt.validate_and_complete(user=self.user)[0])
+        summary = ProductStockSummary.objects.get(product=product)
+        self.assertEqual(summary.total_quantity, Decimal('8.00'))
+        self.assertFalse(summary.is_low_stock)
+
+        delivery = DeliveryOrder.objects.create(
+            warehouse=self.warehouse,
+            customer='Customer',
+            created_by=self.user,
+            status='ready',
+        )
+        DeliveryItem.objects.create(delivery=delivery, product=product, quantity='4.00')
+        self.assertTrue(delivery.validate_and_complete(user=self.user)[0])
+        summary.refresh_from_db()
+        self.assertEqual(summary.total_quantity, Decimal('4.00'))
+        self.assertTrue(summary.is_low_stock)
+        self.assertFalse(summary.is_out_of_stock)
+
+        # A rebuild from StockItem agrees with the incrementally maintained row
+        ProductStockSummary.objects.filter(product=product).update(total_quantity='0.00', is_low_stock=False)
+        call_command('rebuild_stock_summary', stdout=StringIO())
+        summary.refresh_from_db()
+        self.assertEqual(summary.total_quantity, Decimal('4.00'))
+        self.assertTrue(summary.is_low_stock)
+
+    def test_low_stock_includes_products_without_a_summary(self):
+        # bulk_create skips Product.save(), so no summary rows are written.
+        Product.objects.bulk_create([
+            Product(name='Summarized', sku='S-1', stock_unit=self.uom, reorder_level='5.00'),
+            Product(name='Stocked', sku='S-2', stock_unit=self.uom, reorder_level='5.00'),
+            Product(name='Imported', sku='S-3', stock_unit=self.uom, reorder_level='5.00'),
+        ])
+        products = {product.sku: product for product in Product.objects.filter(sku__startswith='S-')}
+        StockItem.objects.bulk_create([StockItem(product=products['S-2'], warehouse=self.warehouse, quantity='9.00')])
+        refresh_stock_summaries([products['S-1'].pk])
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.get('/api/products/products/low_stock/')
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual(sorted(row['sku'] for row in res.data), ['S-1', 'S-3'])
+
+    def test_receipts_maintain_weighted_average_cost(self):
+        product = self._products(1)[0]
+        other = Warehouse.objects.create(name='Overflow', code='OVF')
+        for warehouse, quantity, price in ((self.warehouse, '10.00', '2.00'), (other, '30.00', '4.00')):
+            receipt = Receipt.objects.create(warehouse=warehouse, supplier='Supplier', created_by=self.user, status='ready')
+            ReceiptItem.objects.create(
+                receipt=receipt,
+                product=product,
+                quantity_received=Decimal(quantity),
+                unit_price=Decimal(price),
+            )
+            self.assertTrue(receipt.validate_and_complete(user=self.user)[0])
+
+        self.assertEqual(average_costs()[product.id], Decimal('3.5000'))
+        self.assertEqual(average_costs(warehouse_ids=[self.warehouse.id])[product.id], Decimal('2.0000'))
+
+        ProductCost.objects.all().delete()
+        call_command('rebuild_cost_index', stdout=StringIO())
+        self.assertEqual(average_costs()[product.id], Decimal('3.5000'))
+
+    def test_validate_payload_and_audit_use_posted_balances(self):
+        product = self._products(1)[0]
+        StockItem.objects.create(product=product, warehouse=self.warehouse, quantity='10.00')
+        delivery = DeliveryOrder.objects.create(
+            warehouse=self.warehouse,
+            customer='Customer',
+            created_by=self.user,
+            status='ready',
+        )
+        DeliveryItem.objects.create(delivery=delivery, product=product, quantity='3.00')
+        DeliveryItem.objects.create(delivery=delivery, product=product, quantity='4.00')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('operations.views.emit_event') as emit:
+            res = client.post(f'/api/operations/deliveries/{delivery.id}/validate/')
+
+        self.assertEqual(res.status_code, 200, res.content)
+        event_type, payload = emit.call_args_list[0].args
+        self.assertEqual(event_type, 'delivery_completed')
+        self.assertEqual(
+            [(item['quantity_delta'], item['balance_after']) for item in payload['items']],
+            [('-3.00', '7.00'), ('-4.00', '3.00')],
+        )
+        audit = AuditLog.objects.get(document_type='delivery', document_id=delivery.id)
+        self.assertEqual([line['balance_after'] for line in audit.after_data['stock']], ['7.00', '3.00'])
+
+    def test_outbox_failure_rolls_back_validation(self):
+        product = self._products(1)[0]
+        StockItem.objects.create(product=product, warehouse=self.warehouse, quantity='10.00')
+        delivery = DeliveryOrder.objects.create(
+            warehouse=self.warehouse,
+            customer='Customer',
+            created_by=self.user,
+            status='ready',
+        )
+        DeliveryItem.objects.create(delivery=delivery, product=product, quantity='3.00')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('operations.views.emit_event', side_effect=DatabaseError('outbox unavailable')):
+            with self.assertRaises(DatabaseError):
+                client.post(f'/api/operations/deliveries/{delivery.id}/validate/')
+
+        # No event, no stock change: the whole validation rolled back.
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'ready')
+        self.assertEqual(StockItem.objects.get(product=product, warehouse=self.warehouse).quantity, Decimal('10.00'))
+        self.assertFalse(StockLedger.objects.filter(document_number=delivery.document_number).exists())
+
+    def test_cycle_count_completion_is_all_or_nothing(self):
+        product = self._products(1)[0]
+        StockItem.objects.create(product=product, warehouse=self.warehouse, quantity='10.00')
+        task = CycleCountTask.objects.create(warehouse=self.warehouse, created_by=self.user, status='ready')
+        CycleCountItem.objects.create(
+            task=task, product=product, expected_quantity=Decimal('10.00'), counted_quantity=Decimal('8.00'),
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('operations.views.log_audit_event', side_effect=DatabaseError('audit unavailable')):
+            with self.assertRaises(DatabaseError):
+                client.post(f'/api/operations/cycle-counts/{task.id}/complete/')
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'ready')
+        self.assertFalse(StockAdjustment.objects.exists())
+        self.assertEqual(StockItem.objects.get(product=product, warehouse=self.warehouse).quantity, Decimal('10.00'))
+
+    def test_validate_batch_reports_each_delivery(self):
+        product = self._products(1)[0]
+        StockItem.objects.create(product=product, warehouse=self.warehouse, quantity='5.00')
+
+        deliveries = []
+        for quantity in ('2.00', '4.00', '3.00'):
+            delivery = DeliveryOrder.objects.create(
+                warehouse=self.warehouse,
+                customer='Customer',
+                created_by=self.user,
+                status='ready',
+            )
+            DeliveryItem.objects.create(delivery=delivery, product=product, quantity=quantity)
+            deliveries.append(delivery)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ids = [delivery.id for delivery in deliveries] + [999999]
+        with mock.patch('operations.views.emit_events') as emit:
+            res = client.post('/api/operations/deliveries/validate_batch/', {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual(res.data['succeeded'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual(
+            [result['success'] for result in res.data['results']],
+            [True, False, True, False],
+        )
+        self.assertEqual(res.data['results'][3]['message'], 'Not found.')
+        self.assertEqual(StockItem.objects.get(product=product, warehouse=self.warehouse).quantity, Decimal('0.00'))
+        deliveries[1].refresh_from_db()
+        self.assertEqual(deliveries[1].status, 'ready')
+
+        # One single-document payload per completed delivery, as with /validate/.
+        self.assertEqual([call.args[0] for call in emit.call_args_list], ['delivery_completed', 'stock_change'])
+        completed, stock_changes = (call.args[1] for call in emit.call_args_list)
+        self.assertEqual(
+            [payload['document_number'] for payload in completed],
+            [deliveries[0].document_number, deliveries[2].document_number],
+        )
+        for payload in completed:
+            self.assertNotIn('batch', payload)
+            self.assertEqual(set(payload), {'document_number', 'warehouse_id', 'warehouse_name', 'completed_at', 'items'})
+        self.assertEqual([item['quantity_delta'] for item in completed[1]['items']], ['-3.00'])
+        self.assertEqual([payload['source'] for payload in stock_changes], ['delivery', 'delivery'])
+        self.assertEqual(AuditLog.objects.filter(document_type='delivery', action='validation').count(), 2)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.uom, _ = UnitOfMeasure.objects.get_or_create(name='Pieces', code='PCS')
+        self.warehouse = Warehouse.objects.create(name='Main', code='MAIN')
+        self.product = Product.objects.create(name='Widget', sku='W-001', stock_unit=self.uom, reorder_level=5)
+        self.admin = User.objects.create_user(
+            email='admin@example.com',
+            username='Admin',
+            password='StrongPass123!',
+            role='admin',
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_kpis_are_cached_until_stock_is_posted(self):
+        first = self.client.get('/api/dashboard/kpis/')
+        second = self.client.get('/api/dashboard/kpis/')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first.data['out_of_stock_items'], 1)
+        self.assertEqual(cache_stats()['kpis'], {'hits': 1, 'misses': 1})
+
+        receipt = Receipt.objects.create(
+            warehouse=self.warehouse, supplier='Supplier', created_by=self.admin, status='ready'
+        )
+        ReceiptItem.objects.create(receipt=receipt, product=self.product, quantity_received=Decimal('20.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            success, message = receipt.validate_and_complete(user=self.admin)
+        self.assertTrue(success, message)
+
+        third = self.client.get('/api/dashboard/kpis/')
+        self.assertEqual(third.data['out_of_stock_items'], 0)
+        self.assertEqual(cache_stats()['kpis'], {'hits': 1, 'misses': 2})
+
+    def test_cache_key_includes_query_params_and_scope(self):
+        self.client.get('/api/dashboard/anomalies/?limit=5')
+        self.client.get('/api/dashboard/anomalies/?limit=6')
+
+        staff = User.objects.create_user(
+            email='staff@example.com',
+            username='Staff',
+            password='StrongPass123!',
+            role='warehouse_staff',
+        )
+        staff.allowed_warehouses.set([self.warehouse])
+        self.client.force_authenticate(user=staff)
+        self.client.get('/api/dashboard/anomalies/?limit=5')
+
+        self.assertEqual(cache_stats()['anomalies'], {'hits': 0, 'misses': 3})
+
+    def test_anomaly_feed_is_cached_per_user_and_refreshed_on_new_anomalies(self):
+        other = User.objects.create_user(
+            email='admin2@example.com',
+            username='Admin 2',
+            password='StrongPass123!',
+            role='admin',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.admin, notification_type='anomaly', title='Mine', message='...')
+            Notification.objects.create(user=other, notification_type='anomaly', title='Theirs', message='...')
+
+        def titles(user):
+            self.client.force_authenticate(user=user)
+            return {row['title'] for row in self.client.get('/api/dashboard/anomalies/').data if row['kind'] == 'notification'}
+
+        self.assertEqual(titles(self.admin), {'Mine'})
+        self.assertEqual(titles(other), {'Theirs'})
+        self.assertEqual(titles(self.admin), {'Mine'})
+        self.assertEqual(cache_stats()['anomalies'], {'hits': 1, 'misses': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(notification_type='anomaly', title='Everyone', message='...')
+        self.assertEqual(titles(self.admin), {'Mine', 'Everyone'})
+
+
+class DailyMovementFactTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.uom, _ = UnitOfMeasure.objects.get_or_create(name='Pieces', code='PCS')
+        self.warehouse = Warehouse.objects.create(name='Main', code='MAIN')
+        self.product = Product.objects.create(
+            name='Widget', sku='W-001', stock_unit=self.uom, unit_conversion_factor=Decimal('10.000000'),
+        )
+        self.admin = User.objects.create_user(
+            email='admin@example.com',
+            username='Admin',
+            password='StrongPass123!',
+            role='admin',
+        )
+
+    def _facts(self):
+        return sorted(
+            DailyMovementFact.objects.values_list(
+                'movement_type', 'status', 'completed_date', 'line_count', 'quantity',
+                'purchase_priced_value', 'unpriced_quantity',
+            )
+        )
+
+    def test_facts_follow_lines_and_status_changes(self):
+        receipt = Receipt.objects.create(
+            warehouse=self.warehouse, supplier='Supplier', created_by=self.admin, status='ready'
+        )
+        ReceiptItem.objects.create(
+            receipt=receipt, product=self.product, quantity_received=Decimal('2.00'),
+            unit_of_measure='purchase', unit_price=Decimal('3.00'),
+        )
+        ReceiptItem.objects.create(receipt=receipt, product=self.product, quantity_received=Decimal('5.00'))
+        # Saves only queue the slice; the flush re-rolls it once for all three.
+        self.assertEqual(self._facts(), [])
+        with mock.patch(
+            'operations.movement_facts.refresh_movement_facts', wraps=refresh_movement_facts,
+        ) as refresh:
+            call_command('flush_movement_facts', '--once', stdout=StringIO())
+        self.assertEqual(refresh.call_count, 1)
+        self.assertFalse(MovementFactRefresh.objects.exists())
+        self.assertEqual(self._facts(), [
+            ('receipt', 'ready', None, 2, Decimal('7.00'), Decimal('6.0000'), Decimal('5.00')),
+        ])
+
+        success, message = receipt.validate_and_complete(user=self.admin)
+        self.assertTrue(success, message)
+        self.assertEqual(flush_movement_refreshes(), {'refreshed': 1, 'deferred': 0})
+        today = timezone.localdate()
+        incremental = self._facts()
+        self.assertEqual(incremental, [
+            ('receipt', 'done', today, 2, Decimal('7.00'), Decimal('6.0000'), Decimal('5.00')),
+        ])
+
+        call_command('rebuild_movement_facts', stdout=StringIO())
+        self.assertEqual(self._facts(), incremental)
+
+    def test_failed_refresh_stays_queued_until_flushed(self):
+        receipt = Receipt.objects.create(
+            warehouse=self.warehouse, supplier='Supplier', created_by=self.admin, status='ready'
+        )
+        ReceiptItem.objects.create(receipt=receipt, product=self.product, quantity_received=Decimal('5.00'))
+        locked = OperationalError('database table is locked')
+        with mock.patch('operations.movement_facts.refresh_movement_facts', side_effect=locked), \
+                mock.patch('operations.movement_facts.REFRESH_BACKOFF', 0):
+            self.assertEqual(flush_movement_refreshes(), {'refreshed': 0, 'deferred': 1})
+        self.assertEqual(self._facts(), [])
+        self.assertTrue(MovementFactRefresh.objects.exists())
+
+        # The dashboard flushes what is still queued before reading the rollup.
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        res = client.get('/api/dashboard/movement-value-trend/?include_status=true')
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(MovementFactRefresh.objects.exists())
+        self.assertEqual(self._facts(), [
+            ('receipt', 'ready', None, 1, Decimal('5.00'), Decimal('0.0000'), Decimal('5.00')),
+        ])
+
+    def test_trend_values_purchase_units_at_current_factor(self):
+        receipt = Receipt.objects.create(
+            warehouse=self.warehouse, supplier='Supplier', created_by=self.admin, status='draft'
+        )
+        ReceiptItem.objects.create(
+            receipt=receipt, product=self.product, quantity_received=Decimal('2.00'),
+            unit_of_measure='purchase', unit_price=Decimal('3.00'),
+        )
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        res = client.get('/api/dashboard/movement-value-trend/?include_status=true')
+        self.assertEqual(res.status_code, 200)
+        # 2 purchase units x factor 10 x 3.00 per stock unit
+        self.assertEqual(res.data['trend'][0]['receipts_value'], 60.0)
+        self.assertEqual(res.data['trend'][0]['receipts_status']['draft'], 60.0)
+
+
+class ClassificationEngineTests(SimpleTestCase):
+    def test_abc_bands_follow_cumulative_value_share(self):
+        values = classification.align(
+            classification.product_axis([4, 1, 3, 2]),
+            [(1, 700), (2, 150), (3, 100), (4, 50)],
+        )
+        classes, cumulative = classification.abc_classify(values)
+        self.assertEqual(classes.tolist(), ['A', 'B', 'B', 'C'])
+        self.assertEqual(cumulative.round(6).tolist(), [70.0, 85.0, 95.0, 100.0])
+
+    def test_xyz_counts_months_without_demand(self):
+        axis = classification.product_axis([1, 2, 3])
+        demand = classification.demand_matrix(
+            axis,
+            first_period=100,
+            periods=4,
+            rows=[(1, 100, 10), (1, 101, 10), (1, 102, 10), (1, 103, 11), (2, 100, 40), (99, 100, 5)],
+        )
+        classes, cv = classification.xyz_classify(demand)
+        # Steady seller is X, a single spike is Z, no demand at all is Z.
+        self.assertEqual(classes.tolist(), ['X', 'Z', 'Z'])
+        self.assertTrue(cv[2] == float('inf'))
+
+
+class DocumentSequenceTests(TestCase):
+    def setUp(self):
+        self.warehouse = Warehouse.objects.create(name='Main', code='MAIN')
+        self.user = User.objects.create_user(
+            email='numbers@example.com',
+            username='Numbers',
+            password='StrongPass123!',
+            role='admin',
+        )
+
+    def test_block_reservation_is_consecutive_and_not_reissued(self):
+        block = Receipt.reserve_document_numbers(100)
+        self.assertEqual(len(set(block)), 100)
+        self.assertEqual(
+            [int(number.split('-')[1]) for number in block],
+            list(range(int(block[0].split('-')[1]), int(block[0].split('-')[1]) + 100)),
+        )
+
+        receipt = Receipt.objects.create(warehouse=self.warehouse, supplier='Supplier', created_by=self.user)
+        self.assertNotIn(receipt.document_number, block)
+        self.assertEqual(int(receipt.document_number.split('-')[1]), int(block[-1].split('-')[1]) + 1)
+
+    def test_rolled_back_insert_leaves_no_gap(self):
+        first = Receipt.objects.create(warehouse=self.warehouse, supplier='Supplier', created_by=self.user)
+        with self.assertRaises(IntegrityError):
+            Receipt.objects.create(warehouse=self.warehouse, supplier='Supplier', created_by=None)
+        second = Receipt.objects.create(warehouse=self.warehouse, supplier='Supplier', created_by=self.user)
+
+        self.assertEqual(int(second.document_number.split('-')[1]), int(first.document_number.split('-')[1]) + 1)
+        self.assertEqual(DocumentSequence.objects.get(prefix='REC').last_value, int(second.document_number.split('-')[1]))
+
+
+class ConcurrentValidationStressTests(TransactionTestCase):
+    """Hammer one SKU from several threads; stock must never be oversold."""
+
+    workers = 8
+    initial_stock = Decimal('5.00')
+
+    def setUp(self):
+        uom, _ = UnitOfMeasure.objects.get_or_create(name='Pieces', code='PCS')
+        self.warehouse = Warehouse.objects.create(name='Main', code='MAIN')
+        self.product = Product.objects.create(name='Hot SKU', sku='HOT-1', stock_unit=uom)
+        StockItem.objects.create(product=self.product, warehouse=self.warehouse, quantity=self.initial_stock)
+        self.user = User.objects.create_user(
+            email='picker@example.com',
+            username='Picker',
+            password='StrongPass123!',
+            role='admin',
+        )
+        self.deliveries = []
+        for _ in range(self.workers):
+            delivery = DeliveryOrder.objects.create(
+                warehouse=self.warehouse,
+                customer='Customer',
+                created_by=self.user,
+                status='ready',
+            )
+            DeliveryItem.objects.create(delivery=delivery, product=self.product, quantity='1.00')
+            self.deliveries.append(delivery.id)
+
+    def _validate(self, delivery_id, barrier, results):
+        try:
+            barrier.wait()
+            for _ in range(50):
+                try:
+                    delivery = DeliveryOrder.objects.get(pk=delivery_id)
+                    results.append(delivery.validate_and_complete(user=self.user)[0])
+                    return
+                except OperationalError:
+                    # SQLite reports lock contention instead of blocking; retry.
+                    time.sleep(0.01)
+            results.append(None)
+        finally:
+            connection.close()
+
+    def test_parallel_deliveries_never_oversell(self):
+        barrier = threading.Barrier(self.workers)
+        results = []
+        threads = [
+            threading.Thread(target=self._validate, args=(delivery_id, barrier, results))
+            for delivery_id in self.deliveries
+        ]
+        with self.assertNoLogs('operations.movement_facts', level='WARNING'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        successes = results.count(True)
+        stock = StockItem.objects.get(product=self.product, warehouse=self.warehouse)
+        self.assertEqual(len(results), self.workers)
+        self.assertNotIn(None, results)
+        self.assertEqual(successes, int(self.initial_stock))
+        self.assertEqual(stock.quantity, Decimal('0.00'))
+        self.assertEqual(DeliveryOrder.objects.filter(status='done').count(), successes)
+        self.assertEqual(StockLedger.objects.filter(transaction_type='delivery').count(), successes)
+        self.assertEqual(
+            sorted(StockLedger.objects.values_list('balance_after', flat=True)),
+            [Decimal(n) for n in range(successes)],
+        )
+        # Validations only queued their slice; once flushed the rollup
+        # matches the documents.
+        flush_movement_refreshes()
+        self.assertFalse(MovementFactRefresh.objects.exists())
+        self.assertEqual(
+            sorted(DailyMovementFact.objects.values_list('status', 'line_count')),
+            [('done', successes), ('ready', self.workers - successes)],
+        )
@@ -1,5 +1,6 @@
 import logging
 import mimetypes
+from datetime import datetime, time, timedelta
 from uuid import uuid4
 
 from rest_framework import viewsets, status, filters
@@ -8,15 +9,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
-from django.http import HttpResponse
-import csv
 
 from accounts.permissions import IsAdmin, capability_required
 from accounts.scoping import WarehouseScopedQuerySetMixin, scope_queryset
 from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.timezone import make_aware
 from django.core.files.storage import default_storage
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from .models import (
     Receipt, ReceiptItem,
     DeliveryOrder, DeliveryItem,
@@ -43,20 +47,41 @@ from .serializers import (
     AuditLogSerializer,
 )
 from products.models import StockItem, BinStockItem, BinLocation
-from integrations.services import emit_event
-from .audit import log_audit_event
+from integrations.services import emit_event, emit_events
+from .audit import log_audit_event, log_audit_events, posted_line_summary
+from .exports import streaming_csv_response
+from .ledger_archive import ledger_querysets
+from .pagination import KeysetPagination
+from .posting import complete_documents
 
 logger = logging.getLogger(__name__)
 
 
 def _emit_integration_event(event_type: str, payload: dict):
-    """Safely emit an integration event without breaking the request flow."""
+    """Emit an integration event.
+
+    Inside a transaction the outbox row is part of it, so a failed insert
+    propagates and rolls the change back with it; outside one, emitting is
+    best-effort and failures are only logged.
+    """
     try:
         emit_event(event_type, payload)
-    except Exception:  # pragma: no cover - best-effort logging
+    except Exception:
+        if transaction.get_connection().in_atomic_block:
+            raise
         logger.exception("Failed to emit integration event %s", event_type)
 
 
+def _emit_integration_events(event_type: str, payloads: list[dict]):
+    """Batch form of _emit_integration_event(): one event per payload, one insert."""
+    try:
+        emit_events(event_type, payloads)
+    except Exception:
+        if transaction.get_connection().in_atomic_block:
+            raise
+        logger.exception("Failed to emit integration events %s", event_type)
+
+
 class CapabilityPermissionsMixin:
     """Centralized per-action capability enforcement (backend source of truth)."""
 
@@ -70,11 +95,137 @@ class CapabilityPermissionsMixin:
         return [IsAuthenticated()]
 
 
-class ReceiptViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ModelViewSet):
+class DocumentCompletionMixin:
+    """Integration events and audit entries for a completed stock document.
+
+    Everything is built from the lines returned by the posting engine
+    (`document.posted_lines`), so nothing is re-queried after validation.
+    Viewsets set the event/audit attributes below and extend
+    `_completion_payload()` / `_completion_item()` where their documents
+    carry more than the common fields.
+    """
+
+    completion_event = ''
+    stock_change_source = ''
+    audit_document_type = ''
+    audit_message = ''
+
+    def _completion_item(self, line) -> dict:
+        return {
+            'product_id': line.product.id,
+            'product_name': line.product.name,
+            'quantity_delta': str(line.delta),
+            'balance_after': str(line.balance_after),
+        }
+
+    def _completion_payload(self, document) -> dict:
+        warehouse = self._completion_warehouse(document)
+        return {
+            'document_number': document.document_number,
+            'warehouse_id': warehouse.id,
+            'warehouse_name': warehouse.name,
+            'completed_at': document.completed_at,
+            'items': [self._completion_item(line) for line in document.posted_lines],
+        }
+
+    def _completion_warehouse(self, document):
+        return document.warehouse
+
+    def _completion_audit(self, request, document, previous_status) -> dict:
+        return {
+            'document_type': self.audit_document_type,
+            'document_id': document.id,
+            'action': 'validation',
+            'user': request.user,
+            'message': self.audit_message,
+            'before': {'status': previous_status},
+            'after': {'status': document.status, 'stock': posted_line_summary(document.posted_lines)},
+            'warehouse': self._completion_warehouse(document),
+        }
+
+    def _record_completion(self, request, document, previous_status):
+        payload = self._completion_payload(document)
+        _emit_integration_event(self.completion_event, payload)
+        _emit_integration_event('stock_change', {**payload, 'source': self.stock_change_source})
+        log_audit_event(**self._completion_audit(request, document, previous_status))
+
+
+class BatchValidationMixin(DocumentCompletionMixin):
+    """Collection-level `validate_batch` action for stock documents."""
+
+    batch_validate_limit = 1000
+
+    @action(detail=False, methods=['post'])
+    def validate_batch(self, request):
+        """Validate and complete many documents with one set-based stock posting.
+
+        Body: {"ids": [...]}. Each document succeeds or fails on its own; failed
+        documents keep their status. Each completed document gets the same
+        integration events as a single validation.
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'detail': 'ids must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.batch_validate_limit:
+            return Response(
+                {'detail': f'At most {self.batch_validate_limit} ids can be validated per request.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids))
+        except (TypeError, ValueError):
+            return Response({'detail': 'ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        documents = {document.pk: document for document in self.get_queryset().filter(pk__in=ids)}
+
+        results = []
+        completed = []
+        with transaction.atomic():
+            outcomes = complete_documents(documents.values(), user=request.user)
+            for pk in ids:
+                document = documents.get(pk)
+                if document is None:
+                    results.append({'id': pk, 'document_number': None, 'success': False, 'message': 'Not found.'})
+                    continue
+                success, message = outcomes[pk]
+                if success:
+                    completed.append(document)
+                results.append({
+                    'id': pk,
+                    'document_number': document.document_number,
+                    'success': success,
+                    'message': message,
+                })
+
+            if completed:
+                # Same per-document events as single validation, so existing
+                # subscribers see no difference; only the inserts are batched.
+                payloads = [self._completion_payload(document) for document in completed]
+                _emit_integration_events(self.completion_event, payloads)
+                _emit_integration_events(
+                    'stock_change',
+                    [{**payload, 'source': self.stock_change_source} for payload in payloads],
+                )
+                log_audit_events(self._completion_audit(request, document, 'ready') for document in completed)
+
+        return Response({
+            'succeeded': len(completed),
+            'failed': len(results) - len(completed),
+            'results': results,
+        })
+
+
+class ReceiptViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, BatchValidationMixin, viewsets.ModelViewSet):
     """Receipt CRUD operations"""
 
     queryset = Receipt.objects.select_related('warehouse', 'created_by').prefetch_related('items__product')
     permission_classes = [IsAuthenticated]
+
+    completion_event = 'receipt_completed'
+    stock_change_source = 'receipt'
+    audit_document_type = 'receipt'
+    audit_message = 'Receipt validated'
+
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'warehouse', 'created_by']
     search_fields = ['document_number', 'supplier']
@@ -89,6 +240,7 @@ class ReceiptViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, v
         'destroy': 'ops.draft',
         'approve': 'ops.approve',
         'validate': 'ops.validate',
+        'validate_batch': 'ops.validate',
     }
 
     def get_serializer_class(self):
@@ -99,6 +251,13 @@ class ReceiptViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, v
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def _completion_item(self, line):
+        return {
+            **super()._completion_item(line),
+            'bin_id': line.bin.id if line.bin else None,
+            'bin_code': line.bin.code if line.bin else None,
+        }
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a receipt so it can transition to ready/done when required."""
@@ -113,77 +272,29 @@ class ReceiptViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, v
         """Validate and complete receipt"""
         receipt = self.get_object()
         previous_status = receipt.status
-        success, message = receipt.validate_and_complete()
-        
-        if success:
-            # Create ledger entries - optimize with select_related
-            for item in receipt.items.select_related('product').all():
-                try:
-                    stock_item = StockItem.objects.get(
-                        product=item.product,
-                        warehouse=receipt.warehouse
-                    )
-                except StockItem.DoesNotExist:
-                    # Create stock item if it doesn't exist
-                    stock_item = StockItem.objects.create(
-                        product=item.product,
-                        warehouse=receipt.warehouse,
-                        quantity=0
-                    )
-                StockLedger.objects.create(
-                    product=item.product,
-                    warehouse=receipt.warehouse,
-                    bin=item.bin,
-                    transaction_type='receipt',
-                    document_number=receipt.document_number,
-                    quantity=item.stock_quantity(),
-                    balance_after=stock_item.quantity,
-                    reference=receipt.supplier,
-                    created_by=request.user,
-                )
+        # Commit the stock posting together with its outbox events and audit entry.
+        with transaction.atomic():
+            success, message = receipt.validate_and_complete(user=request.user)
+            if success:
+                self._record_completion(request, receipt, previous_status)
 
-            items_payload = [
-                {
-                    'product_id': item.product_id,
-                    'product_name': item.product.name,
-                    'quantity_delta': str(item.stock_quantity()),
-                    'bin_id': item.bin_id,
-                    'bin_code': item.bin.code if item.bin else None,
-                }
-                for item in receipt.items.all()
-            ]
-            payload = {
-                'document_number': receipt.document_number,
-                'warehouse_id': receipt.warehouse_id,
-                'warehouse_name': receipt.warehouse.name,
-                'completed_at': receipt.completed_at,
-                'items': items_payload,
-            }
-            _emit_integration_event('receipt_completed', payload)
-            _emit_integration_event('stock_change', {**payload, 'source': 'receipt'})
-            log_audit_event(
-                document_type='receipt',
-                document_id=receipt.id,
-                action='validation',
-                user=request.user,
-                message='Receipt validated',
-                before={'status': previous_status},
-                after={'status': receipt.status},
-                warehouse=receipt.warehouse,
-            )
-        
         return Response({
             'success': success,
             'message': message
         }, status=status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST)
 
 
-class DeliveryOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ModelViewSet):
+class DeliveryOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, BatchValidationMixin, viewsets.ModelViewSet):
     """Delivery Order CRUD operations"""
 
     queryset = DeliveryOrder.objects.select_related('warehouse', 'created_by').prefetch_related('items__product')
     permission_classes = [IsAuthenticated]
 
+    completion_event = 'delivery_completed'
+    stock_change_source = 'delivery'
+    audit_document_type = 'delivery'
+    audit_message = 'Delivery completed'
+
     permission_action_map = {
         'list': 'ops.read',
         'retrieve': 'ops.read',
@@ -193,6 +304,7 @@ class DeliveryOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMi
         'destroy': 'ops.draft',
         'approve': 'ops.approve',
         'validate': 'ops.validate',
+        'validate_batch': 'ops.validate',
     }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     # Include pick_waves so we can filter deliveries that belong to a specific
@@ -209,6 +321,13 @@ class DeliveryOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMi
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def _completion_item(self, line):
+        return {
+            **super()._completion_item(line),
+            'bin_id': line.bin.id if line.bin else None,
+            'bin_code': line.bin.code if line.bin else None,
+        }
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a delivery so it can transition to ready/done when required."""
@@ -223,77 +342,29 @@ class DeliveryOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMi
         """Validate and complete delivery"""
         delivery = self.get_object()
         previous_status = delivery.status
-        success, message = delivery.validate_and_complete()
-        
-        if success:
-            # Create ledger entries - optimize with select_related
-            for item in delivery.items.select_related('product').all():
-                try:
-                    stock_item = StockItem.objects.get(
-                        product=item.product,
-                        warehouse=delivery.warehouse
-                    )
-                except StockItem.DoesNotExist:
-                    # Create stock item if it doesn't exist
-                    stock_item = StockItem.objects.create(
-                        product=item.product,
-                        warehouse=delivery.warehouse,
-                        quantity=0
-                    )
-                StockLedger.objects.create(
-                    product=item.product,
-                    warehouse=delivery.warehouse,
-                    bin=item.bin,
-                    transaction_type='delivery',
-                    document_number=delivery.document_number,
-                    quantity=-item.stock_quantity(),
-                    balance_after=stock_item.quantity,
-                    reference=delivery.customer,
-                    created_by=request.user,
-                )
+        # Commit the stock posting together with its outbox events and audit entry.
+        with transaction.atomic():
+            success, message = delivery.validate_and_complete(user=request.user)
+            if success:
+                self._record_completion(request, delivery, previous_status)
 
-            items_payload = [
-                {
-                    'product_id': item.product_id,
-                    'product_name': item.product.name,
-                    'quantity_delta': str(-item.stock_quantity()),
-                    'bin_id': item.bin_id,
-                    'bin_code': item.bin.code if item.bin else None,
-                }
-                for item in delivery.items.all()
-            ]
-            payload = {
-                'document_number': delivery.document_number,
-                'warehouse_id': delivery.warehouse_id,
-                'warehouse_name': delivery.warehouse.name,
-                'completed_at': delivery.completed_at,
-                'items': items_payload,
-            }
-            _emit_integration_event('delivery_completed', payload)
-            _emit_integration_event('stock_change', {**payload, 'source': 'delivery'})
-            log_audit_event(
-                document_type='delivery',
-                document_id=delivery.id,
-                action='validation',
-                user=request.user,
-                message='Delivery completed',
-                before={'status': previous_status},
-                after={'status': delivery.status},
-                warehouse=delivery.warehouse,
-            )
-        
         return Response({
             'success': success,
             'message': message
         }, status=status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST)
 
 
-class ReturnOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ModelViewSet):
+class ReturnOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, DocumentCompletionMixin, viewsets.ModelViewSet):
     """Customer returns (RMA) management"""
 
     queryset = ReturnOrder.objects.select_related('warehouse', 'created_by', 'delivery_order').prefetch_related('items__product')
     permission_classes = [IsAuthenticated]
 
+    completion_event = 'return_completed'
+    stock_change_source = 'return'
+    audit_document_type = 'return'
+    audit_message = 'Return processed'
+
     permission_action_map = {
         'list': 'ops.read',
         'retrieve': 'ops.read',
@@ -317,6 +388,12 @@ class ReturnOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixi
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def _completion_warehouse(self, return_order):
+        return return_order.target_warehouse
+
+    def _completion_payload(self, return_order):
+        return {**super()._completion_payload(return_order), 'disposition': return_order.disposition}
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a return so it can transition to ready/done when required."""
@@ -334,73 +411,13 @@ class ReturnOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixi
         `ReturnOrder._get_target_warehouse_for_stock`, so the ledger reflects
         the actual location (quarantine or original).
         """
-        from products.models import Warehouse as ProductWarehouse
-        from decimal import Decimal
-
         return_order = self.get_object()
         previous_status = return_order.status
-        success, message = return_order.validate_and_complete()
-
-        if success:
-            # Resolve the effective warehouse used for stock movements.
-            quarantine = ProductWarehouse.objects.filter(is_active=True, is_quarantine=True).first()
-            target_warehouse = quarantine or return_order.warehouse
-
-            # Create ledger entries. For restock/repair, quantity is positive; for scrap, we log zero-movement.
-            for item in return_order.items.all():
-                quantity = item.quantity if return_order.disposition in ['restock', 'repair'] else Decimal('0.00')
-
-                # Get current stock balance after the operation for audit.
-                try:
-                    stock_item = StockItem.objects.get(
-                        product=item.product,
-                        warehouse=target_warehouse,
-                    )
-                    balance_after = stock_item.quantity
-                except StockItem.DoesNotExist:
-                    balance_after = Decimal('0.00')
-
-                StockLedger.objects.create(
-                    product=item.product,
-                    warehouse=target_warehouse,
-                    bin=None,
-                    transaction_type='return',
-                    document_number=return_order.document_number,
-                    quantity=quantity,
-                    balance_after=balance_after,
-                    reference=f"Disposition: {return_order.disposition}; Reason: {return_order.reason}",
-                    created_by=request.user,
-                )
-
-            payload = {
-                'document_number': return_order.document_number,
-                'warehouse_id': target_warehouse.id,
-                'warehouse_name': target_warehouse.name,
-                'disposition': return_order.disposition,
-                'completed_at': return_order.completed_at,
-                'items': [
-                    {
-                        'product_id': item.product_id,
-                        'product_name': item.product.name,
-                        'quantity_delta': str(item.quantity if return_order.disposition in ['restock', 'repair'] else 0),
-                    }
-                    for item in return_order.items.all()
-                ],
-            }
-            _emit_integration_event('return_completed', payload)
-            _emit_integration_event('stock_change', {**payload, 'source': 'return'})
-
-        if success:
-            log_audit_event(
-                document_type='return',
-                document_id=return_order.id,
-                action='validation',
-                user=request.user,
-                message='Return processed',
-                before={'status': previous_status},
-                after={'status': return_order.status},
-                warehouse=target_warehouse,
-            )
+        # Commit the stock posting together with its outbox events and audit entry.
+        with transaction.atomic():
+            success, message = return_order.validate_and_complete(user=request.user)
+            if success:
+                self._record_completion(request, return_order, previous_status)
 
         return Response(
             {'success': success, 'message': message},
@@ -408,12 +425,17 @@ class ReturnOrderViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixi
         )
 
 
-class InternalTransferViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ModelViewSet):
+class InternalTransferViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, BatchValidationMixin, viewsets.ModelViewSet):
     """Internal Transfer CRUD operations"""
 
     queryset = InternalTransfer.objects.select_related('warehouse', 'to_warehouse', 'created_by').prefetch_related('items__product')
     permission_classes = [IsAuthenticated]
 
+    completion_event = 'transfer_completed'
+    stock_change_source = 'transfer'
+    audit_document_type = 'transfer'
+    audit_message = 'Transfer completed'
+
     # Transfers are accessible if the user can access either side.
     warehouse_fields = ('warehouse', 'to_warehouse')
 
@@ -426,6 +448,7 @@ class InternalTransferViewSet(WarehouseScopedQuerySetMixin, CapabilityPermission
         'destroy': 'ops.draft',
         'approve': 'ops.approve',
         'validate': 'ops.validate',
+        'validate_batch': 'ops.validate',
     }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'warehouse', 'to_warehouse', 'created_by']
@@ -440,6 +463,28 @@ class InternalTransferViewSet(WarehouseScopedQuerySetMixin, CapabilityPermission
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def _completion_payload(self, transfer):
+        return {
+            'document_number': transfer.document_number,
+            'from_warehouse_id': transfer.warehouse_id,
+            'from_warehouse_name': transfer.warehouse.name,
+            'to_warehouse_id': transfer.to_warehouse_id,
+            'to_warehouse_name': transfer.to_warehouse.name,
+            'completed_at': transfer.completed_at,
+            'items': [
+                {
+                    'product_id': line.product.id,
+                    'product_name': line.product.name,
+                    'quantity_delta': str(line.delta),
+                    'balance_after': str(line.balance_after),
+                    'destination_bin_id': line.bin.id if line.bin else None,
+                    'destination_bin_code': line.bin.code if line.bin else None,
+                }
+                for line in transfer.posted_lines
+                if line.transaction_type == 'transfer_in'
+            ],
+        }
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a transfer so it can transition to ready/done when required."""
@@ -454,104 +499,29 @@ class InternalTransferViewSet(WarehouseScopedQuerySetMixin, CapabilityPermission
         """Validate and complete transfer"""
         transfer = self.get_object()
         previous_status = transfer.status
-        success, message = transfer.validate_and_complete()
-        
-        if success:
-            # Create ledger entries
-            for item in transfer.items.select_related('product').all():
-                transfer_qty = item.stock_quantity()
-                # Outgoing entry
-                try:
-                    from_stock = StockItem.objects.get(
-                        product=item.product,
-                        warehouse=transfer.warehouse
-                    )
-                except StockItem.DoesNotExist:
-                    from_stock = StockItem.objects.create(
-                        product=item.product,
-                        warehouse=transfer.warehouse,
-                        quantity=0
-                    )
-                StockLedger.objects.create(
-                    product=item.product,
-                    warehouse=transfer.warehouse,
-                    bin=None,
-                    transaction_type='transfer_out',
-                    document_number=transfer.document_number,
-                    quantity=-transfer_qty,
-                    balance_after=from_stock.quantity,
-                    reference=f"To {transfer.to_warehouse.name}",
-                    created_by=request.user,
-                )
-                
-                # Incoming entry
-                try:
-                    to_stock = StockItem.objects.get(
-                        product=item.product,
-                        warehouse=transfer.to_warehouse
-                    )
-                except StockItem.DoesNotExist:
-                    to_stock = StockItem.objects.create(
-                        product=item.product,
-                        warehouse=transfer.to_warehouse,
-                        quantity=0
-                    )
-                StockLedger.objects.create(
-                    product=item.product,
-                    warehouse=transfer.to_warehouse,
-                    bin=item.bin,
-                    transaction_type='transfer_in',
-                    document_number=transfer.document_number,
-                    quantity=transfer_qty,
-                    balance_after=to_stock.quantity,
-                    reference=f"From {transfer.warehouse.name}",
-                    created_by=request.user,
-                )
+        # Commit the stock posting together with its outbox events and audit entry.
+        with transaction.atomic():
+            success, message = transfer.validate_and_complete(user=request.user)
+            if success:
+                self._record_completion(request, transfer, previous_status)
 
-            items_payload = [
-                {
-                    'product_id': item.product_id,
-                    'product_name': item.product.name,
-                    'quantity_delta': str(item.stock_quantity()),
-                    'destination_bin_id': item.bin_id,
-                    'destination_bin_code': item.bin.code if item.bin else None,
-                }
-                for item in transfer.items.all()
-            ]
-            payload = {
-                'document_number': transfer.document_number,
-                'from_warehouse_id': transfer.warehouse_id,
-                'from_warehouse_name': transfer.warehouse.name,
-                'to_warehouse_id': transfer.to_warehouse_id,
-                'to_warehouse_name': transfer.to_warehouse.name,
-                'completed_at': transfer.completed_at,
-                'items': items_payload,
-            }
-            _emit_integration_event('transfer_completed', payload)
-            _emit_integration_event('stock_change', {**payload, 'source': 'transfer'})
-            log_audit_event(
-                document_type='transfer',
-                document_id=transfer.id,
-                action='validation',
-                user=request.user,
-                message='Transfer completed',
-                before={'status': previous_status},
-                after={'status': transfer.status},
-                warehouse=transfer.warehouse,
-            )
-        
         return Response({
             'success': success,
             'message': message
         }, status=status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST)
 
 
-class StockAdjustmentViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ModelViewSet):
+class StockAdjustmentViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, BatchValidationMixin, viewsets.ModelViewSet):
     """Stock Adjustment CRUD operations"""
 
     queryset = StockAdjustment.objects.select_related('warehouse', 'created_by').prefetch_related('items__product')
     permission_classes = [IsAuthenticated]
 
+    completion_event = 'adjustment_completed'
+    stock_change_source = 'adjustment'
+    audit_document_type = 'adjustment'
+    audit_message = 'Adjustment posted'
+
     permission_action_map = {
         'list': 'ops.read',
         'retrieve': 'ops.read',
@@ -561,6 +531,7 @@ class StockAdjustmentViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissions
         'destroy': 'ops.draft',
         'approve': 'ops.approve',
         'validate': 'ops.validate',
+        'validate_batch': 'ops.validate',
     }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'warehouse', 'adjustment_type', 'created_by']
@@ -575,6 +546,9 @@ class StockAdjustmentViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissions
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def _completion_payload(self, adjustment):
+        return {**super()._completion_payload(adjustment), 'adjustment_type': adjustment.adjustment_type}
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a stock adjustment so it can transition to ready/done when required."""
@@ -589,68 +563,12 @@ class StockAdjustmentViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissions
         """Validate and complete adjustment"""
         adjustment = self.get_object()
         previous_status = adjustment.status
-        success, message = adjustment.validate_and_complete()
-        
-        if success:
-            payload_items = []
-            # Create ledger entries - optimize with select_related
-            for item in adjustment.items.select_related('product').all():
-                try:
-                    stock_item = StockItem.objects.get(
-                        product=item.product,
-                        warehouse=adjustment.warehouse
-                    )
-                except StockItem.DoesNotExist:
-                    # Create stock item if it doesn't exist
-                    stock_item = StockItem.objects.create(
-                        product=item.product,
-                        warehouse=adjustment.warehouse,
-                        quantity=0
-                    )
-                quantity = item.adjustment_quantity
-                if adjustment.adjustment_type == 'decrease':
-                    quantity = -quantity
-                elif adjustment.adjustment_type == 'set':
-                    quantity = item.adjustment_quantity - item.current_quantity
-                
-                StockLedger.objects.create(
-                    product=item.product,
-                    warehouse=adjustment.warehouse,
-                    bin=None,
-                    transaction_type='adjustment',
-                    document_number=adjustment.document_number,
-                    quantity=quantity,
-                    balance_after=stock_item.quantity,
-                    reference=adjustment.reason,
-                    created_by=request.user
-                )
-                payload_items.append({
-                    'product_id': item.product_id,
-                    'product_name': item.product.name,
-                    'quantity_delta': str(quantity),
-                })
+        # Commit the stock posting together with its outbox events and audit entry.
+        with transaction.atomic():
+            success, message = adjustment.validate_and_complete(user=request.user)
+            if success:
+                self._record_completion(request, adjustment, previous_status)
 
-            payload = {
-                'document_number': adjustment.document_number,
-                'warehouse_id': adjustment.warehouse_id,
-                'warehouse_name': adjustment.warehouse.name,
-                'completed_at': adjustment.completed_at,
-                'adjustment_type': adjustment.adjustment_type,
-                'items': payload_items,
-            }
-            _emit_integration_event('adjustment_completed', payload)
-            _emit_integration_event('stock_change', {**payload, 'source': 'adjustment'})
-            log_audit_event(
-                document_type='adjustment',
-                document_id=adjustment.id,
-                action='validation',
-                user=request.user,
-                message='Adjustment posted',
-                before={'status': previous_status},
-                after={'status': adjustment.status},
-                warehouse=adjustment.warehouse,
-            )
-        
         return Response({
             'success': success,
             'message': message
@@ -658,9 +576,13 @@ class StockAdjustmentViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissions
 
 
 class StockLedgerViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ReadOnlyModelViewSet):
-    """Stock Ledger - Read-only audit trail"""
+    """Stock Ledger - Read-only audit trail.
+
+    Rows moved to StockLedgerArchive are still listed and retrievable: each
+    request reads the hot and archived segments with the same filters.
+    """
 
-    queryset = StockLedger.objects.select_related('product', 'warehouse', 'created_by')
+    queryset = StockLedger.objects.select_related('product', 'warehouse', 'bin', 'created_by')
     serializer_class = StockLedgerSerializer
     permission_classes = [IsAuthenticated]
 
@@ -668,10 +590,43 @@ class StockLedgerViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixi
         'list': 'ops.read',
         'retrieve': 'ops.read',
     }
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Newest first, keyed on (created_at, id): no OFFSET scans on a large ledger.
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['product', 'warehouse', 'transaction_type', 'document_number']
     search_fields = ['product__name', 'product__sku', 'document_number']
-    ordering_fields = ['created_at']
+
+    def _bound_dates(self, qs):
+        # Dates bound created_at directly (not created_at__date) so the
+        # (product, warehouse, created_at) index still applies.
+        date_from = parse_date(self.request.query_params.get('date_from') or '')
+        date_to = parse_date(self.request.query_params.get('date_to') or '')
+        if date_from:
+            qs = qs.filter(created_at__gte=make_aware(datetime.combine(date_from, time.min)))
+        if date_to:
+            qs = qs.filter(created_at__lt=make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+        return qs
+
+    def get_queryset(self):
+        return self._bound_dates(super().get_queryset())
+
+    def _segments(self):
+        hot, archived = ledger_querysets(self.request.user, self.warehouse_fields)
+        return [self.filter_queryset(self._bound_dates(qs)) for qs in (hot, archived)]
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginator.paginate_segments(self._segments(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            archived = ledger_querysets(self.request.user, self.warehouse_fields)[1]
+            obj = get_object_or_404(archived, pk=self.kwargs['pk'])
+            self.check_object_permissions(self.request, obj)
+            return obj
 
 
 class CycleCountTaskViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin, viewsets.ModelViewSet):
@@ -758,100 +713,82 @@ class CycleCountTaskViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsM
         if task.status != 'ready':
             return Response({'detail': "Task must be in 'ready' status to complete."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Build adjustment only for items where counted != expected
-        variance_items = [item for item in task.items.all() if item.variance != 0]
-        if not variance_items:
-            task.status = 'done'
-            task.completed_at = timezone.now()
-            task.save(update_fields=['status', 'completed_at'])
-            return Response({'success': True, 'message': 'Cycle count completed. No stock differences found.'})
-
-        # Create StockAdjustment with type 'set' so quantities match counted values
-        adjustment = StockAdjustment.objects.create(
-            warehouse=task.warehouse,
-            created_by=task.created_by,
-            status='ready',
-            reason=f'Cycle count {task.document_number}',
-            adjustment_type='set',
-            notes=task.notes,
-        )
-
-        for item in variance_items:
-            # Determine current quantity from StockItem; fall back to expected_quantity if missing
-            try:
-                stock_item = StockItem.objects.get(product=item.product, warehouse=task.warehouse)
-                current_qty = stock_item.quantity
-            except StockItem.DoesNotExist:
-                current_qty = item.expected_quantity
-
-            AdjustmentItem.objects.create(
-                adjustment=adjustment,
-                product=item.product,
-                current_quantity=current_qty,
-                adjustment_quantity=item.counted_quantity,
-                reason=f'Cycle count variance ({item.variance})',
+        # Post the adjustment together with the task status, outbox event and audit entry.
+        with transaction.atomic():
+            # Build adjustment only for items where counted != expected
+            variance_items = [item for item in task.items.all() if item.variance != 0]
+            if not variance_items:
+                task.status = 'done'
+                task.completed_at = timezone.now()
+                task.save(update_fields=['status', 'completed_at'])
+                return Response({'success': True, 'message': 'Cycle count completed. No stock differences found.'})
+
+            # Create StockAdjustment with type 'set' so quantities match counted values
+            adjustment = StockAdjustment.objects.create(
+                warehouse=task.warehouse,
+                created_by=task.created_by,
+                status='ready',
+                reason=f'Cycle count {task.document_number}',
+                adjustment_type='set',
+                notes=task.notes,
             )
 
-        # Apply adjustment and create ledger entries using existing logic pattern
-        success, message = adjustment.validate_and_complete()
-
-        if success:
-            for adj_item in adjustment.items.all():
-                stock_item = StockItem.objects.get(
-                    product=adj_item.product,
-                    warehouse=adjustment.warehouse,
-                )
-                quantity = adj_item.adjustment_quantity
-                if adjustment.adjustment_type == 'decrease':
-                    quantity = -quantity
-                elif adjustment.adjustment_type == 'set':
-                    quantity = adj_item.adjustment_quantity - adj_item.current_quantity
-
-                StockLedger.objects.create(
-                    product=adj_item.product,
-                    warehouse=adjustment.warehouse,
-                    bin=None,
-                    transaction_type='adjustment',
-                    document_number=adjustment.document_number,
-                    quantity=quantity,
-                    balance_after=stock_item.quantity,
-                    reference=adjustment.reason,
-                    created_by=request.user,
+            # Determine current quantities from StockItem in one query; fall back to
+            # expected_quantity where the row is missing
+            current_quantities = dict(
+                StockItem.objects.filter(
+                    warehouse=task.warehouse,
+                    product_id__in=[item.product_id for item in variance_items],
+                ).values_list('product_id', 'quantity')
+            )
+            AdjustmentItem.objects.bulk_create([
+                AdjustmentItem(
+                    adjustment=adjustment,
+                    product=item.product,
+                    current_quantity=current_quantities.get(item.product_id, item.expected_quantity),
+                    adjustment_quantity=item.counted_quantity,
+                    reason=f'Cycle count variance ({item.variance})',
                 )
+                for item in variance_items
+            ])
 
-            task.status = 'done'
-            task.completed_at = timezone.now()
-            task.generated_adjustment = adjustment
-            task.save(update_fields=['status', 'completed_at', 'generated_adjustment'])
-
-            payload = {
-                'document_number': task.document_number,
-                'warehouse_id': task.warehouse_id,
-                'warehouse_name': task.warehouse.name,
-                'completed_at': task.completed_at,
-                'variance_items': [
-                    {
-                        'product_id': item.product_id,
-                        'product_name': item.product.name,
-                        'expected_quantity': str(item.expected_quantity),
-                        'counted_quantity': str(item.counted_quantity),
-                        'variance': str(item.variance),
-                    }
-                    for item in variance_items
-                ],
-                'generated_adjustment': adjustment.document_number,
-            }
-            _emit_integration_event('cycle_count_completed', payload)
-            log_audit_event(
-                document_type='cycle_count',
-                document_id=task.id,
-                action='validation',
-                user=request.user,
-                message='Cycle count completed',
-                before={'status': 'ready'},
-                after={'status': task.status},
-                warehouse=task.warehouse,
-            )
+            # Apply adjustment; ledger entries are written by the posting engine
+            success, message = adjustment.validate_and_complete(user=request.user)
+
+            if success:
+                task.status = 'done'
+                task.completed_at = timezone.now()
+                task.generated_adjustment = adjustment
+                task.save(update_fields=['status', 'completed_at', 'generated_adjustment'])
+
+                payload = {
+                    'document_number': task.document_number,
+                    'warehouse_id': task.warehouse_id,
+                    'warehouse_name': task.warehouse.name,
+                    'completed_at': task.completed_at,
+                    'variance_items': [
+                        {
+                            'product_id': item.product_id,
+                            'product_name': item.product.name,
+                            'expected_quantity': str(item.expected_quantity),
+                            'counted_quantity': str(item.counted_quantity),
+                            'variance': str(item.variance),
+                        }
+                        for item in variance_items
+                    ],
+                    'generated_adjustment': adjustment.document_number,
+                }
+                _emit_integration_event('cycle_count_completed', payload)
+                log_audit_event(
+                    document_type='cycle_count',
+                    document_id=task.id,
+                    action='validation',
+                    user=request.user,
+                    message='Cycle count completed',
+                    before={'status': 'ready'},
+                    after={'status': task.status, 'stock': posted_line_summary(adjustment.posted_lines)},
+                    warehouse=task.warehouse,
+                )
 
         return Response({
             'success': success,
@@ -1278,34 +1215,43 @@ class AuditLogViewSet(WarehouseScopedQuerySetMixin, CapabilityPermissionsMixin,
 
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        """Export filtered audit logs as CSV (warehouse-scoped)."""
+        """Export filtered audit logs as CSV (warehouse-scoped), streamed row by row."""
         qs = self.filter_queryset(self.get_queryset()).order_by('-created_at')
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
+        rows = qs.values_list(
             'created_at',
             'warehouse_id',
-            'warehouse',
+            'warehouse__name',
             'document_type',
             'document_id',
             'action',
-            'user_email',
+            'user__email',
             'message',
-        ])
-
-        for row in qs:
-            writer.writerow([
-                row.created_at.isoformat() if row.created_at else '',
-                row.warehouse_id or '',
-                getattr(row.warehouse, 'name', '') if row.warehouse else '',
-                row.document_type,
-                row.document_id,
-                row.action,
-                getattr(row.user, 'email', '') if row.user else '',
-                row.message or '',
-            ])
-
-        return response
+        ).iterator(chunk_size=2000)
+
+        return streaming_csv_response(
+            'audit_logs.csv',
+            [
+                'created_at',
+                'warehouse_id',
+                'warehouse',
+                'document_type',
+                'document_id',
+                'action',
+                'user_email',
+                'message',
+            ],
+            (
+                [
+                    created_at.isoformat() if created_at else '',
+                    warehouse_id or '',
+                    warehouse_name or '',
+                    document_type,
+                    document_id,
+                    action_name,
+                    user_email or '',
+                    message or '',
+                ]
+                for created_at, warehouse_id, warehouse_name, document_type, document_id, action_name, user_email, message
+                in rows
+            ),
+        )
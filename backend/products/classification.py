@@ -0,0 +1,94 @@
+"""Vectorized ABC (value) and XYZ (demand variability) classification.
+
+Inputs are NumPy arrays aligned on one product axis (sorted product ids), so
+classifying is a handful of array passes whatever the number of SKUs. Used by
+the dashboard analytics and the ABC cycle-count selector.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+# Cumulative share of total value (percent) closing the A and B bands
+ABC_A_SHARE = 80.0
+ABC_B_SHARE = 95.0
+
+# Coefficient of variation of monthly demand closing the X and Y bands
+XYZ_X_CV = 0.5
+XYZ_Y_CV = 1.0
+
+
+def product_axis(product_ids) -> np.ndarray:
+    """Sorted int64 array of product ids used as the axis for every column."""
+    return np.sort(np.fromiter(product_ids, dtype=np.int64))
+
+
+def align(axis: np.ndarray, rows, default: float = 0.0) -> np.ndarray:
+    """Scatter (product_id, value) rows onto `axis`; missing products get `default`."""
+    column = np.full(len(axis), default, dtype=np.float64)
+    rows = [(product_id, value) for product_id, value in rows]
+    if not rows or not len(axis):
+        return column
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((float(row[1] or 0) for row in rows), dtype=np.float64, count=len(rows))
+    positions = np.searchsorted(axis, ids).clip(max=len(axis) - 1)
+    found = axis[positions] == ids
+    column[positions[found]] = values[found]
+    return column
+
+
+def value_order(values: np.ndarray) -> np.ndarray:
+    """Indices sorting `values` descending; ties keep product-axis order."""
+    return np.argsort(-values, kind='stable')
+
+
+def abc_classify(values: np.ndarray, a_share: float = ABC_A_SHARE, b_share: float = ABC_B_SHARE):
+    """Return (classes, cumulative_share) aligned with `values`.
+
+    Products are ranked by value; a product's band is decided by the
+    cumulative share of total value up to and including it.
+    """
+    cumulative = np.zeros(len(values), dtype=np.float64)
+    total = values.sum()
+    if total > 0:
+        order = value_order(values)
+        cumulative[order] = np.cumsum(values[order]) / total * 100
+    classes = np.where(cumulative <= a_share, 'A', np.where(cumulative <= b_share, 'B', 'C'))
+    return classes, cumulative
+
+
+def demand_matrix(axis: np.ndarray, first_period: int, periods: int, rows) -> np.ndarray:
+    """Build a (products x periods) demand matrix from (product_id, period, quantity) rows.
+
+    Periods are integers (e.g. year * 12 + month - 1); periods without demand
+    stay zero, so sparse sellers show their real variability.
+    """
+    matrix = np.zeros((len(axis), periods), dtype=np.float64)
+    rows = list(rows)
+    if not rows or not len(axis):
+        return matrix
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    columns = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)) - first_period
+    quantities = np.fromiter((float(row[2] or 0) for row in rows), dtype=np.float64, count=len(rows))
+
+    positions = np.searchsorted(axis, ids).clip(max=len(axis) - 1)
+    keep = (axis[positions] == ids) & (columns >= 0) & (columns < periods)
+    np.add.at(matrix, (positions[keep], columns[keep]), quantities[keep])
+    return matrix
+
+
+def coefficient_of_variation(demand: np.ndarray) -> np.ndarray:
+    """Population std / mean per row; rows without demand get +inf."""
+    mean = demand.mean(axis=1) if demand.shape[1] else np.zeros(len(demand))
+    std = demand.std(axis=1) if demand.shape[1] else np.zeros(len(demand))
+    cv = np.full(len(demand), np.inf)
+    np.divide(std, mean, out=cv, where=mean > 0)
+    return cv
+
+
+def xyz_classify(demand: np.ndarray, x_cv: float = XYZ_X_CV, y_cv: float = XYZ_Y_CV):
+    """Return (classes, coefficient_of_variation) per row of `demand`."""
+    cv = coefficient_of_variation(demand)
+    classes = np.where(cv <= x_cv, 'X', np.where(cv <= y_cv, 'Y', 'Z'))
+    return classes, cv
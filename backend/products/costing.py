@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.utils import timezone
+
+from .models import ProductCost
+
+ZERO = Decimal('0.00')
+COST_PLACES = Decimal('0.0001')
+
+
+def _average(value, quantity) -> Decimal:
+    if not quantity:
+        return Decimal('0.0000')
+    return (Decimal(value) / Decimal(quantity)).quantize(COST_PLACES)
+
+
+def average_costs(warehouse_ids=None) -> dict:
+    """Return {product_id: weighted-average unit cost} in a single query.
+
+    With `warehouse_ids=None` the all-warehouse costs are returned; otherwise
+    the cost is weighted across receipts into the given warehouses only.
+    Products never received at a known price are absent.
+    """
+    if warehouse_ids is None:
+        return dict(
+            ProductCost.objects.filter(warehouse__isnull=True).values_list('product_id', 'average_cost')
+        )
+
+    rows = (
+        ProductCost.objects.filter(warehouse_id__in=list(warehouse_ids))
+        .values('product')
+        .annotate(quantity=Sum('received_quantity'), value=Sum('received_value'))
+    )
+    return {row['product']: _average(row['value'], row['quantity']) for row in rows}
+
+
+def apply_receipt_costs(receipts) -> None:
+    """Fold received quantities and their extended cost into the cost index.
+
+    `receipts` is an iterable of (product_id, warehouse_id, quantity, value).
+    Each receipt counts towards its warehouse row and the all-warehouse row.
+    Sums are incremented with F() expressions so concurrent postings
+    compose, and the averages are re-derived from the updated sums; the query
+    count does not depend on the number of lines.
+    """
+    totals = defaultdict(lambda: [ZERO, ZERO])
+    for product_id, warehouse_id, quantity, value in receipts:
+        for key in ((product_id, warehouse_id), (product_id, None)):
+            totals[key][0] += quantity
+            totals[key][1] += value
+    if not totals:
+        return
+
+    product_ids = {product_id for product_id, _ in totals}
+    ProductCost.objects.bulk_create(
+        [ProductCost(product_id=product_id, warehouse_id=warehouse_id) for product_id, warehouse_id in totals],
+        ignore_conflicts=True,
+    )
+    pks = {
+        (product_id, warehouse_id): pk
+        for pk, product_id, warehouse_id in ProductCost.objects.filter(product_id__in=product_ids)
+        .values_list('pk', 'product_id', 'warehouse_id')
+        if (product_id, warehouse_id) in totals
+    }
+
+    def increments(index, max_digits, decimal_places):
+        return Case(
+            *[When(pk=pks[key], then=Value(amounts[index])) for key, amounts in totals.items()],
+            output_field=DecimalField(max_digits=max_digits, decimal_places=decimal_places),
+        )
+
+    rows = ProductCost.objects.filter(pk__in=list(pks.values()))
+    rows.update(
+        received_quantity=F('received_quantity') + increments(0, 14, 2),
+        received_value=F('received_value') + increments(1, 16, 4),
+        updated_at=timezone.now(),
+    )
+    # The rows stay locked by the UPDATE above, so the re-read sums are ours.
+    # Dividing here rather than in SQL avoids integer division on SQLite.
+    averages = {
+        pk: _average(value, quantity)
+        for pk, quantity, value in rows.values_list('pk', 'received_quantity', 'received_value')
+    }
+    rows.update(
+        average_cost=Case(
+            *[When(pk=pk, then=Value(average)) for pk, average in averages.items()],
+            output_field=DecimalField(max_digits=14, decimal_places=4),
+        ),
+    )
+
+
+def rebuild_cost_index(batch_size: int = 1000) -> int:
+    """Recompute ProductCost from every completed receipt. Returns rows written."""
+    from operations.models import ReceiptItem
+
+    totals = defaultdict(lambda: [ZERO, ZERO])
+    items = (
+        ReceiptItem.objects.filter(receipt__status='done', unit_price__isnull=False)
+        .values_list(
+            'product_id', 'receipt__warehouse_id', 'quantity_received', 'unit_of_measure',
+            'unit_price', 'product__unit_conversion_factor',
+        )
+    )
+    for product_id, warehouse_id, quantity, unit, unit_price, factor in items.iterator():
+        stock_quantity = quantity * (factor or Decimal('1.0')) if unit == 'purchase' else quantity
+        for key in ((product_id, warehouse_id), (product_id, None)):
+            totals[key][0] += stock_quantity
+            totals[key][1] += quantity * unit_price
+
+    ProductCost.objects.all().delete()
+    ProductCost.objects.bulk_create(
+        [
+            ProductCost(
+                product_id=product_id,
+                warehouse_id=warehouse_id,
+                received_quantity=quantity,
+                received_value=value,
+                average_cost=_average(value, quantity),
+            )
+            for (product_id, warehouse_id), (quantity, value) in totals.items()
+        ],
+        batch_size=batch_size,
+    )
+    return len(totals)
@@ -0,0 +1 @@
+# products.management package
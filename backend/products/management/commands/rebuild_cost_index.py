@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.costing import rebuild_cost_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the weighted-average product cost index (ProductCost) from completed receipts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert statement (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_cost_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt cost index ({written} product/warehouse rows)."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import ProductStockSummary
+from products.stock_summary import refresh_stock_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-product stock summary (ProductStockSummary) from StockItem"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert/update statement (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Summaries for deleted products are removed with them (CASCADE),
+            # so refreshing every product is a complete rebuild.
+            written = refresh_stock_summaries(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stock summary for {written} products "
+            f"({ProductStockSummary.objects.filter(is_active=True, is_low_stock=True).count()} low on stock)."
+        ))
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:43
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_stock_summaries(apps, schema_editor):
+    """Build the initial summary rows from existing StockItem data."""
+    Product = apps.get_model('products', 'Product')
+    StockItem = apps.get_model('products', 'StockItem')
+    ProductStockSummary = apps.get_model('products', 'ProductStockSummary')
+
+    zero = Decimal('0.00')
+    totals = {
+        row['product']: (row['total'] or zero, row['reserved'] or zero)
+        for row in StockItem.objects.values('product').annotate(
+            total=models.Sum('quantity'),
+            reserved=models.Sum('reserved_quantity'),
+        )
+    }
+    summaries = []
+    for product_id, reorder_level, is_active in Product.objects.values_list('pk', 'reorder_level', 'is_active').iterator():
+        total, reserved = totals.get(product_id, (zero, zero))
+        summaries.append(ProductStockSummary(
+            product_id=product_id,
+            total_quantity=total,
+            reserved_quantity=reserved,
+            reorder_level=reorder_level,
+            is_active=is_active,
+            is_low_stock=total <= reorder_level,
+            is_out_of_stock=total <= zero,
+        ))
+    ProductStockSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_remove_product_unit_of_measure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_summary', serialize=False, to='products.product')),
+                ('total_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('reserved_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('reorder_level', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_low_stock', models.BooleanField(default=True)),
+                ('is_out_of_stock', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productstocksummary',
+            index=models.Index(fields=['is_active', 'is_low_stock'], name='products_pr_is_acti_8c7071_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstocksummary',
+            index=models.Index(fields=['is_active', 'is_out_of_stock'], name='products_pr_is_acti_f43967_idx'),
+        ),
+        migrations.RunPython(populate_stock_summaries, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:45
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_cost_index(apps, schema_editor):
+    """Seed weighted-average costs from receipts completed so far."""
+    ReceiptItem = apps.get_model('operations', 'ReceiptItem')
+    ProductCost = apps.get_model('products', 'ProductCost')
+
+    totals = {}
+    items = ReceiptItem.objects.filter(receipt__status='done', unit_price__isnull=False).values_list(
+        'product_id', 'receipt__warehouse_id', 'quantity_received', 'unit_of_measure',
+        'unit_price', 'product__unit_conversion_factor',
+    )
+    for product_id, warehouse_id, quantity, unit, unit_price, factor in items.iterator():
+        stock_quantity = quantity * (factor or Decimal('1.0')) if unit == 'purchase' else quantity
+        for key in ((product_id, warehouse_id), (product_id, None)):
+            received = totals.setdefault(key, [Decimal('0.00'), Decimal('0.00')])
+            received[0] += stock_quantity
+            received[1] += quantity * unit_price
+
+    ProductCost.objects.bulk_create(
+        [
+            ProductCost(
+                product_id=product_id,
+                warehouse_id=warehouse_id,
+                received_quantity=quantity,
+                received_value=value,
+                average_cost=(value / quantity).quantize(Decimal('0.0001')) if quantity else Decimal('0.0000'),
+            )
+            for (product_id, warehouse_id), (quantity, value) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_productstocksummary'),
+        ('operations', '0017_documentsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('received_value', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('average_cost', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='costs', to='products.product')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_costs', to='products.warehouse')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productcost',
+            constraint=models.UniqueConstraint(fields=('product', 'warehouse'), name='unique_product_cost_per_warehouse'),
+        ),
+        migrations.AddConstraint(
+            model_name='productcost',
+            constraint=models.UniqueConstraint(condition=models.Q(('warehouse__isnull', True)), fields=('product',), name='unique_product_cost_overall'),
+        ),
+        migrations.RunPython(populate_cost_index, reverse_code=migrations.RunPython.noop),
+    ]
@@ -113,6 +113,15 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the stock summary's copy of reorder_level/is_active in step.
+        from dashboard.cache import bump_stock_version
+        from .stock_summary import refresh_stock_summaries
+
+        refresh_stock_summaries([self.pk])
+        bump_stock_version()
+
     def get_total_stock(self):
         """Get total stock across all warehouses"""
         return sum(item.quantity for item in self.stock_items.all())
@@ -199,6 +208,73 @@ class BinStockItem(models.Model):
         return f"{self.product.name} @ {self.warehouse.code}/{self.bin.code}: {self.quantity}"
 
 
+class ProductStockSummary(models.Model):
+    """Stock totals per product across all warehouses.
+
+    A projection of StockItem kept up to date by the stock posting engine
+    (operations.posting) in the same transaction as the StockItem writes, so
+    low/out-of-stock lookups are indexed counts instead of aggregating
+    StockItem. `reorder_level` and `is_active` are copied from Product so the
+    flags can be maintained in SQL. Rebuild with `manage.py rebuild_stock_summary`.
+    """
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stock_summary')
+    total_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    reserved_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    reorder_level = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    is_active = models.BooleanField(default=True)
+    # total_quantity <= reorder_level (includes out of stock)
+    is_low_stock = models.BooleanField(default=True)
+    # total_quantity <= 0
+    is_out_of_stock = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'is_low_stock']),
+            models.Index(fields=['is_active', 'is_out_of_stock']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.total_quantity}"
+
+
+class ProductCost(models.Model):
+    """Weighted-average unit cost (per stock unit) of received stock.
+
+    One row per product and warehouse, plus an all-warehouse row with
+    `warehouse=None`. Receipt postings add their quantity and extended cost
+    (quantity x unit price) in the same transaction that books the stock;
+    `average_cost` is received_value / received_quantity. Valuation reads
+    this table instead of averaging ReceiptItem prices per product. Rebuild
+    with `manage.py rebuild_cost_index`.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='costs')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, null=True, blank=True, related_name='product_costs')
+    received_quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    received_value = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal('0.0000'))
+    average_cost = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0.0000'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'warehouse'],
+                name='unique_product_cost_per_warehouse',
+            ),
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=models.Q(warehouse__isnull=True),
+                name='unique_product_cost_overall',
+            ),
+        ]
+
+    def __str__(self):
+        scope = self.warehouse_id or 'all'
+        return f"{self.product_id}@{scope}: {self.average_cost}"
+
+
 class Supplier(models.Model):
     """Supplier/Vendor Model"""
     name = models.CharField(max_length=200)
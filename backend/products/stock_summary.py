@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, DecimalField, F, Sum, Value, When
+from django.utils import timezone
+
+from .models import Product, ProductStockSummary, StockItem
+
+ZERO = Decimal('0.00')
+
+
+def _flags(total: Decimal, reorder_level: Decimal) -> dict:
+    return {
+        'is_low_stock': total <= reorder_level,
+        'is_out_of_stock': total <= ZERO,
+    }
+
+
+def refresh_stock_summaries(product_ids=None, batch_size: int = 1000) -> int:
+    """Recompute ProductStockSummary rows from StockItem.
+
+    Refreshes the given products, or every product when `product_ids` is None
+    (a full rebuild). Uses one grouped aggregate over StockItem plus bulk
+    writes, so the cost does not grow with the number of warehouses. Returns
+    the number of summaries written.
+    """
+    products = Product.objects.all()
+    stock = StockItem.objects.all()
+    summaries = ProductStockSummary.objects.all()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        products = products.filter(pk__in=product_ids)
+        stock = stock.filter(product_id__in=product_ids)
+        summaries = summaries.filter(product_id__in=product_ids)
+
+    totals = {
+        row['product']: (row['total'] or ZERO, row['reserved'] or ZERO)
+        for row in stock.values('product').annotate(total=Sum('quantity'), reserved=Sum('reserved_quantity'))
+    }
+    existing = set(summaries.values_list('product_id', flat=True))
+
+    to_create = []
+    to_update = []
+    for product_id, reorder_level, is_active in products.values_list('pk', 'reorder_level', 'is_active').iterator():
+        total, reserved = totals.get(product_id, (ZERO, ZERO))
+        summary = ProductStockSummary(
+            product_id=product_id,
+            total_quantity=total,
+            reserved_quantity=reserved,
+            reorder_level=reorder_level,
+            is_active=is_active,
+            **_flags(total, reorder_level),
+        )
+        (to_update if product_id in existing else to_create).append(summary)
+
+    if to_create:
+        ProductStockSummary.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+    if to_update:
+        now = timezone.now()
+        for summary in to_update:
+            summary.updated_at = now
+        ProductStockSummary.objects.bulk_update(
+            to_update,
+            ['total_quantity', 'reserved_quantity', 'reorder_level', 'is_active',
+             'is_low_stock', 'is_out_of_stock', 'updated_at'],
+            batch_size=batch_size,
+        )
+    return len(to_create) + len(to_update)
+
+
+def apply_stock_deltas(deltas) -> None:
+    """Add signed per-warehouse quantity changes to the product summaries.
+
+    `deltas` maps (product_id, warehouse_id) -> Decimal. Called by the posting
+    engine inside its transaction: totals are incremented with a single
+    UPDATE (F() expressions, so concurrent postings on the same product do not
+    overwrite each other) and the flags are re-derived with a second one.
+    """
+    per_product = defaultdict(Decimal)
+    for (product_id, _warehouse_id), delta in deltas.items():
+        per_product[product_id] += delta
+    per_product = {product_id: delta for product_id, delta in per_product.items() if delta != ZERO}
+    if not per_product:
+        return
+
+    # Products without a summary row yet get one computed from StockItem,
+    # which already includes this posting's writes.
+    existing = set(
+        ProductStockSummary.objects.filter(product_id__in=list(per_product)).values_list('product_id', flat=True)
+    )
+    missing = set(per_product) - existing
+    if missing:
+        refresh_stock_summaries(missing)
+    amounts = {product_id: delta for product_id, delta in per_product.items() if product_id in existing}
+    if not amounts:
+        return
+
+    now = timezone.now()
+    rows = ProductStockSummary.objects.filter(product_id__in=list(amounts))
+    rows.update(
+        total_quantity=F('total_quantity') + Case(
+            *[When(product_id=product_id, then=Value(delta)) for product_id, delta in amounts.items()],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        updated_at=now,
+    )
+    rows.update(
+        is_low_stock=Case(
+            When(total_quantity__lte=F('reorder_level'), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+        is_out_of_stock=Case(
+            When(total_quantity__lte=ZERO, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    )
@@ -1,11 +1,16 @@
+from decimal import Decimal
+
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django_filters.rest_framework import DjangoFilterBackend
 
 from accounts.permissions import capability_required
 from accounts.scoping import allowed_warehouse_ids, require_warehouse_membership
+from dashboard.cache import bump_stock_version
 from .models import (
     Category,
     Warehouse,
@@ -19,6 +24,7 @@ from .models import (
     UnitOfMeasure,
     UnitConversion,
 )
+from .stock_summary import refresh_stock_summaries
 from .serializers import (
     CategorySerializer,
     WarehouseSerializer,
@@ -194,25 +200,20 @@ class ProductViewSet(viewsets.ModelViewSet):
     def low_stock(self, request):
         """Get all products with low stock.
 
-        Optimized to avoid per-product stock queries by aggregating StockItem
-        quantities and applying low-stock logic in a single pass, similar to
-        the dashboard low-stock endpoint.
+        Reads the low-stock flag maintained on ProductStockSummary instead of
+        aggregating StockItem on every request. Products without a summary
+        row yet (bulk-created, imported) fall back to the aggregate.
         """
-        from django.db.models import Sum
-
-        # Aggregate total stock per product in a single query
-        stock_by_product = StockItem.objects.values('product').annotate(
-            total_quantity=Sum('quantity')
+        unsummarized_low = (
+            Product.objects.filter(is_active=True, stock_summary__isnull=True)
+            .annotate(total=Coalesce(Sum('stock_items__quantity'), Value(Decimal('0.00'))))
+            .filter(total__lte=F('reorder_level'))
+            .values('pk')
         )
-        stock_dict = {item['product']: item['total_quantity'] for item in stock_by_product}
-
-        # Evaluate low-stock condition using aggregated quantities
-        products = Product.objects.filter(is_active=True).select_related('category')
-        low_stock_products = [
-            product
-            for product in products
-            if stock_dict.get(product.id, 0) <= product.reorder_level
-        ]
+        low_stock_products = Product.objects.filter(
+            Q(stock_summary__is_low_stock=True) | Q(pk__in=unsummarized_low),
+            is_active=True,
+        ).select_related('category').prefetch_related('stock_items')
 
         serializer = ProductListSerializer(low_stock_products, many=True)
         return Response(serializer.data)
@@ -304,6 +305,25 @@ class StockItemViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated(), capability_required('products.read')()]
         return [IsAuthenticated(), capability_required('products.write')()]
 
+    # Direct stock edits bypass the posting engine, so refresh the summary
+    # and invalidate cached dashboard figures here.
+    def perform_create(self, serializer):
+        stock_item = serializer.save()
+        refresh_stock_summaries([stock_item.product_id])
+        bump_stock_version([stock_item.warehouse_id])
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.product_id, serializer.instance.warehouse_id
+        stock_item = serializer.save()
+        refresh_stock_summaries({previous[0], stock_item.product_id})
+        bump_stock_version({previous[1], stock_item.warehouse_id})
+
+    def perform_destroy(self, instance):
+        product_id, warehouse_id = instance.product_id, instance.warehouse_id
+        instance.delete()
+        refresh_stock_summaries([product_id])
+        bump_stock_version([warehouse_id])
+
 
 class SupplierViewSet(viewsets.ModelViewSet):
     """Supplier CRUD operations"""
@@ -1,5 +1,10 @@
 """
 ASGI config for stockmaster project.
+
+Serves the Django app, plus the notification Server-Sent Events stream
+(notifications.streaming), which needs a native async handler to hold many
+idle connections per worker. Run with any ASGI server, e.g.
+`uvicorn stockmaster.asgi:application`.
 """
 import os
 
@@ -7,5 +12,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockmaster.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from notifications.streaming import STREAM_PATH, notification_stream  # noqa: E402  (needs the app registry)
+
 
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        await notification_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -75,6 +75,66 @@ DATABASES = {
     }
 }
 
+# Cache - local memory by default; point DJANGO_CACHE_BACKEND at e.g.
+# django.core.cache.backends.filebased.FileBasedCache to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('DJANGO_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DJANGO_CACHE_LOCATION', default='stockmaster'),
+    }
+}
+
+# Dashboard responses are invalidated by per-warehouse stock versions; the
+# timeout only bounds how stale time-windowed figures can get.
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+# Stock ledger archival (manage.py archive_stock_ledger): whole months older than
+# this many days move from StockLedger to StockLedgerArchive, leaving an
+# opening-balance checkpoint per product and warehouse.
+STOCK_LEDGER_HOT_DAYS = config('STOCK_LEDGER_HOT_DAYS', default=180, cast=int)
+
+# Webhook delivery: keep-alive connections per partner host and per-request timeout
+WEBHOOK_POOL_SIZE = config('WEBHOOK_POOL_SIZE', default=10, cast=int)
+WEBHOOK_REQUEST_TIMEOUT = config('WEBHOOK_REQUEST_TIMEOUT', default=6, cast=float)
+# Failed deliveries are retried with exponential backoff (base doubling up to
+# the cap, with jitter) and dead-lettered after WEBHOOK_MAX_ATTEMPTS. A webhook
+# failing WEBHOOK_CIRCUIT_THRESHOLD times in a row is paused for the cooldown.
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+WEBHOOK_BACKOFF_BASE_SECONDS = config('WEBHOOK_BACKOFF_BASE_SECONDS', default=30, cast=int)
+WEBHOOK_BACKOFF_MAX_SECONDS = config('WEBHOOK_BACKOFF_MAX_SECONDS', default=6 * 3600, cast=int)
+WEBHOOK_CIRCUIT_THRESHOLD = config('WEBHOOK_CIRCUIT_THRESHOLD', default=5, cast=int)
+WEBHOOK_CIRCUIT_COOLDOWN_SECONDS = config('WEBHOOK_CIRCUIT_COOLDOWN_SECONDS', default=300, cast=int)
+# Each process caches which webhooks subscribe to which events; it is rebuilt
+# at least this often so changes made in other processes are picked up
+# without a shared cache.
+WEBHOOK_SUBSCRIPTION_MAX_AGE_SECONDS = config('WEBHOOK_SUBSCRIPTION_MAX_AGE_SECONDS', default=30, cast=float)
+
+# Low-stock digest: one broadcast notification per product (read state kept per
+# user) instead of one row per product per eligible user.
+NOTIFICATION_BROADCAST_LOW_STOCK = config('NOTIFICATION_BROADCAST_LOW_STOCK', default=False, cast=bool)
+NOTIFICATION_BULK_BATCH_SIZE = config('NOTIFICATION_BULK_BATCH_SIZE', default=1000, cast=int)
+# Notification retention: read notifications (and broadcasts) older than their
+# type's window in days move to NotificationArchive, or are dropped when
+# NOTIFICATION_ARCHIVE_EXPIRED is off. Unread personal notifications are kept.
+NOTIFICATION_RETENTION_DEFAULT_DAYS = config('NOTIFICATION_RETENTION_DEFAULT_DAYS', default=90, cast=int)
+NOTIFICATION_RETENTION_DAYS = {
+    'low_stock': 30,
+    'out_of_stock': 30,
+    'delivery_due': 14,
+    'anomaly': 180,
+}
+NOTIFICATION_ARCHIVE_EXPIRED = config('NOTIFICATION_ARCHIVE_EXPIRED', default=True, cast=bool)
+# Notification job scheduler (manage.py run_notification_scheduler): a job's
+# lease must outlast its longest run; failed runs are retried after the delay.
+NOTIFICATION_JOB_LEASE_SECONDS = config('NOTIFICATION_JOB_LEASE_SECONDS', default=3600, cast=int)
+NOTIFICATION_JOB_RETRY_SECONDS = config('NOTIFICATION_JOB_RETRY_SECONDS', default=300, cast=int)
+# The notification SSE stream (served under ASGI) wakes immediately for changes
+# made in its own process and polls for other processes' changes this often.
+NOTIFICATION_STREAM_POLL_SECONDS = config('NOTIFICATION_STREAM_POLL_SECONDS', default=5, cast=float)
+# Browsers open the stream with a ticket from POST .../stream_ticket/; it is
+# valid once, for this many seconds.
+NOTIFICATION_STREAM_TICKET_SECONDS = config('NOTIFICATION_STREAM_TICKET_SECONDS', default=30, cast=int)
+
 # Alternative: Use pymongo directly if djongo doesn't work
 # MONGODB_URI = config('MONGODB_URI', default='mongodb://localhost:27017/stockmaster')
 
@@ -1,58 +1,334 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
-from pymongo import MongoClient
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import base64
+import binascii
+import csv
+import json
 import os
+import queue
+import sqlite3
+import tempfile
+import threading
 from dotenv import load_dotenv
-import pandas as pd
-from io import BytesIO
+from io import StringIO
+from openpyxl import Workbook
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
-# MongoDB connection
+# Reports read through a pluggable data source: the Django SQL database
+# (default) or the legacy MongoDB collections.
+DATA_SOURCE = os.getenv('REPORTS_DATA_SOURCE', 'sql').lower()
+DATABASE_URL = os.getenv(
+    'REPORTS_DATABASE_URL',
+    'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'db.sqlite3'),
+)
+DB_POOL_SIZE = int(os.getenv('REPORTS_DB_POOL_SIZE', 5))
+DB_POOL_TIMEOUT = float(os.getenv('REPORTS_DB_POOL_TIMEOUT', 10))
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
 DB_NAME = os.getenv('DB_NAME', 'stockmaster')
+# Rows pulled from a SQL cursor per round trip while streaming.
+FETCH_SIZE = 2000
+# The hot ledger and the table operations.ledger_archive moves old months into.
+LEDGER_TABLES = ('operations_stockledger', 'operations_stockledgerarchive')
+
+
+class DataSourceUnavailable(Exception):
+    pass
+
+
+class ConnectionPool:
+    """A small thread-safe pool of read-only DB-API connections.
+
+    Connections are opened lazily, at most `size` at a time, and reused LIFO
+    so an idle service keeps only the connections it actually needed.
+    """
+
+    def __init__(self, url, size=5, timeout=10):
+        scheme = url.split('://', 1)[0]
+        self.engine = scheme.split('+')[0]
+        if self.engine not in ('sqlite', 'postgres', 'postgresql'):
+            raise DataSourceUnavailable(f'Unsupported database URL scheme: {scheme}')
+        self.url = url
+        self.timeout = timeout
+        self.placeholder = '?' if self.engine == 'sqlite' else '%s'
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        if self.engine == 'sqlite':
+            # sqlite:///relative/path or sqlite:////absolute/path
+            path = self.url.split(':///', 1)[1]
+            if not os.path.exists(path):
+                raise DataSourceUnavailable(f'SQLite database not found: {path}')
+            # mode=ro opens the file read-only; query_only also rejects writes
+            # on the connection itself, so reports can never take write locks.
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False, timeout=self.timeout)
+            conn.execute('PRAGMA query_only = ON')
+            return conn
+
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise DataSourceUnavailable('psycopg2 is required for PostgreSQL report sources') from e
+        conn = psycopg2.connect(self.url, connect_timeout=int(self.timeout))
+        conn.set_session(readonly=True, autocommit=True)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise DataSourceUnavailable('Timed out waiting for a report database connection')
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            yield conn
+        except Exception:
+            # Don't hand a connection in an unknown state to the next request.
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SqlDataSource:
+    """Reads the Django tables (products_*, operations_stockledger) directly."""
+
+    name = 'sql'
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _stream(self, sql, params=()):
+        """Yield rows as dicts, fetching FETCH_SIZE at a time.
+
+        The connection stays checked out until the generator is exhausted or
+        closed, so callers should consume it within the request.
+        """
+        sql = sql.replace('%s', self.pool.placeholder)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                columns = [column[0] for column in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(zip(columns, row))
+            finally:
+                cursor.close()
+
+    def _timestamp(self, value):
+        # Django keeps SQLite datetimes as naive UTC text, compared lexically.
+        if self.pool.engine == 'sqlite':
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value.isoformat(' ')
+        return value
+
+    def stock_totals(self):
+        totals = {}
+        item_count = 0
+        for row in self._stream(
+            'SELECT product_id, SUM(quantity) AS quantity, COUNT(*) AS items '
+            'FROM products_stockitem GROUP BY product_id'
+        ):
+            totals[row['product_id']] = row['quantity'] or 0
+            item_count += row['items']
+        return totals, item_count
+
+    def active_products(self):
+        return self._stream(
+            'SELECT p.id, p.sku, p.name, p.reorder_level, p.reorder_quantity, '
+            'c.name AS category_name, u.code AS unit_of_measure '
+            'FROM products_product p '
+            'LEFT JOIN products_category c ON c.id = p.category_id '
+            'LEFT JOIN products_unitofmeasure u ON u.id = p.stock_unit_id '
+            'WHERE p.is_active = %s ORDER BY p.id',
+            (True,),
+        )
 
-try:
-    client = MongoClient(MONGODB_URI)
-    db = client[DB_NAME]
-    print(f"Connected to MongoDB: {DB_NAME}")
-except Exception as e:
-    print(f"MongoDB connection error: {e}")
-    db = None
+    def movement_history(self, warehouse_id=None, product_id=None, document_number=None,
+                         start=None, end=None, after=None, limit=100):
+        """Ledger rows newest first, starting after the (created_at, id) key `after`.
+
+        Seeks through the (product, warehouse, created_at) or document_number
+        index instead of skipping rows, so deep pages cost the same as the first.
+        Archived months are included transparently.
+        """
+        conditions, params = [], []
+        if document_number:
+            conditions.append('document_number = %s')
+            params.append(document_number)
+        if warehouse_id:
+            conditions.append('warehouse_id = %s')
+            params.append(warehouse_id)
+        if product_id:
+            conditions.append('product_id = %s')
+            params.append(product_id)
+        if start:
+            conditions.append('created_at >= %s')
+            params.append(self._timestamp(start))
+        if end:
+            conditions.append('created_at <= %s')
+            params.append(self._timestamp(end))
+        if after:
+            created_at, pk = after
+            conditions.append('(created_at < %s OR (created_at = %s AND id < %s))')
+            params.extend([created_at, created_at, int(pk)])
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+        params.append(limit)
+        # Months past the hot window live in operations_stockledgerarchive
+        # (same columns); read both with the same seek and merge the pages.
+        rows = []
+        for table in LEDGER_TABLES:
+            rows.extend(self._stream(
+                'SELECT id, transaction_type, document_number, quantity, balance_after, reference, '
+                'created_at, product_id, warehouse_id, bin_id, created_by_id '
+                f'FROM {table} {where}ORDER BY created_at DESC, id DESC LIMIT %s',
+                params,
+            ))
+        rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        return rows[:limit]
+
+
+class MongoDataSource:
+    """The original MongoDB collections, kept for deployments that still sync them."""
+
+    name = 'mongo'
+
+    def __init__(self, uri, db_name):
+        from pymongo import MongoClient
+
+        # MongoClient connects in the background; nothing blocks here.
+        self.client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+        self.db = self.client[db_name]
+
+    @staticmethod
+    def _document(document):
+        document = dict(document)
+        if '_id' in document:
+            document['id'] = str(document.pop('_id'))
+        return document
+
+    def stock_totals(self):
+        """One $group over products_stockitem, so only a row per product comes back."""
+        totals = {}
+        item_count = 0
+        pipeline = [
+            {'$group': {'_id': '$product_id', 'quantity': {'$sum': '$quantity'}, 'items': {'$sum': 1}}},
+        ]
+        for row in self.db.products_stockitem.aggregate(pipeline, allowDiskUse=True):
+            totals[str(row['_id'])] = row['quantity']
+            item_count += row['items']
+        return totals, item_count
+
+    def active_products(self):
+        for product in self.db.products.find({'is_active': True}):
+            yield self._document(product)
+
+    def movement_history(self, warehouse_id=None, product_id=None, document_number=None,
+                         start=None, end=None, after=None, limit=100):
+        query = {}
+        if document_number:
+            query['document_number'] = document_number
+        if warehouse_id:
+            query['warehouse_id'] = warehouse_id
+        if product_id:
+            query['product_id'] = product_id
+        if start or end:
+            query['created_at'] = {}
+            if start:
+                query['created_at']['$gte'] = start
+            if end:
+                query['created_at']['$lte'] = end
+        if after:
+            from bson import ObjectId
+
+            created_at, pk = after
+            created_at = datetime.fromisoformat(created_at)
+            pk = ObjectId(pk) if ObjectId.is_valid(pk) else pk
+            query = {'$and': [query, {'$or': [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': pk}},
+            ]}]}
+        cursor = self.db.operations_stockledger.find(query).sort([('created_at', -1), ('_id', -1)]).limit(limit)
+        return [self._document(entry) for entry in cursor]
+
+
+_data_source = None
+_data_source_lock = threading.Lock()
+
+
+def get_data_source():
+    """The configured data source, created on first use rather than at import."""
+    global _data_source
+    if _data_source is None:
+        with _data_source_lock:
+            if _data_source is None:
+                if DATA_SOURCE == 'mongo':
+                    _data_source = MongoDataSource(MONGODB_URI, DB_NAME)
+                elif DATA_SOURCE == 'sql':
+                    _data_source = SqlDataSource(ConnectionPool(DATABASE_URL, DB_POOL_SIZE, DB_POOL_TIMEOUT))
+                else:
+                    raise DataSourceUnavailable(f'Unknown REPORTS_DATA_SOURCE: {DATA_SOURCE}')
+    return _data_source
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'flask-reports'})
+    return jsonify({'status': 'healthy', 'service': 'flask-reports', 'data_source': DATA_SOURCE})
+
+
+def _stock_totals():
+    """Total quantity per product id plus the number of stock items.
+
+    The database does the summing, so only one row per product comes back,
+    however many stock rows there are.
+    """
+    return get_data_source().stock_totals()
+
+
+def _products_with_stock(totals):
+    """Yield (product, stock) for each active product, streaming the products cursor."""
+    for product in get_data_source().active_products():
+        yield product, totals.get(product['id'], 0)
 
 
 @app.route('/api/reports/stock-summary', methods=['GET'])
 def stock_summary():
     """Generate stock summary report"""
-    if not db:
-        return jsonify({'error': 'Database not connected'}), 500
-
     try:
-        # Get all products with stock
-        products = list(db.products.find({'is_active': True}))
-        stock_items = list(db.products_stockitem.find())
+        totals, stock_item_count = _stock_totals()
 
         # Calculate summary
-        total_products = len(products)
-        total_stock_value = 0
+        total_products = 0
         low_stock_count = 0
         out_of_stock_count = 0
 
-        for product in products:
-            product_stock = sum(
-                item['quantity'] for item in stock_items
-                if item.get('product_id') == product.get('_id')
-            )
+        for product, product_stock in _products_with_stock(totals):
+            total_products += 1
             if product_stock == 0:
                 out_of_stock_count += 1
             elif product_stock <= product.get('reorder_level', 0):
@@ -62,88 +338,147 @@ def stock_summary():
             'total_products': total_products,
             'low_stock_count': low_stock_count,
             'out_of_stock_count': out_of_stock_count,
-            'total_stock_items': len(stock_items),
+            'total_stock_items': stock_item_count,
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+MOVEMENT_MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(row):
+    """Opaque cursor for the (created_at, id) key of the last row on a page."""
+    created_at = row['created_at']
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([str(created_at), str(row['id'])])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(cursor) from e
+    return created_at, pk
+
+
 @app.route('/api/reports/movement-history', methods=['GET'])
 def movement_history():
-    """Get movement history report"""
-    if not db:
-        return jsonify({'error': 'Database not connected'}), 500
+    """Get movement history report, newest first.
 
+    Keyset-paginated: pass the returned next_cursor as ?cursor= for the next
+    page. ?page_size= (default 100, at most MOVEMENT_MAX_PAGE_SIZE) sets the
+    page length and ?document_number= looks up one document's lines.
+    """
     try:
         warehouse_id = request.args.get('warehouse_id')
         product_id = request.args.get('product_id')
+        document_number = request.args.get('document_number')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-
-        query = {}
-        if warehouse_id:
-            query['warehouse_id'] = warehouse_id
-        if product_id:
-            query['product_id'] = product_id
-        if start_date:
-            query['created_at'] = {'$gte': datetime.fromisoformat(start_date)}
-        if end_date:
-            if 'created_at' in query:
-                query['created_at']['$lte'] = datetime.fromisoformat(end_date)
-            else:
-                query['created_at'] = {'$lte': datetime.fromisoformat(end_date)}
-
-        ledger = list(db.operations_stockledger.find(query).sort('created_at', -1).limit(100))
+        page_size = max(1, min(int(request.args.get('page_size', 100)), MOVEMENT_MAX_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        try:
+            after = _decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        ledger = get_data_source().movement_history(
+            warehouse_id=warehouse_id,
+            product_id=product_id,
+            document_number=document_number,
+            start=datetime.fromisoformat(start_date) if start_date else None,
+            end=datetime.fromisoformat(end_date) if end_date else None,
+            after=after,
+            limit=page_size + 1,
+        )
+        next_cursor = None
+        if len(ledger) > page_size:
+            ledger = ledger[:page_size]
+            next_cursor = _encode_cursor(ledger[-1])
 
         return jsonify({
             'count': len(ledger),
-            'results': ledger
+            'results': ledger,
+            'next_cursor': next_cursor,
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+EXPORT_COLUMNS = ['SKU', 'Name', 'Category', 'Stock', 'Unit', 'Reorder Level']
+# Rendered CSV is flushed to the client in pieces of about this size.
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _stock_report_rows(totals):
+    for product, product_stock in _products_with_stock(totals):
+        yield [
+            product.get('sku', ''),
+            product.get('name', ''),
+            product.get('category_name', ''),
+            product_stock,
+            product.get('unit_of_measure', ''),
+            product.get('reorder_level', 0),
+        ]
+
+
+def _csv_chunks(header, rows):
+    """Render rows as CSV incrementally, yielding ~EXPORT_CHUNK_BYTES at a time."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _xlsx_file(sheet_name, header, rows):
+    """Write rows into a temporary .xlsx using openpyxl's write-only mode.
+
+    Write-only worksheets spool rows to disk as they are appended, so memory
+    stays flat regardless of row count. The caller streams the file back.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
 @app.route('/api/reports/export-excel', methods=['GET'])
 def export_excel():
-    """Export stock report to Excel"""
-    if not db:
-        return jsonify({'error': 'Database not connected'}), 500
-
+    """Export stock report to Excel (default) or, with ?format=csv, a streamed CSV"""
     try:
-        products = list(db.products.find({'is_active': True}))
-        stock_items = list(db.products_stockitem.find())
-
-        # Prepare data
-        data = []
-        for product in products:
-            product_stock = sum(
-                item['quantity'] for item in stock_items
-                if item.get('product_id') == product.get('_id')
+        # Aggregate up front so database errors still produce a JSON error
+        # rather than a truncated download.
+        totals, _ = _stock_totals()
+        rows = _stock_report_rows(totals)
+        filename = f'stock_report_{datetime.now().strftime("%Y%m%d")}'
+
+        if request.args.get('format') == 'csv':
+            return Response(
+                _csv_chunks(EXPORT_COLUMNS, rows),
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename="{filename}.csv"'},
             )
-            data.append({
-                'SKU': product.get('sku', ''),
-                'Name': product.get('name', ''),
-                'Category': product.get('category_name', ''),
-                'Stock': product_stock,
-                'Unit': product.get('unit_of_measure', ''),
-                'Reorder Level': product.get('reorder_level', 0),
-            })
-
-        # Create DataFrame
-        df = pd.DataFrame(data)
-
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Stock Report', index=False)
-
-        output.seek(0)
 
+        # send_file streams the temporary file in blocks and closes (deletes) it.
         return send_file(
-            output,
+            _xlsx_file('Stock Report', EXPORT_COLUMNS, rows),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=f'stock_report_{datetime.now().strftime("%Y%m%d")}.xlsx'
+            download_name=f'{filename}.xlsx'
         )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -152,24 +487,16 @@ def export_excel():
 @app.route('/api/reports/low-stock-alert', methods=['GET'])
 def low_stock_alert():
     """Get low stock alerts"""
-    if not db:
-        return jsonify({'error': 'Database not connected'}), 500
-
     try:
-        products = list(db.products.find({'is_active': True}))
-        stock_items = list(db.products_stockitem.find())
+        totals, _ = _stock_totals()
 
         alerts = []
-        for product in products:
-            product_stock = sum(
-                item['quantity'] for item in stock_items
-                if item.get('product_id') == product.get('_id')
-            )
+        for product, product_stock in _products_with_stock(totals):
             reorder_level = product.get('reorder_level', 0)
 
             if product_stock <= reorder_level:
                 alerts.append({
-                    'product_id': str(product.get('_id')),
+                    'product_id': str(product['id']),
                     'product_name': product.get('name'),
                     'sku': product.get('sku'),
                     'current_stock': product_stock,
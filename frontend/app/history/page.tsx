@@ -9,6 +9,8 @@ import { useDebounce } from '@/lib/hooks/useDebounce';
 export default function HistoryPage() {
   const [ledger, setLedger] = useState<StockLedgerEntry[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filters, setFilters] = useState({
     transaction_type: '',
     warehouse: '',
@@ -46,7 +48,8 @@ export default function HistoryPage() {
       if (debouncedSearch) params.search = debouncedSearch;
       
       const data = await ledgerService.getLedger(params);
-      setLedger(data.results || data);
+      setLedger(data.results);
+      setNextPage(data.next);
     } catch (error) {
       console.error('Failed to load ledger:', error);
     } finally {
@@ -54,6 +57,20 @@ export default function HistoryPage() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextPage) return;
+    try {
+      setLoadingMore(true);
+      const data = await ledgerService.getLedgerPage(nextPage);
+      setLedger((current) => [...current, ...data.results]);
+      setNextPage(data.next);
+    } catch (error) {
+      console.error('Failed to load more ledger entries:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getTransactionTypeColor = (type: string) => {
     switch (type) {
       case 'receipt':
@@ -245,6 +262,17 @@ export default function HistoryPage() {
                   )}
                 </tbody>
               </table>
+              {nextPage && (
+                <div className="flex justify-center p-4">
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="px-4 py-2 text-sm font-medium text-gray-700 dark:text-gray-300 border border-gray-300 dark:border-gray-600 rounded-lg hover:bg-gray-50 dark:hover:bg-gray-800 disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef } from 'react';
 import { Bell, Check, Clock } from 'lucide-react';
-import { api } from '@/lib/api';
+import { api, API_URL } from '@/lib/api';
 
 interface Notification {
   id: number;
@@ -24,14 +24,72 @@ export default function NotificationBell() {
 
   useEffect(() => {
     fetchNotifications();
-    fetchUnreadCount();
 
-    // Poll for new notifications every 30 seconds
-    const interval = setInterval(() => {
+    let interval: ReturnType<typeof setInterval> | undefined;
+    const startPolling = () => {
+      if (interval) return;
       fetchUnreadCount();
-    }, 30000);
+      // Poll for new notifications every 30 seconds
+      interval = setInterval(() => {
+        fetchUnreadCount();
+      }, 30000);
+    };
+
+    // Push updates over Server-Sent Events when the backend runs under ASGI;
+    // fall back to polling if the stream is unavailable. EventSource can't
+    // send headers, so it authenticates with a single-use stream ticket
+    // rather than putting the access token in the URL.
+    let source: EventSource | undefined;
+    let closed = false;
+    let reconnect: ReturnType<typeof setTimeout> | undefined;
+    const openStream = async () => {
+      try {
+        const response = await api.post('/notifications/notifications/stream_ticket/');
+        if (closed) return;
+        source = new EventSource(
+          `${API_URL}/notifications/stream/?ticket=${encodeURIComponent(response.data.ticket)}`
+        );
+      } catch (error) {
+        if (!closed) startPolling();
+        return;
+      }
+      source.addEventListener('unread_count', (event) => {
+        setUnreadCount(JSON.parse((event as MessageEvent).data).count || 0);
+      });
+      source.addEventListener('notification', (event) => {
+        const notification: Notification = JSON.parse((event as MessageEvent).data);
+        setNotifications((prev) => [notification, ...prev.filter((n) => n.id !== notification.id)]);
+      });
+      let opened = false;
+      source.onopen = () => {
+        opened = true;
+      };
+      source.onerror = () => {
+        // A ticket is only good once, so EventSource can't reconnect with
+        // it: reopen with a fresh ticket if the stream was working, poll if
+        // it never opened.
+        source?.close();
+        if (closed) return;
+        if (opened) {
+          reconnect = setTimeout(openStream, 5000);
+        } else {
+          startPolling();
+        }
+      };
+    };
 
-    return () => clearInterval(interval);
+    if (localStorage.getItem('access_token') && typeof EventSource !== 'undefined') {
+      openStream();
+    } else {
+      startPolling();
+    }
+
+    return () => {
+      closed = true;
+      if (reconnect) clearTimeout(reconnect);
+      source?.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   useEffect(() => {
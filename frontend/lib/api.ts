@@ -72,6 +72,6 @@ api.interceptors.response.use(
   },
 );
 
-export { api };
+export { api, API_URL };
 export default api;
 
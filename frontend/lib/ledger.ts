@@ -19,6 +19,13 @@ export interface StockLedgerEntry {
   created_at: string;
 }
 
+/** Keyset-paginated: follow `next` for older entries (there is no total count). */
+export interface StockLedgerPage {
+  results: StockLedgerEntry[];
+  next: string | null;
+  previous: string | null;
+}
+
 export const ledgerService = {
   async getLedger(params?: {
     product?: number;
@@ -27,10 +34,18 @@ export const ledgerService = {
     document_number?: string;
     date_from?: string;
     date_to?: string;
-    page?: number;
-  }): Promise<{ results: StockLedgerEntry[]; count: number }> {
+    search?: string;
+    page_size?: number;
+    cursor?: string;
+  }): Promise<StockLedgerPage> {
     const response = await api.get('/operations/ledger/', { params });
     return response.data;
   },
+
+  /** Follow a `next`/`previous` link from a previous page. */
+  async getLedgerPage(url: string): Promise<StockLedgerPage> {
+    const response = await api.get(url);
+    return response.data;
+  },
 };
 